@@ -0,0 +1,77 @@
+"""Compare load time and throughput of the torch and ONNX embedding backends.
+
+Run from the repository root after exporting the ONNX model:
+
+    python benchmarks/bench_embeddings.py --onnx-dir mcq-generator-master/onnx/all-MiniLM-L6-v2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mcq-generator-master'))
+
+from embeddings import LocalEmbedder, OnnxEmbedder  # noqa: E402
+from export_onnx_model import cosine_similarities, load_sample_texts  # noqa: E402
+
+
+def make_texts(count):
+    samples = load_sample_texts()
+    return [f"{samples[i % len(samples)]} (variant {i})" for i in range(count)]
+
+
+def bench_backend(name, factory, texts, batch_sizes, repeats):
+    start = time.perf_counter()
+    embedder = factory()
+    embedder.encode(texts[:1])
+    load_time = time.perf_counter() - start
+
+    results = {'name': name, 'load_time': load_time, 'throughput': {}}
+    for batch_size in batch_sizes:
+        embedder.batch_size = batch_size
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            if batch_size == 1:
+                for text in texts:
+                    embedder.encode([text])
+            else:
+                embedder.encode(texts)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results['throughput'][batch_size] = len(texts) / best
+    return embedder, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument('--onnx-dir', default=os.path.join('mcq-generator-master', 'onnx', 'all-MiniLM-L6-v2'))
+    parser.add_argument('--threads', type=int, default=0, help="onnxruntime intra-op threads (0 = default)")
+    parser.add_argument('--texts', type=int, default=256)
+    parser.add_argument('--batch-sizes', default='1,32,128')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    torch_embedder, torch_results = bench_backend('torch', LocalEmbedder, texts, batch_sizes, args.repeats)
+    onnx_embedder, onnx_results = bench_backend(
+        'onnx-int8',
+        lambda: OnnxEmbedder(model_dir=args.onnx_dir, num_threads=args.threads),
+        texts, batch_sizes, args.repeats
+    )
+
+    print(f"{'backend':<12}{'load (s)':>10}" + ''.join(f"{f'bs={size} (/s)':>16}" for size in batch_sizes))
+    for results in (torch_results, onnx_results):
+        row = f"{results['name']:<12}{results['load_time']:>10.2f}"
+        row += ''.join(f"{results['throughput'][size]:>16.1f}" for size in batch_sizes)
+        print(row)
+
+    similarities = cosine_similarities(torch_embedder.encode(texts), onnx_embedder.encode(texts))
+    print(f"\nCosine similarity onnx vs torch: min {min(similarities):.4f}, "
+          f"mean {sum(similarities) / len(similarities):.4f}")
+
+
+if __name__ == "__main__":
+    main()
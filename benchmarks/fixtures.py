@@ -0,0 +1,145 @@
+"""Synthetic inputs for the benchmarks, sized by scale.
+
+Everything is generated deterministically from a seed so that runs are
+comparable with a stored baseline.
+"""
+import json
+import random
+
+SCALES = {
+    # questions per generated file, test cases per question, questions per payload, students
+    'small': {'questions': 50, 'testcases': 10, 'payload_questions': 5, 'students': 20},
+    'medium': {'questions': 500, 'testcases': 50, 'payload_questions': 20, 'students': 100},
+    'cohort': {'questions': 5000, 'testcases': 200, 'payload_questions': 40, 'students': 500},
+}
+
+TOPICS = ['Linked Lists', 'Binary Trees', 'Java Collections', 'SQL Joins', 'React Hooks', 'Exception Handling']
+
+JAVA_SNIPPET = """public class Student {
+    private String name;
+    private int count;
+
+    public Student(String name) {
+        this.name = name;
+        this.count = 0;
+    }
+
+    public void displayInfo() {
+        System.out.println(name + " " + count);
+    }
+}"""
+
+
+def generated_mcq_text(count, seed=0):
+    """Text in the format the generator produces, with count questions separated by ---."""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(1, count + 1):
+        topic = rng.choice(TOPICS)
+        lines = [f"Q{i}. Which statement about {topic} is correct in scenario {rng.randint(1, 10 ** 6)}?"]
+        if i % 3 == 0:
+            lines.append(f"```java\n{JAVA_SNIPPET}\n```")
+        for option in range(1, 5):
+            lines.append(f"{option}) Option {option} for {topic.lower()} variant {rng.randint(1, 1000)}")
+        lines.append(f"Correct answer: {rng.randint(1, 4)}")
+        lines.append(f"Difficulty: {rng.choice(['Easy', 'Medium', 'Hard'])}")
+        lines.append("Subject: Computer Science")
+        lines.append(f"Topic: {topic}")
+        lines.append(f"Tags: {topic.lower()}, practice, set {i % 7}")
+        blocks.append("\n".join(lines))
+    return "\n---\n".join(blocks)
+
+
+def testcases_json(count, seed=0):
+    rng = random.Random(seed)
+    cases = []
+    for i in range(count):
+        size = rng.randint(5, 40)
+        cases.append({
+            'input': "\n".join(str(rng.randint(-1000, 1000)) for _ in range(size)),
+            'output': "\n".join(str(rng.randint(-1000, 1000)) for _ in range(size // 2 + 1)),
+            'difficulty': rng.choice(['Easy', 'Medium', 'Hard']),
+            'score': rng.choice([10, 15, 25])
+        })
+    return json.dumps(cases)
+
+
+def coding_question(testcase_count, seed=0, number=1):
+    """One COD question as it appears in a resultanalysis response; number is its position in the test."""
+    rng = random.Random(seed)
+    results = [{'status': 'pass' if rng.random() < 0.7 else 'fail'} for _ in range(testcase_count)]
+    student_questions = {
+        'answer': json.dumps({'language_name': 'Java', 'answer': JAVA_SNIPPET}),
+        'l_event_data': {'testcase_results': results}
+    }
+    # Vary which score field is present, so every branch of the score lookup is exercised.
+    if seed % 3 == 0:
+        student_questions['testcase_percentage'] = round(rng.uniform(0, 100), 2)
+    elif seed % 3 == 1:
+        student_questions['marks'] = rng.randint(0, 10)
+    return {
+        'question_data': f'<p>Problem {number}: implement a Student Management System.</p>' * 5,
+        'marks': 10,
+        'student_questions': student_questions,
+        'programming_question': {
+            'input_format': 'A list of integers, one per line.',
+            'output_format': 'The processed integers, one per line.',
+            'code_constraints': '1 <= n <= 10^5',
+            'sample_io': testcases_json(2, seed),
+            'testcases': testcases_json(testcase_count, seed + 1),
+            'solution': [{
+                'whitelist': [{'list': ['displayInfo', 'addStudent', 'this.count']}],
+                'solutiondata': [{'solution': JAVA_SNIPPET}]
+            }]
+        }
+    }
+
+
+def resultanalysis_payload(question_count, testcase_count, seed=0):
+    return {
+        'frozen_test_data': [
+            {'name': 'MCQ', 'questions': []},
+            {'name': 'COD', 'questions': [coding_question(testcase_count, seed + i, i + 1) for i in range(question_count)]}
+        ]
+    }
+
+
+def analysis_inputs(testcase_count, seed=0):
+    """Arguments for GPTAnalyzer._format_analysis_report, with a long insights section."""
+    rng = random.Random(seed)
+    results = []
+    for i in range(testcase_count):
+        results.append({
+            'case_number': i + 1,
+            'type': 'Test Case',
+            'difficulty': rng.choice(['Easy', 'Medium', 'Hard', 'Unknown']),
+            'input': "\n".join(str(rng.randint(0, 99)) for _ in range(10)),
+            'expected_output': "\n".join(str(rng.randint(0, 99)) for _ in range(5)),
+            'score': rng.uniform(0, 25),
+            'weightage': 25,
+            'passed': True
+        })
+    test_results = {'results': results, 'total_score': rng.uniform(0, 100), 'max_score': 100}
+    code_analysis = {
+        'missing_requirements': [],
+        'potential_issues': ["Count variable initialized locally instead of as instance variable"],
+        'whitelist_violations': [f"Missing required element: method{i}" for i in range(5)]
+    }
+    insights = "\n".join(f"- Finding {i}: the loop at line {i} does not handle empty input." for i in range(testcase_count))
+    return test_results, code_analysis, insights, {'question_text': ''}
+
+
+def analysis_report(students, testcase_count, analyzer, seed=0):
+    """A multi-question report laid out like the one FileHandler.save_analysis writes."""
+    parts = []
+    for i in range(students):
+        parts.append(f"\nQuestion {i + 1}:\nLanguage: Java\nFile: main.java\n")
+        parts.append(f"\nStudent's Code:\n-------------\n{JAVA_SNIPPET}\n\nAnalysis Report:\n---------------\n")
+        parts.append(analyzer._format_analysis_report(*analysis_inputs(testcase_count, seed + i)))
+        parts.append("\n" + "=" * 50 + "\n")
+    return "".join(parts)
+
+
+def question_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [f"Which statement about {rng.choice(TOPICS)} is correct in scenario {i}?" for i in range(count)]
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+import tracemalloc
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, items=1, repeats=20, warmup=2):
+    """Run fn repeatedly and report throughput, latency percentiles and peak memory.
+
+    items is the number of units one call processes (questions, reports,
+    submissions...), so throughput is reported in items per second.
+    Peak memory is measured with tracemalloc over a separate call, so the
+    tracing overhead does not distort the timings.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'items': items,
+        'repeats': repeats,
+        'throughput': items * repeats / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=0.10):
+    """Compare results with the baseline.
+
+    Returns (name, metric, baseline, current, change, regressed) rows.
+    Throughput regresses when it drops by more than tolerance; latency and
+    memory regress when they grow by more than tolerance.
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in (('throughput', True), ('p95_ms', False), ('peak_kb', False)):
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            rows.append((name, metric, before, after, change, regressed))
+    return rows
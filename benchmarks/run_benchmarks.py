@@ -0,0 +1,166 @@
+"""Micro-benchmarks for the parsing, scoring and report hot paths of both apps.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --scale medium
+    python benchmarks/run_benchmarks.py --scale medium --save-baseline
+    python benchmarks/run_benchmarks.py --scale cohort --embeddings
+
+Each case reports throughput (items/s), p50/p95/p99 latency and peak
+memory, and is compared with the stored baseline for the same scale.
+The process exits with status 1 when any metric regresses by more than
+--tolerance, so the script can gate a change.
+"""
+import argparse
+import contextlib
+import importlib.util
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MCQ_DIR = os.path.join(ROOT, 'mcq-generator-master')
+ANALYZER_DIR = os.path.join(ROOT, 'cod-analyizer-master', 'code_analysis')
+sys.path.insert(0, MCQ_DIR)
+sys.path.insert(0, ANALYZER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+from harness import compare, load_baseline, measure, save_baseline  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def load_analyzer_app():
+    # Both apps have an app.py, so the code analyzer's is loaded under its own name.
+    spec = importlib.util.spec_from_file_location('code_analysis_app', os.path.join(ANALYZER_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextlib.contextmanager
+def quiet():
+    # The analyzer prints DEBUG lines on every call; send them to devnull
+    # rather than the terminal so the console does not dominate the timings.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def bench_convertor(scale, repeats):
+    from convertor import convert_to_json_format
+
+    count = scale['questions']
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        f.write(fixtures.generated_mcq_text(count))
+        path = f.name
+    try:
+        return {'convert_to_json_format': measure(lambda: convert_to_json_format(path, 'qb', 'bench'), count, repeats)}
+    finally:
+        os.remove(path)
+
+
+def bench_analyzer(scale, repeats):
+    from gpt_analyzer import GPTAnalyzer
+
+    analyzer = GPTAnalyzer()
+    parse_report = load_analyzer_app().parse_report
+    results = {}
+
+    inputs = fixtures.analysis_inputs(scale['testcases'])
+    results['format_analysis_report'] = measure(lambda: analyzer._format_analysis_report(*inputs), 1, repeats)
+
+    students = scale['students']
+    report = fixtures.analysis_report(students, scale['testcases'], analyzer)
+    results['parse_report'] = measure(lambda: parse_report(report), students, repeats)
+
+    payload = fixtures.resultanalysis_payload(scale['payload_questions'], scale['testcases'])
+    questions = payload['frozen_test_data'][1]['questions']
+
+    def extract_all():
+        for question in questions:
+            analyzer._extract_test_cases(question)
+
+    def score_all():
+        for question in questions:
+            analyzer._get_test_score_from_question(question)
+
+    def metadata_all():
+        # Every student after the first hits the per-question metadata cache.
+        for question in questions:
+            analyzer.question_metadata(question)
+
+    results['extract_test_cases'] = measure(extract_all, len(questions), repeats)
+    results['question_metadata_cached'] = measure(metadata_all, len(questions), repeats)
+    with quiet():
+        results['get_test_score_from_question'] = measure(score_all, len(questions), repeats)
+    return results
+
+
+def bench_embeddings(scale, repeats):
+    # Mirrors QuestionBank.add_unique_questions (one batched encode) against
+    # add_unique_question called per question (one encode each), without
+    # needing Elasticsearch. The on-disk cache is bypassed so every run
+    # measures inference.
+    from db import QuestionBank
+    from embeddings import create_local_embedder
+
+    embedder = create_local_embedder()
+    texts = [QuestionBank._question_text({'question_data': text}) for text in fixtures.question_texts(scale['students'])]
+    embedder.encode(texts[:1])
+    repeats = max(1, repeats // 4)
+    return {
+        'embed_batched': measure(lambda: embedder.encode(texts), len(texts), repeats, warmup=1),
+        'embed_single': measure(lambda: [embedder.encode([text])[0] for text in texts], len(texts), repeats, warmup=1),
+    }
+
+
+def print_results(results):
+    print(f"{'case':<40} {'items/s':>12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak KB':>10}")
+    for name, r in results.items():
+        print(f"{name:<40} {r['throughput']:>12.1f} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} {r['peak_kb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(fixtures.SCALES), default='small')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative change before a metric counts as a regression')
+    parser.add_argument('--embeddings', action='store_true', help='also benchmark embedding (loads the model)')
+    args = parser.parse_args()
+
+    scale = fixtures.SCALES[args.scale]
+    results = {}
+    results.update(bench_convertor(scale, args.repeats))
+    results.update(bench_analyzer(scale, args.repeats))
+    if args.embeddings:
+        results.update(bench_embeddings(scale, args.repeats))
+    # Baselines are kept per scale, e.g. "medium/parse_report".
+    results = {f"{args.scale}/{name}": r for name, r in results.items()}
+
+    print_results(results)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    rows = compare(results, load_baseline(args.baseline), args.tolerance)
+    if not rows:
+        print(f"\nNo baseline for scale {args.scale!r} in {args.baseline}; run with --save-baseline to create one.")
+        return
+    print(f"\n{'case':<40} {'metric':<12} {'baseline':>12} {'current':>12} {'change':>8}")
+    regressions = 0
+    for name, metric, before, after, change, regressed in rows:
+        marker = '  REGRESSION' if regressed else ''
+        regressions += regressed
+        print(f"{name:<40} {metric:<12} {before:>12.2f} {after:>12.2f} {change:>+8.1%}{marker}")
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
 import streamlit as st
 from code_extractor import CodeExtractor
+from cohort_store import CohortStore
+from cohort_report import CohortReport, cluster_rows, format_cohort_report
+from watcher import SubmissionWatcher
+from config import Config
+from flow_control import flow_controller
+from model_router import ANALYSIS_FOCUSES, model_router
 
 def parse_report(report_text):
     """
@@ -35,34 +41,49 @@ def parse_report(report_text):
             sections[current_header] += line + "\n"
     return sections
 
+def parse_focus_sections(insights_text):
+    """
+    Splits the AI Analysis Insights section into one section per analysis
+    focus, using the "Focus: <focus>" lines written for multi-focus runs.
+    Sections for the same focus from different answers are joined.
+    Returns an empty dict for single-focus reports.
+    """
+    focus_sections = {}
+    current_focus = None
+    for line in insights_text.splitlines():
+        if line.startswith("Focus: "):
+            current_focus = line[len("Focus: "):].strip()
+            focus_sections.setdefault(current_focus, "")
+        elif current_focus:
+            focus_sections[current_focus] += line + "\n"
+    return focus_sections
+
 def main():
     st.title("Code Analyzer")
     
     st.markdown("### Enter Details")
     url = st.text_input("Enter the URL:", placeholder="https://admin.ltimindtree.iamneo.ai/result?testId=...")
     auth_token = st.text_area("Enter the Authorization Token:", placeholder="eyJhbGciOiJIUzI1...")
-    analysis_prompt = st.selectbox(
+    # Several focuses are answered together, in one request per answer
+    focuses = st.multiselect(
         "Select Analysis Focus:",
-        [
-            "Check why the testcase failed, give in 3 lines",
-            "Check if the code has logical errors and syntax issues only",
-            "Verify if the code meets the basic requirements and handles edge cases",
-            "Identify any missing critical functionality",
-            "Check for proper error handling and validation",
-            "Custom Analysis"
-        ]
+        ANALYSIS_FOCUSES + ["Custom Analysis"],
+        default=ANALYSIS_FOCUSES[:1]
     )
-    if analysis_prompt == "Custom Analysis":
-        analysis_prompt = st.text_area(
+    if "Custom Analysis" in focuses:
+        custom_prompt = st.text_area(
             "Enter your custom analysis criteria:",
             placeholder="Example: Check if the code handles null inputs and implements proper validation"
         )
+        focuses = [focus if focus != "Custom Analysis" else custom_prompt for focus in focuses]
+    analysis_prompt = [focus for focus in focuses if focus] or ANALYSIS_FOCUSES[:1]
+    drive = st.text_input("Drive name (optional, groups results for cohort analytics):")
 
     if st.button("Analyze Code"):
         if url and auth_token:
             with st.spinner("Processing and analyzing code..."):
                 extractor = CodeExtractor()
-                result, success = extractor.get_coding_answers(url, auth_token, analysis_prompt)
+                result, success = extractor.get_coding_answers(url, auth_token, analysis_prompt, drive)
                 if success:
                     st.success("Analysis complete!")
                     
@@ -97,7 +118,12 @@ def main():
                     if sections.get("Code Structure Analysis"):
                         with st.expander("Code Structure Analysis", expanded=True):
                             st.markdown("```\n" + sections["Code Structure Analysis"] + "\n```")
-                    if sections.get("AI Analysis Insights"):
+                    focus_sections = parse_focus_sections(sections.get("AI Analysis Insights", ""))
+                    if focus_sections:
+                        for focus, text in focus_sections.items():
+                            with st.expander(focus, expanded=True):
+                                st.markdown("```\n" + text + "\n```")
+                    elif sections.get("AI Analysis Insights"):
                         with st.expander("AI Analysis Insights", expanded=True):
                             st.markdown("```\n" + sections["AI Analysis Insights"] + "\n```")
 
@@ -110,7 +136,7 @@ def main():
         st.markdown("""
         1. Enter the URL from the admin panel.
         2. Enter your Authorization Token.
-        3. Select the type of analysis you want.
+        3. Select one or more types of analysis.
         4. Click **Analyze Code**.
         5. Download the analysis report and review the detailed sections.
         
@@ -121,5 +147,89 @@ def main():
         - AI analysis insights.
         """)
 
+    st.markdown("### Watch a Live Test")
+    st.caption("Polls the test and analyzes only new or changed answers, updating the stored results and the report.")
+    watch_interval = st.number_input("Poll interval (seconds)", min_value=5, max_value=3600, value=int(Config.WATCH_INTERVAL_SECONDS))
+    watch_polls = st.number_input("Number of polls", min_value=1, max_value=1000, value=20)
+    if st.button("Start Watching"):
+        if url and auth_token:
+            watcher = SubmissionWatcher(
+                CodeExtractor.test_id_from_url(url), auth_token, analysis_prompt, drive,
+                interval=watch_interval, max_interval=max(watch_interval, Config.WATCH_MAX_INTERVAL_SECONDS)
+            )
+            status = st.empty()
+
+            def show_poll(result, error, next_interval):
+                if error:
+                    status.warning(f"Poll {watcher.polls} failed: {error}. Next poll in {next_interval:.0f}s.")
+                else:
+                    status.info(f"Poll {watcher.polls}: {result['answers']} answers, {result['changed']} new or changed. Next poll in {next_interval:.0f}s.")
+
+            watcher.run(max_polls=watch_polls, on_poll=show_poll)
+            st.success("Watch finished.")
+            try:
+                with open('analysis_report.txt', 'r', encoding='utf-8') as file:
+                    st.download_button(
+                        label="Download Latest Analysis Report",
+                        data=file.read(),
+                        file_name="analysis_report.txt",
+                        mime="text/plain"
+                    )
+            except FileNotFoundError:
+                st.info("No answers have been analyzed yet.")
+        else:
+            st.warning("Please enter both URL and Authorization Token.")
+
+    st.markdown("### Cohort Analytics")
+    store = CohortStore()
+    selected_drives = st.multiselect("Drives (leave empty for all):", store.drives())
+    if st.button("Show Cohort Statistics"):
+        try:
+            st.markdown("#### Pass-rate distribution per question")
+            st.table(store.pass_rate_distribution(drives=selected_drives))
+            st.markdown("#### Hardest test cases")
+            st.table(store.hardest_testcases(drives=selected_drives))
+            st.markdown("#### Languages")
+            st.table(store.language_breakdown(drives=selected_drives))
+        except Exception as e:
+            st.error(f"Error reading cohort store: {str(e)}")
+
+    st.markdown("#### Common mistakes")
+    st.caption("Groups the failing submissions of the selected drives into failure patterns and summarizes each pattern with one AI call.")
+    max_clusters = st.number_input("Patterns to summarize", min_value=1, max_value=50, value=Config.COHORT_REPORT_MAX_CLUSTERS)
+    if st.button("Summarize Common Mistakes"):
+        with st.spinner("Clustering failing submissions and summarizing each pattern..."):
+            try:
+                clusters = CohortReport(store, max_clusters=max_clusters).build(drives=selected_drives)
+            except Exception as e:
+                st.error(f"Error building cohort report: {str(e)}")
+                clusters = None
+        if clusters == []:
+            st.info("No failing submissions stored for these drives.")
+        elif clusters:
+            st.table(cluster_rows(clusters))
+            for cluster in clusters:
+                if cluster['summary']:
+                    with st.expander(f"#{cluster['rank']}: {cluster['size']} students, question {cluster['question_key']}", expanded=cluster['rank'] <= 3):
+                        st.markdown("```\n" + cluster['summary'] + "\n```")
+            st.download_button(
+                label="Download Cohort Report",
+                data=format_cohort_report(clusters),
+                file_name="cohort_report.txt",
+                mime="text/plain"
+            )
+
+    with st.expander("Upstream flow control"):
+        # Current in-flight limit, outcomes and latency per external endpoint
+        snapshot = flow_controller.snapshot()
+        if snapshot:
+            st.table(snapshot)
+        else:
+            st.write("No external calls made yet.")
+
+    with st.expander("Model routing"):
+        # Calls, fallbacks, latency, tokens and cost per model tier
+        st.table(model_router.snapshot())
+
 if __name__ == "__main__":
     main()
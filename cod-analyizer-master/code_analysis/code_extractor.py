@@ -2,34 +2,50 @@ import json
 import requests
 from gpt_analyzer import GPTAnalyzer
 from file_handler import FileHandler
+from cohort_store import CohortStore
+from config import Config
+from flow_control import endpoint_name, flow_controller
+from question_metadata import slim_question
 
 class CodeExtractor:
     def __init__(self):
         self.gpt_analyzer = GPTAnalyzer()
         self.file_handler = FileHandler()
+        self.cohort_store = CohortStore()
 
-    def get_coding_answers(self, url, auth_token, analysis_prompt):
-        try:
-            test_id = url.split('testId=')[1]
-            print("DEBUG: Extracted test_id:", test_id)
-            api_url = "https://api.examly.io/api/v2/test/student/resultanalysis"
-            
-            headers = {
-                'accept': 'application/json, text/plain, */*',
-                'authorization': auth_token,
-                'content-type': 'application/json'
-            }
-            
-            data = {
-                "id": test_id
-            }
+    @staticmethod
+    def test_id_from_url(url):
+        return url.split('testId=')[1]
+
+    def fetch_result_analysis(self, test_id, auth_token):
+        """POST the resultanalysis request for a test and return the response."""
+        api_url = f"{Config.EXAMLY_API_BASE}/api/v2/test/student/resultanalysis"
+        
+        headers = {
+            'accept': 'application/json, text/plain, */*',
+            'authorization': auth_token,
+            'content-type': 'application/json'
+        }
+        
+        data = {
+            "id": test_id
+        }
 
+        with flow_controller.slot(endpoint_name(api_url)) as call:
             response = requests.post(api_url, headers=headers, json=data)
+            call.status = response.status_code
+        return response
+
+    def get_coding_answers(self, url, auth_token, analysis_prompt, drive=''):
+        try:
+            test_id = self.test_id_from_url(url)
+            print("DEBUG: Extracted test_id:", test_id)
+            response = self.fetch_result_analysis(test_id, auth_token)
             print("DEBUG: API response status:", response.status_code)
             print("DEBUG: API response text:", response.text)
             if response.status_code == 200:
                 response_data = response.json()
-                coding_answers = self._process_response(response_data, analysis_prompt)
+                coding_answers = self._process_response(response_data, analysis_prompt, test_id, drive)
                 return coding_answers, True
             else:
                 return f"Error: Status code {response.status_code}", False
@@ -37,7 +53,13 @@ class CodeExtractor:
         except Exception as e:
             return f"Error: {str(e)}", False
 
-    def _process_response(self, response_data, analysis_prompt):
+    def extract_coding_answers(self, response_data):
+        """Coding answers in the COD section, numbered by position in 'index'.
+
+        Each answer carries the question's shared, cached 'metadata' and a
+        slim 'question_data' holding only the question key and the
+        student's own student_questions block.
+        """
         coding_answers = []
         frozen_data = response_data.get('frozen_test_data', [])
         print("DEBUG: Number of frozen_test_data items:", len(frozen_data))
@@ -49,10 +71,27 @@ class CodeExtractor:
                 for question in questions:
                     answer = self._extract_answer(question)
                     if answer:
+                        answer['index'] = len(coding_answers) + 1
+                        try:
+                            answer['metadata'] = self.gpt_analyzer.question_metadata(question)
+                            answer['question_data'] = slim_question(question, answer['metadata'])
+                        except Exception as e:
+                            # Keep the full question; analyze_submission reports the error for this answer only
+                            print(f"DEBUG - Error parsing question metadata: {str(e)}")
                         coding_answers.append(answer)
         print("DEBUG: Number of coding answers extracted:", len(coding_answers))
+        return coding_answers
+
+    def _process_response(self, response_data, analysis_prompt, test_id=None, drive=''):
+        coding_answers = self.extract_coding_answers(response_data)
         # Continue with saving analysis...
-        self.file_handler.save_analysis(coding_answers, analysis_prompt, self.gpt_analyzer)
+        analyses = self.file_handler.save_analysis(coding_answers, analysis_prompt, self.gpt_analyzer)
+        if test_id:
+            try:
+                stored = self.cohort_store.record(test_id, coding_answers, analyses, analysis_prompt, drive)
+                print("DEBUG: Submissions stored for cohort analytics:", stored)
+            except Exception as e:
+                print(f"DEBUG - Error storing cohort results: {str(e)}")
         return coding_answers
 
 
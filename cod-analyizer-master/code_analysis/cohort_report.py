@@ -0,0 +1,236 @@
+import math
+import re
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow.compute as pc
+from config import Config
+from model_router import model_router
+from question_metadata import question_metadata_cache
+
+# Routed like a custom review: one call per cluster, so quality over cost.
+COHORT_PROMPT = "Summarize the failure pattern shared by a cluster of student submissions"
+
+# Hashed token-bigram features of a submission's code; two submissions
+# join the same cluster when their cosine similarity to it is at least
+# CODE_SIMILARITY_THRESHOLD.
+CODE_VECTOR_DIMS = 2048
+CODE_SIMILARITY_THRESHOLD = 0.6
+
+REPRESENTATIVES_PER_CLUSTER = 3
+MAX_CODE_CHARS = 3000
+
+_CODE_TOKEN = re.compile(r'[A-Za-z_]\w*|\d+|[^\s\w]')
+
+
+def score_bucket(score):
+    if score <= 0:
+        return 'no test cases passed'
+    if score < 50:
+        return 'under half passed'
+    return 'half or more passed'
+
+
+def report_findings(report):
+    """Whitelist violations and potential issues listed in an analysis report."""
+    findings = []
+    heading = None
+    for line in (report or '').splitlines():
+        if line in ("Missing Required Elements:", "Potential Issues:"):
+            heading = line
+        elif heading and line.startswith("- "):
+            findings.append(line[2:].strip())
+        elif line.strip():
+            heading = None
+    return sorted(set(findings))
+
+
+def code_vector(code):
+    """Sparse, normalized {bucket: weight} vector of the code's token bigrams."""
+    tokens = _CODE_TOKEN.findall(code or '')
+    vector = defaultdict(float)
+    for first, second in zip(tokens, tokens[1:]):
+        vector[zlib.crc32(f"{first} {second}".encode('utf-8')) % CODE_VECTOR_DIMS] += 1.0
+    return _normalized(vector)
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+def _similarity(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+def cluster_by_code(submissions, threshold=CODE_SIMILARITY_THRESHOLD):
+    """Leader clustering: each submission joins the most similar cluster
+    centroid at or above threshold, or starts a new cluster."""
+    clusters = []
+    for submission in submissions:
+        vector = submission['vector']
+        best, best_similarity = None, threshold
+        for cluster in clusters:
+            similarity = _similarity(vector, cluster['centroid'])
+            if similarity >= best_similarity:
+                best, best_similarity = cluster, similarity
+        if best is None:
+            best = {'members': [], 'total': defaultdict(float)}
+            clusters.append(best)
+        best['members'].append(submission)
+        for bucket, weight in vector.items():
+            best['total'][bucket] += weight
+        best['centroid'] = _normalized(best['total'])
+    return [cluster['members'] for cluster in clusters]
+
+
+def pick_representatives(members, count=REPRESENTATIVES_PER_CLUSTER):
+    """The most central member first, then the members least like those already picked."""
+    if len(members) <= count:
+        return list(members)
+    centrality = [sum(_similarity(member['vector'], other['vector']) for other in members) for member in members]
+    picked = [members[centrality.index(max(centrality))]]
+    while len(picked) < count:
+        candidates = [member for member in members if all(member is not p for p in picked)]
+        picked.append(min(candidates, key=lambda member: max(_similarity(member['vector'], p['vector']) for p in picked)))
+    return picked
+
+
+class CohortReport:
+    """Ranked summary of the common mistakes in a cohort's failing submissions.
+
+    Failing submissions (score below 100) are read from the cohort store
+    and grouped by question, language, score bucket and the whitelist
+    violations and potential issues found in their reports. Each group is
+    split further by code similarity, so different wrong approaches to the
+    same question are told apart. One LLM call per cluster describes its
+    failure pattern from a few representative submissions, instead of one
+    call per student. Clusters are ranked by size; only the first
+    max_clusters are summarized.
+    """
+
+    def __init__(self, store, max_clusters=None):
+        self.store = store
+        self.max_clusters = max_clusters or Config.COHORT_REPORT_MAX_CLUSTERS
+
+    def failing_submissions(self, drives=None, test_ids=None):
+        columns = ['test_id', 'question_key', 'question_index', 'language', 'code', 'score', 'report']
+        table = self.store.submissions(columns=columns, drives=drives, test_ids=test_ids)
+        table = table.filter(pc.less(table['score'], 100.0))
+        submissions = table.to_pylist()
+        for submission in submissions:
+            submission['vector'] = code_vector(submission['code'])
+        return submissions
+
+    def clusters(self, submissions):
+        """Failure clusters, largest first."""
+        groups = defaultdict(list)
+        for submission in submissions:
+            findings = tuple(report_findings(submission['report']))
+            groups[(submission['question_key'], submission['language'], score_bucket(submission['score']), findings)].append(submission)
+
+        clusters = []
+        failing_per_question = defaultdict(int)
+        for (key, language, bucket, findings), members in groups.items():
+            failing_per_question[key] += len(members)
+            for cluster_members in cluster_by_code(members):
+                clusters.append({
+                    'question_key': key,
+                    'language': language,
+                    'score_bucket': bucket,
+                    'findings': list(findings),
+                    'members': cluster_members,
+                })
+        for cluster in clusters:
+            scores = [member['score'] for member in cluster['members']]
+            cluster['size'] = len(scores)
+            cluster['mean_score'] = round(sum(scores) / len(scores), 2)
+            cluster['share'] = round(len(scores) / failing_per_question[cluster['question_key']], 3)
+        clusters.sort(key=lambda cluster: (-cluster['size'], cluster['mean_score']))
+        for rank, cluster in enumerate(clusters, 1):
+            cluster['rank'] = rank
+        return clusters
+
+    def _summarize(self, cluster):
+        representatives = pick_representatives(cluster['members'])
+        metadata = question_metadata_cache.find(cluster['question_key'])
+        question_text = metadata.requirements.get('question_text', '') if metadata else ''
+        findings = "\n".join(f"    - {finding}" for finding in cluster['findings']) or "    - none"
+        samples = "\n\n".join(
+            f"    Submission {number} (score {member['score']:.0f}%):\n{member['code'][:MAX_CODE_CHARS]}"
+            for number, member in enumerate(representatives, 1)
+        )
+        prompt = f"""
+    {cluster['size']} students failed this {cluster['language']} question in a similar way ({cluster['score_bucket']}, mean score {cluster['mean_score']:.0f}%).
+
+    Question:
+    {question_text or '(question text not available; infer it from the code)'}
+
+    Findings from the automated checks, shared by all of them:
+{findings}
+
+    Representative submissions:
+
+{samples}
+
+    Describe the mistake these submissions have in common and why it makes test cases fail, in at most 4 lines.
+    Then give one line of advice an instructor could give the whole group.
+    """
+        try:
+            return model_router.complete(
+                [
+                    {"role": "system", "content": "You are an experienced programming instructor reviewing the common mistakes of a class."},
+                    {"role": "user", "content": prompt}
+                ],
+                COHORT_PROMPT
+            )
+        except Exception as e:
+            print(f"DEBUG - Error summarizing failure cluster {cluster['rank']}: {str(e)}")
+            return f"Error generating summary: {str(e)}"
+
+    def build(self, drives=None, test_ids=None):
+        """Ranked failure clusters, each with a 'summary' (None beyond max_clusters)."""
+        clusters = self.clusters(self.failing_submissions(drives, test_ids))
+        print(f"DEBUG - {sum(c['size'] for c in clusters)} failing submissions in {len(clusters)} clusters")
+        summarized = clusters[:self.max_clusters]
+        with ThreadPoolExecutor(max_workers=Config.ANALYSIS_MAX_WORKERS) as executor:
+            for cluster, summary in zip(summarized, executor.map(self._summarize, summarized)):
+                cluster['summary'] = summary
+        for cluster in clusters[self.max_clusters:]:
+            cluster['summary'] = None
+        return clusters
+
+
+def cluster_rows(clusters):
+    """One table row per cluster, without the member submissions."""
+    return [{
+        'rank': cluster['rank'],
+        'question_key': cluster['question_key'],
+        'language': cluster['language'],
+        'score_bucket': cluster['score_bucket'],
+        'students': cluster['size'],
+        'share_of_failures': cluster['share'],
+        'mean_score': cluster['mean_score'],
+        'findings': '; '.join(cluster['findings']),
+    } for cluster in clusters]
+
+
+def format_cohort_report(clusters):
+    report = "Cohort Failure Report\n"
+    report += "=====================\n\n"
+    report += f"Failing submissions: {sum(cluster['size'] for cluster in clusters)} in {len(clusters)} clusters\n"
+    for cluster in clusters:
+        report += f"\n#{cluster['rank']} Question {cluster['question_key']} ({cluster['language']})\n"
+        report += f"Students: {cluster['size']} ({cluster['share']:.0%} of this question's failures), "
+        report += f"mean score {cluster['mean_score']:.0f}%, {cluster['score_bucket']}\n"
+        for finding in cluster['findings']:
+            report += f"- {finding}\n"
+        report += "Submissions: " + ", ".join(
+            f"{member['test_id']}/Q{member['question_index']}" for member in cluster['members']
+        ) + "\n"
+        if cluster['summary']:
+            report += f"\n{cluster['summary']}\n"
+        report += "-" * 50 + "\n"
+    return report
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from config import Config
+from question_metadata import question_key
+
+SUBMISSIONS_SCHEMA = pa.schema([
+    ('test_id', pa.string()),
+    ('drive', pa.string()),
+    ('question_key', pa.string()),
+    ('question_index', pa.int32()),
+    ('language', pa.string()),
+    ('code', pa.string()),
+    ('answer_hash', pa.string()),
+    ('score', pa.float64()),
+    ('max_score', pa.float64()),
+    ('testcases_total', pa.int32()),
+    ('testcases_passed', pa.int32()),
+    ('whitelist_violations', pa.int32()),
+    ('potential_issues', pa.int32()),
+    ('analysis_prompt', pa.string()),
+    ('analysis_error', pa.string()),
+    ('report', pa.string()),
+    ('analyzed_at', pa.float64()),
+])
+
+TESTCASES_SCHEMA = pa.schema([
+    ('test_id', pa.string()),
+    ('drive', pa.string()),
+    ('question_key', pa.string()),
+    ('case_number', pa.int32()),
+    ('case_type', pa.string()),
+    ('difficulty', pa.string()),
+    ('weightage', pa.float64()),
+    ('score', pa.float64()),
+    ('passed', pa.bool_()),
+])
+
+
+def answer_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def analysis_label(analysis_prompt):
+    """analysis_prompt as stored: one focus, or several joined one per line."""
+    if isinstance(analysis_prompt, str):
+        return analysis_prompt
+    return '\n'.join(analysis_prompt)
+
+
+def _partition_name(test_id):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(test_id)) or '_'
+
+
+def _case_statuses(question_data):
+    # Per-case pass/fail from the submit event, when the platform returns it.
+    l_event_data = question_data.get('student_questions', {}).get('l_event_data') or {}
+    return [result.get('status') == 'pass' for result in l_event_data.get('testcase_results') or []]
+
+
+class CohortStore:
+    """Columnar store of analyzed submissions, kept as Parquet files.
+
+    Two tables live under root: submissions (one row per analyzed answer)
+    and testcases (one row per test case of each answer). Each test
+    (testId) is stored in its own file per table; record() rewrites that
+    file, replacing rows for the questions it is given, so re-analyzing
+    a test updates its results in place. Queries scan all files as one
+    Arrow dataset, optionally restricted to some drives or tests.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or Config.COHORT_STORE_DIR
+        self._lock = threading.Lock()
+
+    def _path(self, table, test_id):
+        return os.path.join(self.root, table, f"{_partition_name(test_id)}.parquet")
+
+    def _upsert(self, table, schema, test_id, rows, replaced_keys):
+        path = self._path(table, test_id)
+        new_table = pa.Table.from_pylist(rows, schema=schema)
+        if os.path.exists(path):
+            existing = pq.read_table(path, schema=schema)
+            keep = pc.invert(pc.is_in(existing['question_key'], value_set=pa.array(sorted(replaced_keys), pa.string())))
+            new_table = pa.concat_tables([existing.filter(keep), new_table])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(new_table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def record(self, test_id, coding_answers, analyses, analysis_prompt='', drive=''):
+        """Store the analyses of a test's answers, replacing earlier results for the same questions."""
+        submissions = []
+        testcases = []
+        now = time.time()
+        for index, (answer, analysis) in enumerate(zip(coding_answers, analyses), 1):
+            question = answer['question_data']
+            key = question_key(question)
+            test_results = (analysis.get('test_results') or {}).get('results') or []
+            code_analysis = analysis.get('code_analysis') or {}
+            statuses = _case_statuses(question)
+
+            graded = 0
+            passed_count = 0
+            for result in test_results:
+                passed = result['passed']
+                if result['type'] != 'Sample':
+                    if graded < len(statuses):
+                        passed = statuses[graded]
+                    graded += 1
+                    passed_count += passed
+                testcases.append({
+                    'test_id': test_id,
+                    'drive': drive,
+                    'question_key': key,
+                    'case_number': result['case_number'],
+                    'case_type': result['type'],
+                    'difficulty': result['difficulty'],
+                    'weightage': float(result['weightage']),
+                    'score': float(result['score']),
+                    'passed': bool(passed),
+                })
+
+            score = analysis.get('score')
+            submissions.append({
+                'test_id': test_id,
+                'drive': drive,
+                'question_key': key,
+                'question_index': answer.get('index', index),
+                'language': answer['language'],
+                'code': answer['content'],
+                'answer_hash': answer_hash(answer['content']),
+                'score': float(score) if score is not None else None,
+                'max_score': float((analysis.get('test_results') or {}).get('max_score') or 100),
+                'testcases_total': graded,
+                'testcases_passed': passed_count,
+                'whitelist_violations': len(code_analysis.get('whitelist_violations') or []),
+                'potential_issues': len(code_analysis.get('potential_issues') or []),
+                'analysis_prompt': analysis_label(analysis_prompt),
+                'analysis_error': analysis.get('error'),
+                'report': analysis.get('report'),
+                'analyzed_at': now,
+            })
+
+        replaced_keys = {row['question_key'] for row in submissions}
+        with self._lock:
+            self._upsert('submissions', SUBMISSIONS_SCHEMA, test_id, submissions, replaced_keys)
+            self._upsert('testcases', TESTCASES_SCHEMA, test_id, testcases, replaced_keys)
+        return len(submissions)
+
+    def question_states(self, test_id):
+        """{question_key: stored submission row} for one test; used to find changed answers."""
+        path = self._path('submissions', test_id)
+        if not os.path.exists(path):
+            return {}
+        columns = ['question_key', 'question_index', 'answer_hash', 'analysis_prompt', 'analysis_error', 'report']
+        table = pq.read_table(path, schema=SUBMISSIONS_SCHEMA, columns=columns)
+        return {row['question_key']: row for row in table.to_pylist()}
+
+    def _scan(self, table, schema, columns, drives=None, test_ids=None):
+        directory = os.path.join(self.root, table)
+        if not os.path.isdir(directory):
+            return schema.empty_table().select(columns)
+        dataset = ds.dataset(directory, format='parquet', schema=schema)
+        expression = None
+        if drives:
+            expression = pc.field('drive').isin(list(drives))
+        if test_ids:
+            condition = pc.field('test_id').isin(list(test_ids))
+            expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def submissions(self, columns=None, drives=None, test_ids=None):
+        return self._scan('submissions', SUBMISSIONS_SCHEMA, columns or SUBMISSIONS_SCHEMA.names, drives, test_ids)
+
+    def pass_rate_distribution(self, drives=None, test_ids=None):
+        """Per question: submissions, mean score, quartiles and share of full scores."""
+        table = self._scan('submissions', SUBMISSIONS_SCHEMA, ['question_key', 'score'], drives, test_ids)
+        table = table.filter(pc.is_valid(table['score']))
+        table = table.append_column('full_score', pc.greater_equal(table['score'], 100.0))
+        result = table.group_by('question_key').aggregate([
+            ('score', 'count'),
+            ('score', 'mean'),
+            ('score', 'tdigest', pc.TDigestOptions(q=[0.25, 0.5, 0.75])),
+            ('full_score', 'mean'),
+        ])
+        rows = []
+        for row in result.to_pylist():
+            q25, median, q75 = row['score_tdigest']
+            rows.append({
+                'question_key': row['question_key'],
+                'submissions': row['score_count'],
+                'mean_score': round(row['score_mean'], 2),
+                'p25': round(q25, 2),
+                'median': round(median, 2),
+                'p75': round(q75, 2),
+                'full_score_rate': round(row['full_score_mean'], 3),
+            })
+        return sorted(rows, key=lambda r: r['mean_score'])
+
+    def hardest_testcases(self, limit=10, drives=None, test_ids=None):
+        """Graded test cases with the lowest pass rate across submissions."""
+        table = self._scan('testcases', TESTCASES_SCHEMA, ['question_key', 'case_number', 'difficulty', 'case_type', 'passed'], drives, test_ids)
+        table = table.filter(pc.not_equal(table['case_type'], 'Sample'))
+        table = table.append_column('passed_int', pc.cast(table['passed'], pa.int8()))
+        result = table.group_by(['question_key', 'case_number', 'difficulty']).aggregate([
+            ('passed_int', 'mean'),
+            ('passed_int', 'count'),
+        ])
+        result = result.sort_by([('passed_int_mean', 'ascending'), ('passed_int_count', 'descending')]).slice(0, limit)
+        return [{
+            'question_key': row['question_key'],
+            'case_number': row['case_number'],
+            'difficulty': row['difficulty'],
+            'attempts': row['passed_int_count'],
+            'pass_rate': round(row['passed_int_mean'], 3),
+        } for row in result.to_pylist()]
+
+    def language_breakdown(self, drives=None, test_ids=None):
+        """Submissions and mean score per language."""
+        table = self._scan('submissions', SUBMISSIONS_SCHEMA, ['language', 'score'], drives, test_ids)
+        result = table.group_by('language').aggregate([('language', 'count'), ('score', 'mean')])
+        rows = [{
+            'language': row['language'],
+            'submissions': row['language_count'],
+            'mean_score': round(row['score_mean'], 2) if row['score_mean'] is not None else None,
+        } for row in result.to_pylist()]
+        return sorted(rows, key=lambda r: -r['submissions'])
+
+    def drives(self):
+        table = self._scan('submissions', SUBMISSIONS_SCHEMA, ['drive'])
+        return sorted(d for d in pc.unique(table['drive']).to_pylist() if d)
@@ -8,3 +8,22 @@ class Config:
     AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
     AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION')
     AZURE_OPENAI_MODEL = os.getenv('AZURE_OPENAI_MODEL')
+    # Deployments for the model router's tiers; each defaults to AZURE_OPENAI_MODEL, and a tier left
+    # on it keeps that deployment's token cap and temperature (see model_router.default_tiers).
+    AZURE_OPENAI_MODEL_SMALL = os.getenv('AZURE_OPENAI_MODEL_SMALL') or AZURE_OPENAI_MODEL
+    AZURE_OPENAI_MODEL_MEDIUM = os.getenv('AZURE_OPENAI_MODEL_MEDIUM') or AZURE_OPENAI_MODEL
+    AZURE_OPENAI_MODEL_LARGE = os.getenv('AZURE_OPENAI_MODEL_LARGE') or AZURE_OPENAI_MODEL
+    # Optional "input,output" price per 1,000 tokens of each tier, for cost reporting.
+    AZURE_OPENAI_COST_SMALL = os.getenv('AZURE_OPENAI_COST_SMALL')
+    AZURE_OPENAI_COST_MEDIUM = os.getenv('AZURE_OPENAI_COST_MEDIUM')
+    AZURE_OPENAI_COST_LARGE = os.getenv('AZURE_OPENAI_COST_LARGE')
+    # Upper bound on answers analyzed at once; the flow controller decides how
+    # many LLM calls actually run concurrently.
+    ANALYSIS_MAX_WORKERS = int(os.getenv('ANALYSIS_MAX_WORKERS', '16'))
+    COHORT_STORE_DIR = os.getenv('COHORT_STORE_DIR', 'cohort_store')
+    # Failure clusters summarized by the LLM in a cohort report, largest first.
+    COHORT_REPORT_MAX_CLUSTERS = int(os.getenv('COHORT_REPORT_MAX_CLUSTERS', '10'))
+    # Watch mode polls every WATCH_INTERVAL_SECONDS, backing off to WATCH_MAX_INTERVAL_SECONDS while nothing changes.
+    WATCH_INTERVAL_SECONDS = float(os.getenv('WATCH_INTERVAL_SECONDS', '30'))
+    WATCH_MAX_INTERVAL_SECONDS = float(os.getenv('WATCH_MAX_INTERVAL_SECONDS', '300'))
+    EXAMLY_API_BASE = os.getenv('EXAMLY_API_BASE', 'https://api.examly.io').rstrip('/')
@@ -1,20 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
 class FileHandler:
+    def analyze_answers(self, coding_answers, analysis_prompt, analyzer):
+        """Analyze answers concurrently; returns the structured analyses in answer order."""
+        return list(self._analyze(coding_answers, analysis_prompt, analyzer))
+
     def save_analysis(self, coding_answers, analysis_prompt, analyzer):
+        """Analyze every answer, write analysis_report.txt and return the
+        structured analyses (see GPTAnalyzer.analyze_submission) in answer order."""
+        results = []
+        # Answers are analyzed concurrently and written in their original order
+        # as soon as each one (and every one before it) is done.
         with open('analysis_report.txt', 'w', encoding='utf-8') as f:
-            for i, answer in enumerate(coding_answers, 1):
-                f.write(f"\nQuestion {i}:\n")
-                f.write(f"Language: {answer['language']}\n")
-                f.write(f"File: {answer['filename']}\n")
-                f.write("\nStudent's Code:\n")
-                f.write("-------------\n")
-                f.write(answer['content'])
-                f.write("\n\nAnalysis Report:\n")
-                f.write("---------------\n")
-                
-                analysis = analyzer.analyze_code(
-                    answer['content'],
-                    answer['question_data'],
-                    analysis_prompt
-                )
-                f.write(analysis)
-                f.write("\n" + "="*50 + "\n")
+            for i, (answer, analysis) in enumerate(zip(coding_answers, self._analyze(coding_answers, analysis_prompt, analyzer)), 1):
+                self._write_entry(f, i, answer, analysis['report'])
+                results.append(analysis)
+        return results
+
+    def write_report(self, coding_answers, reports, path='analysis_report.txt'):
+        """Write a report from answers and their already computed report texts."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for i, (answer, report) in enumerate(zip(coding_answers, reports), 1):
+                self._write_entry(f, i, answer, report)
+
+    def _analyze(self, coding_answers, analysis_prompt, analyzer):
+        def analyze(answer):
+            return analyzer.analyze_submission(
+                answer['content'],
+                answer['question_data'],
+                analysis_prompt,
+                answer.get('metadata')
+            )
+
+        with ThreadPoolExecutor(max_workers=Config.ANALYSIS_MAX_WORKERS) as executor:
+            yield from executor.map(analyze, coding_answers)
+
+    def _write_entry(self, f, i, answer, report):
+        f.write(f"\nQuestion {i}:\n")
+        f.write(f"Language: {answer['language']}\n")
+        f.write(f"File: {answer['filename']}\n")
+        f.write("\nStudent's Code:\n")
+        f.write("-------------\n")
+        f.write(answer['content'])
+        f.write("\n\nAnalysis Report:\n")
+        f.write("---------------\n")
+        f.write(report)
+        f.write("\n" + "="*50 + "\n")
@@ -0,0 +1,204 @@
+# Keep in sync: mcq-generator-master/flow_control.py and
+# cod-analyizer-master/code_analysis/flow_control.py are byte-identical copies.
+# Make every change to both files in the same commit.
+"""Adaptive concurrency limits for outbound calls.
+
+Every upstream endpoint gets an AdaptiveLimiter that caps how many calls
+to it are in flight. The cap follows AIMD: it grows by about one for every
+`limit` successful calls and is cut by FLOW_BACKOFF_RATIO when the endpoint
+answers 429 or 5xx or the call fails outright. Cuts happen at most once
+per cooldown, so a burst of failures from calls that were already in
+flight counts as a single signal. Growth also pauses while recent latency
+is well above its long-run average, because upstream queueing shows up
+there before it shows up as errors.
+
+Usage:
+
+    with flow_controller.slot(endpoint_name(url)) as call:
+        response = session.post(url, ...)
+        call.status = response.status_code
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FLOW_INITIAL_LIMIT = float(os.getenv('FLOW_INITIAL_LIMIT', '4'))
+FLOW_MIN_LIMIT = float(os.getenv('FLOW_MIN_LIMIT', '1'))
+FLOW_MAX_LIMIT = float(os.getenv('FLOW_MAX_LIMIT', '32'))
+FLOW_BACKOFF_RATIO = float(os.getenv('FLOW_BACKOFF_RATIO', '0.5'))
+FLOW_COOLDOWN_SECONDS = float(os.getenv('FLOW_COOLDOWN_SECONDS', '1'))
+# Growth pauses while short-term latency exceeds this multiple of the long-term average.
+FLOW_LATENCY_TOLERANCE = float(os.getenv('FLOW_LATENCY_TOLERANCE', '2'))
+
+SHORT_LATENCY_WEIGHT = 0.2
+LONG_LATENCY_WEIGHT = 0.02
+
+
+def endpoint_name(url):
+    """Host and path of a URL, used as the limiter key for HTTP endpoints."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}{parts.path}"
+
+
+def exception_status(error):
+    """HTTP status carried by a requests or openai exception, if any."""
+    for attr in ('status_code', 'http_status'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_transport_error(error):
+    """Timeouts and connection failures, which say the endpoint is struggling."""
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    return any('Timeout' in cls.__name__ or 'Connection' in cls.__name__ for cls in type(error).__mro__)
+
+
+class CallResult:
+    """Set status on the object yielded by slot() once the response is known."""
+
+    def __init__(self):
+        self.status = None
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial_limit=FLOW_INITIAL_LIMIT, min_limit=FLOW_MIN_LIMIT, max_limit=FLOW_MAX_LIMIT,
+                 backoff_ratio=FLOW_BACKOFF_RATIO, cooldown=FLOW_COOLDOWN_SECONDS, latency_tolerance=FLOW_LATENCY_TOLERANCE):
+        self.name = name
+        self.limit = min(max(initial_limit, min_limit), max_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.cooldown = cooldown
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.waiting = 0
+        self.counts = {'succeeded': 0, 'throttled': 0, 'errors': 0, 'client_errors': 0, 'local_errors': 0, 'retries': 0}
+        self._latencies = deque(maxlen=200)
+        self._short_latency = None
+        self._long_latency = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            self.waiting += 1
+            try:
+                self._cond.wait_for(lambda: self.in_flight < max(1, int(self.limit)))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, latency, status=None, failed=False, local_error=False):
+        """End a call. failed marks a timeout or connection failure; local_error
+        an exception raised on our side, which says nothing about the endpoint."""
+        with self._cond:
+            self.in_flight -= 1
+            if failed or status == 429 or (status is not None and status >= 500):
+                self.counts['throttled' if status == 429 else 'errors'] += 1
+                self._decrease()
+            elif status is not None and status >= 400:
+                # The request was wrong, not the endpoint overloaded.
+                self.counts['client_errors'] += 1
+            elif local_error:
+                self.counts['local_errors'] += 1
+            else:
+                self.counts['succeeded'] += 1
+                self._observe_latency(latency)
+                if not self._congested():
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def record_retry(self, status=None):
+        """A retry made below this layer (e.g. by urllib3) for a throttled or failed attempt."""
+        with self._cond:
+            self.counts['retries'] += 1
+            if status is None or status == 429 or status >= 500:
+                self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+    def _observe_latency(self, latency):
+        self._latencies.append(latency)
+        if self._short_latency is None:
+            self._short_latency = self._long_latency = latency
+        else:
+            self._short_latency += SHORT_LATENCY_WEIGHT * (latency - self._short_latency)
+            self._long_latency += LONG_LATENCY_WEIGHT * (latency - self._long_latency)
+
+    def _congested(self):
+        return self._long_latency and self._short_latency > self.latency_tolerance * self._long_latency
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of a call."""
+        self.acquire()
+        call = CallResult()
+        failed = local_error = False
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception as e:
+            if call.status is None:
+                call.status = exception_status(e)
+                failed = call.status is None and is_transport_error(e)
+                local_error = call.status is None and not failed
+            raise
+        finally:
+            self.release(time.perf_counter() - start, call.status, failed, local_error)
+
+    def snapshot(self):
+        with self._cond:
+            latencies = sorted(self._latencies)
+            return {
+                'endpoint': self.name,
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                **self.counts,
+                'p50_ms': round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else None,
+            }
+
+
+class FlowController:
+    """Registry of per-endpoint limiters."""
+
+    def __init__(self, **limiter_options):
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._limiter_options = limiter_options
+
+    def limiter(self, name):
+        with self._lock:
+            if name not in self._limiters:
+                self._limiters[name] = AdaptiveLimiter(name, **self._limiter_options)
+            return self._limiters[name]
+
+    def slot(self, name):
+        return self.limiter(name).slot()
+
+    def record_retry(self, name, status=None):
+        self.limiter(name).record_retry(status)
+
+    def snapshot(self):
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return sorted((limiter.snapshot() for limiter in limiters), key=lambda row: row['endpoint'])
+
+
+flow_controller = FlowController()
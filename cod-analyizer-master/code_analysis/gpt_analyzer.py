@@ -1,6 +1,9 @@
 import json
+from collections.abc import Mapping
 import openai
 from config import Config
+from model_router import focus_list, model_router, requested_line_count
+from question_metadata import QuestionMetadata, freeze, question_key, question_metadata_cache
 import traceback
 
 # Configure OpenAI to use Azure OpenAI
@@ -15,30 +18,67 @@ class GPTAnalyzer:
         pass
 
     def analyze_code(self, code_content, question_data, analysis_prompt):
+        return self.analyze_submission(code_content, question_data, analysis_prompt)['report']
+
+    def question_metadata(self, question_data):
+        """Parsed, shared metadata of a full question payload (cached per question)."""
+        return question_metadata_cache.get(question_data, self._build_metadata)
+
+    def _build_metadata(self, question_data):
+        return QuestionMetadata(
+            key=question_key(question_data),
+            marks=question_data.get('marks', 0),
+            requirements=freeze(self._extract_requirements(question_data)),
+            test_cases=freeze(self._extract_test_cases(question_data)),
+            solution=self._extract_solution(question_data)
+        )
+
+    def analyze_submission(self, code_content, question_data, analysis_prompt, metadata=None):
+        """Analyze one answer and return the parts of the analysis as a dict.
+
+        Keys: score, test_results, code_analysis, insights, error and
+        report (the text report analyze_code returns). When metadata is
+        given, question_data only needs the student_questions part.
+        """
         try:
             # Debug prints
             print("\nDEBUG - Starting analysis")
             print("DEBUG - Question data keys:", question_data.keys())
             
             # Get the actual test score
-            actual_score = self._get_test_score_from_question(question_data)
+            metadata = metadata or self.question_metadata(question_data)
+            actual_score = self._get_test_score_from_question(question_data, metadata.marks)
             print(f"DEBUG - Final calculated score: {actual_score}")
             
-            requirements = self._extract_requirements(question_data)
-            test_cases = self._extract_test_cases(question_data)
-            solution = self._extract_solution(question_data)
+            requirements = metadata.requirements
+            test_cases = metadata.test_cases
+            solution = metadata.solution
             
             test_results = self._run_test_case_analysis(test_cases, actual_score)
             code_analysis = self._analyze_code_structure(code_content, requirements, solution)
             gpt_insights = self._get_gpt_insights(code_content, requirements, analysis_prompt, actual_score)
             
-            return self._format_analysis_report(test_results, code_analysis, gpt_insights, requirements)
+            return {
+                'score': actual_score,
+                'test_results': test_results,
+                'code_analysis': code_analysis,
+                'insights': gpt_insights,
+                'error': None,
+                'report': self._format_analysis_report(test_results, code_analysis, gpt_insights, requirements)
+            }
         except Exception as e:
             print(f"DEBUG - Error in analysis: {str(e)}")
             traceback.print_exc()
-            return f"Error in analysis: {str(e)}"
-
-    def _get_test_score_from_question(self, question_data):
+            return {
+                'score': None,
+                'test_results': None,
+                'code_analysis': None,
+                'insights': None,
+                'error': str(e),
+                'report': f"Error in analysis: {str(e)}"
+            }
+
+    def _get_test_score_from_question(self, question_data, total_marks=None):
         try:
             print("\nDEBUG - Checking test cases")
             student_questions = question_data.get('student_questions', {})
@@ -51,7 +91,8 @@ class GPTAnalyzer:
                 
                 marks = student_questions.get('marks')
                 if marks is not None:
-                    total_marks = question_data.get('marks', 0)
+                    if total_marks is None:
+                        total_marks = question_data.get('marks', 0)
                     if total_marks > 0:
                         percentage = (float(marks) / float(total_marks)) * 100
                         print(f"DEBUG - Calculated from marks: {percentage}")
@@ -81,13 +122,20 @@ class GPTAnalyzer:
             traceback.print_exc()
             return 0
 
+    def _first_solution(self, question_data):
+        # solution may be missing, empty or malformed in the payload
+        solutions = question_data.get('programming_question', {}).get('solution')
+        if isinstance(solutions, list) and solutions and isinstance(solutions[0], dict):
+            return solutions[0]
+        return {}
+
     def _extract_requirements(self, question_data):
         return {
             'question_text': question_data.get('question_data', ''),
             'input_format': question_data.get('programming_question', {}).get('input_format', ''),
             'output_format': question_data.get('programming_question', {}).get('output_format', ''),
             'constraints': question_data.get('programming_question', {}).get('code_constraints', ''),
-            'whitelist': question_data.get('programming_question', {}).get('solution', [{}])[0].get('whitelist', [])
+            'whitelist': self._first_solution(question_data).get('whitelist', [])
         }
 
     def _extract_test_cases(self, question_data):
@@ -131,9 +179,9 @@ class GPTAnalyzer:
         return test_cases
 
     def _extract_solution(self, question_data):
-        solutions = question_data.get('programming_question', {}).get('solution', [{}])
-        if solutions and solutions[0].get('solutiondata'):
-            return solutions[0]['solutiondata'][0].get('solution', '')
+        solution_data = self._first_solution(question_data).get('solutiondata')
+        if isinstance(solution_data, list) and solution_data and isinstance(solution_data[0], dict):
+            return solution_data[0].get('solution', '')
         return ''
 
     def _analyze_code_structure(self, code_content, requirements, solution):
@@ -150,8 +198,9 @@ class GPTAnalyzer:
             analysis['potential_issues'].append("Count variable initialized locally instead of as instance variable")
 
         whitelist = requirements.get('whitelist', [])
-        if whitelist and isinstance(whitelist, list):
-            if len(whitelist) > 0 and isinstance(whitelist[0], dict) and 'list' in whitelist[0]:
+        # Cached metadata holds tuples and read-only mappings instead of lists and dicts
+        if whitelist and isinstance(whitelist, (list, tuple)):
+            if len(whitelist) > 0 and isinstance(whitelist[0], Mapping) and 'list' in whitelist[0]:
                 for item in whitelist[0]['list']:
                     if item not in code_content:
                         analysis['whitelist_violations'].append(f"Missing required element: {item}")
@@ -192,16 +241,64 @@ class GPTAnalyzer:
             if actual_score == 100:
                 return "All test cases passed successfully. The code meets all requirements."
 
+            # Several focuses are answered in one sectioned request; see _get_sectioned_insights
+            focuses = focus_list(analysis_prompt)
+            if len(focuses) > 1:
+                return self._get_sectioned_insights(code_content, requirements, focuses, actual_score)
+            analysis_prompt = focuses[0]
+
             # Extract line count requirement if it exists
-            line_count = None
-            if "in" in analysis_prompt.lower() and "line" in analysis_prompt.lower():
-                try:
-                    line_count = int(''.join(filter(str.isdigit, analysis_prompt)))
-                except:
-                    pass
+            line_count = requested_line_count(analysis_prompt)
 
             # Construct a more detailed prompt for clarity and precision
-            prompt = f"""
+            prompt = self._review_context(code_content, requirements, actual_score) + f"""
+    {f'Limit your response to exactly {line_count} lines.' if line_count else 'Present your analysis as clear bullet points.'}
+    """
+
+            # The router picks the deployment, token cap and temperature for this kind of prompt
+            analysis = model_router.complete(
+                [
+                    {"role": "system", "content": "You are a precise and concise code reviewer. Provide clear, step-by-step analysis."},
+                    {"role": "user", "content": prompt}
+                ],
+                analysis_prompt
+            )
+
+            # Enforce line count if specified
+            return self._limit_lines(analysis, line_count)
+
+        except Exception as e:
+            print(f"Error in GPT analysis: {str(e)}")
+            return "Error generating analysis. Please try again."
+
+    def _get_sectioned_insights(self, code_content, requirements, focuses, actual_score):
+        """{focus: insights} for several focuses from a single request.
+
+        The code and requirements are sent once; each focus gets its own
+        field in the structured response.
+        """
+        instructions = []
+        for number, focus in enumerate(focuses, 1):
+            line_count = requested_line_count(focus)
+            limit = f" (exactly {line_count} lines)" if line_count else " (clear bullet points)"
+            instructions.append(f"    focus_{number}: {focus}{limit}")
+
+        prompt = self._review_context(code_content, requirements, actual_score) + """
+    Write a separate section for each of these focuses, in the matching field of report_analysis:
+""" + "\n".join(instructions) + "\n"
+
+        sections = model_router.complete_sections(
+            [
+                {"role": "system", "content": "You are a precise and concise code reviewer. Provide clear, step-by-step analysis."},
+                {"role": "user", "content": prompt}
+            ],
+            focuses
+        )
+        return {focus: self._limit_lines(sections[focus], requested_line_count(focus)) for focus in focuses}
+
+    def _review_context(self, code_content, requirements, actual_score):
+        # The part of the review prompt shared by every focus
+        return f"""
     You are an expert code reviewer and evaluator with a focus on clarity and precision.
     Review the following Java code implementation of a Student Management System.
 
@@ -219,36 +316,17 @@ class GPTAnalyzer:
     - Identify specific missing elements (e.g., required constructors, methods such as 'displayInfo' or 'addStudent') if any.
     - Provide actionable, precise recommendations for improvement.
     - Explain how the code deviates from the requirements.
-
-    {f'Limit your response to exactly {line_count} lines.' if line_count else 'Present your analysis as clear bullet points.'}
-    """
-
-            response = openai.ChatCompletion.create(
-                engine=Config.AZURE_OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a precise and concise code reviewer. Provide clear, step-by-step analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=900
-            )
-
-            analysis = response.choices[0].message.content.strip()
-
-            # Enforce line count if specified
-            if line_count:
-                lines = analysis.split('\n')
-                if len(lines) > line_count:
-                    lines = lines[:line_count]
-                elif len(lines) < line_count:
-                    lines.extend([''] * (line_count - len(lines)))
-                analysis = '\n'.join(lines)
-
-            return analysis
-
-        except Exception as e:
-            print(f"Error in GPT analysis: {str(e)}")
-            return "Error generating analysis. Please try again."
+"""
+
+    def _limit_lines(self, analysis, line_count):
+        if line_count:
+            lines = analysis.split('\n')
+            if len(lines) > line_count:
+                lines = lines[:line_count]
+            elif len(lines) < line_count:
+                lines.extend([''] * (line_count - len(lines)))
+            analysis = '\n'.join(lines)
+        return analysis
 
     def _format_analysis_report(self, test_results, code_analysis, gpt_insights, requirements):
         report = "Code Analysis Report\n"
@@ -287,6 +365,11 @@ class GPTAnalyzer:
         # GPT Insights
         report += "\nAI Analysis Insights:\n"
         report += "-------------------\n"
-        report += gpt_insights + "\n"
+        if isinstance(gpt_insights, dict):
+            # One section per analysis focus; parse_focus_sections in app.py splits them again
+            for focus, insights in gpt_insights.items():
+                report += f"Focus: {focus}\n{insights}\n\n"
+        else:
+            report += gpt_insights + "\n"
 
         return report
@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from collections import deque
+import openai
+from config import Config
+from flow_control import flow_controller
+
+# The analysis focuses offered in the app. The first asks for a short
+# diagnosis; the rest are focused reviews. Anything else is a custom prompt.
+ANALYSIS_FOCUSES = [
+    "Check why the testcase failed, give in 3 lines",
+    "Check if the code has logical errors and syntax issues only",
+    "Verify if the code meets the basic requirements and handles edge cases",
+    "Identify any missing critical functionality",
+    "Check for proper error handling and validation",
+]
+
+# Prompts asking for at most this many lines are short diagnostics.
+SHORT_PROMPT_MAX_LINES = 5
+
+# Token cap and temperature of a call to AZURE_OPENAI_MODEL, as before tiers existed.
+DEFAULT_MAX_TOKENS = 900
+DEFAULT_TEMPERATURE = 0.7
+
+# Token caps are multiplied by the number of focuses in a sectioned request, up to this.
+MAX_SECTIONED_TOKENS = 4000
+
+# Tiers tried for each prompt class, in order. A tier whose deployment was
+# already tried for the prompt is skipped, so with a single deployment
+# configured there is no fallback.
+ROUTES = {
+    'short': ['small', 'medium', 'large'],
+    'focused': ['medium', 'large', 'small'],
+    'deep': ['large', 'medium'],
+}
+
+
+def requested_line_count(analysis_prompt):
+    """Line limit asked for in the prompt ("... in 3 lines"), or None."""
+    if "in" in analysis_prompt.lower() and "line" in analysis_prompt.lower():
+        try:
+            return int(''.join(filter(str.isdigit, analysis_prompt)))
+        except ValueError:
+            pass
+    return None
+
+
+def focus_list(analysis_prompt):
+    """The analysis focuses of a run; analysis_prompt is one focus or a list of them."""
+    if isinstance(analysis_prompt, str):
+        return [analysis_prompt]
+    return [focus for focus in analysis_prompt if focus]
+
+
+def classify_prompt(analysis_prompt):
+    """'short', 'focused' or 'deep'. Several focuses take the class of the deepest."""
+    classes = []
+    for focus in focus_list(analysis_prompt):
+        line_count = requested_line_count(focus)
+        if line_count and line_count <= SHORT_PROMPT_MAX_LINES:
+            classes.append('short')
+        elif focus in ANALYSIS_FOCUSES:
+            classes.append('focused')
+        else:
+            classes.append('deep')
+    return max(classes, key=list(ROUTES).index, default='focused')
+
+
+class ModelTier:
+    """One deployment with its token cap, temperature, prices and call stats.
+
+    Prices are per 1,000 tokens; cost is reported as 0 when they are not set.
+    """
+
+    def __init__(self, name, deployment, max_tokens, temperature, input_cost=0.0, output_cost=0.0):
+        self.name = name
+        self.deployment = deployment
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.input_cost = input_cost
+        self.output_cost = output_cost
+        self.counts = {'calls': 0, 'failures': 0, 'fallbacks': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def record(self, latency, usage=None, failed=False, fallback=False):
+        with self._lock:
+            self.counts['calls'] += 1
+            self.counts['fallbacks'] += fallback
+            if failed:
+                self.counts['failures'] += 1
+                return
+            self._latencies.append(latency)
+            usage = usage or {}
+            self.counts['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            self.counts['completion_tokens'] += usage.get('completion_tokens') or 0
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            cost = (self.counts['prompt_tokens'] * self.input_cost + self.counts['completion_tokens'] * self.output_cost) / 1000
+            return {
+                'tier': self.name,
+                'deployment': self.deployment,
+                'max_tokens': self.max_tokens,
+                **self.counts,
+                'p50_ms': round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000) if latencies else None,
+                'cost': round(cost, 4),
+            }
+
+
+def _costs(value):
+    # "input,output" price per 1,000 tokens
+    if not value:
+        return 0.0, 0.0
+    input_cost, output_cost = (float(part) for part in value.split(','))
+    return input_cost, output_cost
+
+
+def _tier(name, deployment, max_tokens, temperature, costs):
+    # A tier left on the default deployment behaves like a call to it.
+    if deployment == Config.AZURE_OPENAI_MODEL:
+        max_tokens, temperature = DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE
+    return ModelTier(name, deployment, max_tokens, temperature, *_costs(costs))
+
+
+def default_tiers():
+    return {
+        'small': _tier('small', Config.AZURE_OPENAI_MODEL_SMALL, 250, 0.2, Config.AZURE_OPENAI_COST_SMALL),
+        'medium': _tier('medium', Config.AZURE_OPENAI_MODEL_MEDIUM, 600, 0.4, Config.AZURE_OPENAI_COST_MEDIUM),
+        'large': _tier('large', Config.AZURE_OPENAI_MODEL_LARGE, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, Config.AZURE_OPENAI_COST_LARGE),
+    }
+
+
+class ModelRouter:
+    """Sends each analysis prompt to the deployment suited to its class.
+
+    Short diagnostics go to the small tier with a low token cap, the preset
+    focuses to the medium tier and custom reviews to the large one. The
+    lower caps and temperatures only apply to tiers given their own
+    deployment. When a call fails, the next tier in the route is tried.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = tiers or default_tiers()
+
+    def route(self, prompt_class):
+        tiers = []
+        deployments = set()
+        for name in ROUTES[prompt_class]:
+            tier = self.tiers.get(name)
+            if tier and tier.deployment and tier.deployment not in deployments:
+                deployments.add(tier.deployment)
+                tiers.append(tier)
+        return tiers
+
+    def _create(self, messages, analysis_prompt, parse, sections=1, **options):
+        # Try the tiers of the prompt's route in turn; parse(response) failing counts as a failed call.
+        prompt_class = classify_prompt(analysis_prompt)
+        last_error = None
+        for attempt, tier in enumerate(self.route(prompt_class)):
+            start = time.perf_counter()
+            try:
+                with flow_controller.slot(f"azure-openai/{tier.deployment}"):
+                    response = openai.ChatCompletion.create(
+                        engine=tier.deployment,
+                        messages=messages,
+                        temperature=tier.temperature,
+                        max_tokens=min(tier.max_tokens * sections, max(tier.max_tokens, MAX_SECTIONED_TOKENS)),
+                        **options
+                    )
+                result = parse(response)
+            except Exception as e:
+                tier.record(time.perf_counter() - start, failed=True, fallback=attempt > 0)
+                print(f"DEBUG - {tier.name} tier ({tier.deployment}) failed for {prompt_class} prompt: {str(e)}")
+                last_error = e
+                continue
+            tier.record(time.perf_counter() - start, response.get('usage'), fallback=attempt > 0)
+            return result
+        raise last_error or Exception("No model deployment configured")
+
+    def complete(self, messages, analysis_prompt):
+        """Chat completion text for messages, routed by analysis_prompt's class."""
+        return self._create(messages, analysis_prompt, lambda response: response.choices[0].message.content.strip())
+
+    def complete_sections(self, messages, focuses):
+        """One completion answering every focus; returns {focus: text}.
+
+        The model is made to call a report_analysis function whose
+        arguments hold one string per focus, so the sections come back
+        keyed instead of having to be split out of free text.
+        """
+        keys = [f"focus_{i}" for i in range(1, len(focuses) + 1)]
+        function = {
+            "name": "report_analysis",
+            "description": "Report the code review, one section per analysis focus.",
+            "parameters": {
+                "type": "object",
+                "properties": {key: {"type": "string", "description": focus} for key, focus in zip(keys, focuses)},
+                "required": keys,
+            },
+        }
+
+        def parse(response):
+            arguments = json.loads(response.choices[0].message.function_call.arguments)
+            return {focus: str(arguments.get(key) or '').strip() for key, focus in zip(keys, focuses)}
+
+        return self._create(
+            messages, focuses, parse, sections=len(focuses),
+            functions=[function], function_call={"name": "report_analysis"}
+        )
+
+    def snapshot(self):
+        return [tier.snapshot() for tier in self.tiers.values()]
+
+
+model_router = ModelRouter()
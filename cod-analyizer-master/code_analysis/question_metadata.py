@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+# Everything about a question that is the same for every student who took it,
+# parsed once. requirements is a read-only mapping and test_cases a tuple of
+# read-only mappings, so one instance can be shared across threads.
+QuestionMetadata = namedtuple('QuestionMetadata', ['key', 'marks', 'requirements', 'test_cases', 'solution'])
+
+
+def question_key(question):
+    """Identifies a question across students: its id when the payload has one,
+    otherwise a hash of the question text."""
+    if question.get('question_key'):
+        return question['question_key']
+    for field in ('q_id', 'question_id', 'id'):
+        if question.get(field):
+            return str(question[field])
+    return hashlib.sha256(str(question.get('question_data', '')).encode('utf-8')).hexdigest()[:16]
+
+
+def freeze(value):
+    """Read-only copy of parsed JSON: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def slim_question(question, metadata):
+    """The per-student part of a question: its key and student_questions only."""
+    return {'question_key': metadata.key, 'student_questions': question.get('student_questions', {})}
+
+
+class QuestionMetadataCache:
+    """Process-wide LRU cache of QuestionMetadata.
+
+    Entries are keyed by the question key plus a hash of the raw test-case
+    and sample strings, so an edited question is parsed again rather than
+    served stale.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(question):
+        # The raw strings are hashed rather than kept, so entries stay small.
+        programming_question = question.get('programming_question', {})
+        raw = f"{programming_question.get('testcases') or ''}\0{programming_question.get('sample_io') or ''}"
+        return question_key(question), hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, question, build):
+        """Return the metadata for question, calling build(question) on a miss."""
+        cache_key = self._cache_key(question)
+        with self._lock:
+            metadata = self._entries.get(cache_key)
+            if metadata is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return metadata
+            self.misses += 1
+
+        # Parsed outside the lock; two threads may occasionally both build the same entry.
+        metadata = build(question)
+        with self._lock:
+            self._entries[cache_key] = metadata
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return metadata
+
+    def find(self, key):
+        """The most recently used metadata for a question key, or None."""
+        with self._lock:
+            for (entry_key, _), metadata in reversed(self._entries.items()):
+                if entry_key == key:
+                    return metadata
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+question_metadata_cache = QuestionMetadataCache()
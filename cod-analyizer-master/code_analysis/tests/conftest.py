@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The analyzer modules import each other by bare name, as when run with streamlit from code_analysis/.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,55 @@
+import json
+from code_extractor import CodeExtractor
+from gpt_analyzer import GPTAnalyzer
+
+
+def _question(q_id, solution, score=100):
+    return {
+        'q_id': q_id,
+        'question_data': f'Question {q_id}',
+        'marks': 100,
+        'programming_question': {'solution': solution},
+        'student_questions': {
+            'answer': json.dumps({'language_name': 'Python', 'answer': 'print(1)'}),
+            'testcase_percentage': score,
+        },
+    }
+
+
+def _response(*questions):
+    return {'frozen_test_data': [{'name': 'COD', 'questions': list(questions)}]}
+
+
+def test_empty_solution_does_not_abort_extraction():
+    extractor = CodeExtractor()
+    answers = extractor.extract_coding_answers(_response(
+        _question('good', [{'whitelist': [], 'solutiondata': [{'solution': 'print(1)'}]}]),
+        _question('empty', []),
+        _question('malformed', 'not a list'),
+    ))
+    assert [answer['index'] for answer in answers] == [1, 2, 3]
+    assert all(answer.get('metadata') for answer in answers)
+    assert answers[1]['metadata'].requirements['whitelist'] == ()
+    assert answers[1]['metadata'].solution == ''
+
+
+def test_metadata_error_is_reported_on_that_answer_only(monkeypatch):
+    extractor = CodeExtractor()
+    analyzer = extractor.gpt_analyzer
+
+    def broken(question_data):
+        if question_data.get('q_id') == 'bad':
+            raise IndexError('list index out of range')
+        return GPTAnalyzer._build_metadata(analyzer, question_data)
+
+    monkeypatch.setattr(analyzer, '_build_metadata', broken)
+    answers = extractor.extract_coding_answers(_response(
+        _question('ok-1', [{}]), _question('bad', [{}]), _question('ok-2', [{}])
+    ))
+    assert len(answers) == 3
+    assert 'metadata' not in answers[1]
+
+    analyses = [analyzer.analyze_submission(a['content'], a['question_data'], 'Check', a.get('metadata')) for a in answers]
+    assert analyses[1]['error'] == 'list index out of range'
+    assert analyses[1]['report'].startswith('Error in analysis')
+    assert analyses[0]['error'] is None and analyses[2]['error'] is None
@@ -0,0 +1,109 @@
+import threading
+
+import cohort_report
+from cohort_report import (
+    CohortReport, cluster_by_code, code_vector, format_cohort_report, pick_representatives, report_findings, _similarity
+)
+from cohort_store import CohortStore
+
+OFF_BY_ONE = "def total(xs):\n    s = 0\n    for i in range(1, len(xs)):\n        s += xs[i]\n    return s\n"
+NO_RETURN = "def total(xs):\n    s = 0\n    for x in xs:\n        s += x\n    print(s)\n"
+PASSING = "def total(xs):\n    return sum(xs)\n"
+
+REPORT = """Code Analysis Report
+Missing Required Elements:
+- sum
+Potential Issues:
+- loop skips the first element
+
+Score: 40"""
+
+
+def _submission(code, number):
+    return {'code': code + f"# student {number}\n", 'vector': code_vector(code + f"# student {number}\n")}
+
+
+def _record(store, test_id, code, score, report=REPORT, key='q-total', language='Python'):
+    answer = {'question_data': {'q_id': key}, 'language': language, 'content': code, 'index': 1}
+    analysis = {'score': score, 'report': report, 'test_results': {'results': [], 'max_score': 100}}
+    store.record(test_id, [answer], [analysis])
+
+
+class FakeRouter:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, messages, analysis_prompt):
+        with self._lock:
+            self.calls += 1
+        return "They skip the first element."
+
+
+def test_report_findings_reads_both_sections():
+    assert report_findings(REPORT) == ['loop skips the first element', 'sum']
+    assert report_findings(None) == []
+    assert report_findings("Potential Issues:\nNone found\n- not a finding") == []
+
+
+def test_code_vector_similarity():
+    assert abs(_similarity(code_vector(OFF_BY_ONE), code_vector(OFF_BY_ONE)) - 1.0) < 1e-9
+    renamed = OFF_BY_ONE + "# a comment\n"
+    assert _similarity(code_vector(OFF_BY_ONE), code_vector(renamed)) > _similarity(code_vector(OFF_BY_ONE), code_vector(PASSING))
+    assert code_vector('') == {}
+
+
+def test_cluster_by_code_separates_approaches():
+    submissions = [_submission(OFF_BY_ONE, n) for n in range(3)] + [_submission(NO_RETURN, n) for n in range(2)]
+    clusters = cluster_by_code(submissions)
+    assert sorted(len(members) for members in clusters) == [2, 3]
+    for members in clusters:
+        assert len({member['code'].split('# student')[0] for member in members}) == 1
+
+
+def test_pick_representatives():
+    members = [_submission(OFF_BY_ONE, n) for n in range(4)] + [_submission(NO_RETURN, 0)]
+    picked = pick_representatives(members, count=2)
+    assert len(picked) == 2
+    # The most central member comes from the majority approach; the second is the outlier.
+    assert picked[0]['code'].startswith(OFF_BY_ONE)
+    assert picked[1]['code'].startswith(NO_RETURN)
+    assert pick_representatives(members[:2], count=3) == members[:2]
+
+
+def test_clusters_from_store(tmp_path):
+    store = CohortStore(root=str(tmp_path))
+    for n in range(3):
+        _record(store, f"test-{n}", OFF_BY_ONE + f"# student {n}\n", 40)
+    for n in range(3, 5):
+        _record(store, f"test-{n}", NO_RETURN + f"# student {n}\n", 40)
+    _record(store, 'test-5', PASSING, 100, report="Score: 100")
+    _record(store, 'test-6', OFF_BY_ONE, 0)
+
+    report = CohortReport(store, max_clusters=10)
+    submissions = report.failing_submissions()
+    assert len(submissions) == 6
+    clusters = report.clusters(submissions)
+    assert [cluster['size'] for cluster in clusters] == [3, 2, 1]
+    assert [cluster['rank'] for cluster in clusters] == [1, 2, 3]
+    assert clusters[0]['share'] == 0.5
+    assert clusters[2]['score_bucket'] == 'no test cases passed'
+    assert clusters[0]['findings'] == ['loop skips the first element', 'sum']
+
+
+def test_build_makes_one_llm_call_per_summarized_cluster(tmp_path, monkeypatch):
+    store = CohortStore(root=str(tmp_path))
+    for n in range(3):
+        _record(store, f"test-{n}", OFF_BY_ONE + f"# student {n}\n", 40)
+    for n in range(3, 5):
+        _record(store, f"test-{n}", NO_RETURN + f"# student {n}\n", 40)
+    _record(store, 'test-6', OFF_BY_ONE, 0)
+    router = FakeRouter()
+    monkeypatch.setattr(cohort_report, 'model_router', router)
+
+    clusters = CohortReport(store, max_clusters=2).build()
+    assert router.calls == 2
+    assert [cluster['summary'] for cluster in clusters] == ["They skip the first element."] * 2 + [None]
+    text = format_cohort_report(clusters)
+    assert "Failing submissions: 6 in 3 clusters" in text
+    assert "test-0/Q1" in text
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import model_router
+from config import Config
+from model_router import ANALYSIS_FOCUSES, ModelRouter, classify_prompt, default_tiers
+
+
+def _configure(monkeypatch, default, small=None, medium=None, large=None):
+    monkeypatch.setattr(Config, 'AZURE_OPENAI_MODEL', default)
+    monkeypatch.setattr(Config, 'AZURE_OPENAI_MODEL_SMALL', small or default)
+    monkeypatch.setattr(Config, 'AZURE_OPENAI_MODEL_MEDIUM', medium or default)
+    monkeypatch.setattr(Config, 'AZURE_OPENAI_MODEL_LARGE', large or default)
+
+
+def test_single_deployment_keeps_default_limits(monkeypatch):
+    _configure(monkeypatch, 'gpt-4o')
+    tiers = default_tiers()
+    assert {(tier.max_tokens, tier.temperature) for tier in tiers.values()} == {(900, 0.7)}
+
+
+def test_dedicated_deployments_get_their_tier_limits(monkeypatch):
+    _configure(monkeypatch, 'gpt-4o', small='gpt-4o-mini')
+    tiers = default_tiers()
+    assert (tiers['small'].max_tokens, tiers['small'].temperature) == (250, 0.2)
+    assert (tiers['medium'].max_tokens, tiers['medium'].temperature) == (900, 0.7)
+
+
+def test_preset_focuses_are_sent_like_before_tiers(monkeypatch):
+    _configure(monkeypatch, 'gpt-4o')
+    sent = []
+
+    def create(**kwargs):
+        sent.append(kwargs)
+        message = SimpleNamespace(content=' Looks fine. ')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], get=lambda key: None)
+
+    monkeypatch.setattr(model_router.openai, 'ChatCompletion', SimpleNamespace(create=create), raising=False)
+    router = ModelRouter()
+    assert classify_prompt(ANALYSIS_FOCUSES[0]) == 'short'
+    for focus in ANALYSIS_FOCUSES[:2]:
+        assert router.complete([{'role': 'user', 'content': 'code'}], focus) == 'Looks fine.'
+    assert [(call['engine'], call['max_tokens'], call['temperature']) for call in sent] == [('gpt-4o', 900, 0.7)] * 2
@@ -0,0 +1,85 @@
+import threading
+from code_extractor import CodeExtractor
+from cohort_store import analysis_label, answer_hash
+from question_metadata import question_key
+from config import Config
+
+
+class SubmissionWatcher:
+    """Polls a live test and analyzes only new or changed answers.
+
+    The high-water mark for each question is the hash of the answer last
+    analyzed, kept in the cohort store next to its result. On each poll
+    the test is fetched once; answers whose hash (or the analysis prompt)
+    differs from the stored one are analyzed and their stored results
+    replaced, and analysis_report.txt is rewritten from the stored reports
+    when anything changed. The poll interval doubles, up to max_interval,
+    while nothing changes or the fetch fails, and resets once an answer
+    changes.
+    """
+
+    def __init__(self, test_id, auth_token, analysis_prompt, drive='', interval=None, max_interval=None,
+                 extractor=None, report_path='analysis_report.txt'):
+        self.test_id = test_id
+        self.auth_token = auth_token
+        self.analysis_prompt = analysis_prompt
+        self.drive = drive
+        self.interval = interval or Config.WATCH_INTERVAL_SECONDS
+        self.max_interval = max(max_interval or Config.WATCH_MAX_INTERVAL_SECONDS, self.interval)
+        self.extractor = extractor or CodeExtractor()
+        self.report_path = report_path
+        self.current_interval = self.interval
+        self.polls = 0
+
+    def _is_current(self, answer, stored):
+        return (
+            stored is not None
+            and stored['answer_hash'] == answer_hash(answer['content'])
+            and stored['analysis_prompt'] == analysis_label(self.analysis_prompt)
+            and stored['report'] is not None
+        )
+
+    def poll(self):
+        """Fetch the test once and analyze what changed; returns counts of answers and changes."""
+        response = self.extractor.fetch_result_analysis(self.test_id, self.auth_token)
+        if response.status_code != 200:
+            raise Exception(f"Status code {response.status_code}")
+        answers = self.extractor.extract_coding_answers(response.json())
+
+        store = self.extractor.cohort_store
+        stored = store.question_states(self.test_id)
+        changed = [answer for answer in answers if not self._is_current(answer, stored.get(question_key(answer['question_data'])))]
+
+        if changed:
+            analyses = self.extractor.file_handler.analyze_answers(changed, self.analysis_prompt, self.extractor.gpt_analyzer)
+            store.record(self.test_id, changed, analyses, self.analysis_prompt, self.drive)
+            stored = store.question_states(self.test_id)
+            reports = [stored[question_key(answer['question_data'])]['report'] for answer in answers]
+            self.extractor.file_handler.write_report(answers, reports, self.report_path)
+        return {'answers': len(answers), 'changed': len(changed)}
+
+    def run(self, max_polls=None, stop_event=None, on_poll=None):
+        """Poll until max_polls is reached or stop_event is set.
+
+        on_poll(result, error, next_interval) is called after every poll;
+        result is None when the poll failed.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            result, error = None, None
+            try:
+                result = self.poll()
+            except Exception as e:
+                error = str(e)
+                print(f"DEBUG - Watch poll failed for {self.test_id}: {error}")
+            self.polls += 1
+
+            if result and result['changed']:
+                self.current_interval = self.interval
+            else:
+                self.current_interval = min(self.max_interval, self.current_interval * 2)
+            if on_poll:
+                on_poll(result, error, self.current_interval)
+            if max_polls is not None and self.polls >= max_polls:
+                break
+            stop_event.wait(self.current_interval)
@@ -0,0 +1,283 @@
+"""Local stand-in for the examly API and the Azure OpenAI chat-completions endpoint.
+
+One HTTP server answers all the routes the two apps call:
+
+    POST /api/v2/test/student/resultanalysis
+    POST /api/v2/questionbanks
+    POST /api/mcq_question/create
+    POST /api/v2/questionbank/questions   (lists what mcq_question/create stored)
+    POST /openai/deployments/<deployment>/chat/completions
+
+Point EXAMLY_API_BASE and AZURE_OPENAI_ENDPOINT at it. Latency, error
+rate, 429 bursts and payload sizes are set through FakeServiceConfig, and
+every request is recorded so the driver can report what the server saw.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import fixtures  # noqa: E402
+
+ROUTES = {
+    '/api/v2/test/student/resultanalysis': 'resultanalysis',
+    '/api/v2/questionbanks': 'questionbanks',
+    '/api/mcq_question/create': 'mcq_create',
+    '/api/v2/questionbank/questions': 'qb_questions',
+}
+
+
+class FakeServiceConfig:
+    """Behaviour of the stand-in server.
+
+    latency_ms/jitter_ms: per-request delay, uniform in latency +- jitter.
+    error_rate: fraction of requests answered with a 500.
+    burst_every_s/burst_length_s: every burst_every_s seconds, answer 429
+        with Retry-After for burst_length_s seconds (0 disables bursts).
+    The remaining fields size the responses.
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=20, llm_latency_ms=800, error_rate=0.0,
+                 burst_every_s=0, burst_length_s=1, retry_after_s=1, result_questions=5,
+                 testcases=20, qb_count=250, mcq_count=10, stream_chunk_chars=40):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.llm_latency_ms = llm_latency_ms
+        self.error_rate = error_rate
+        self.burst_every_s = burst_every_s
+        self.burst_length_s = burst_length_s
+        self.retry_after_s = retry_after_s
+        self.result_questions = result_questions
+        self.testcases = testcases
+        self.qb_count = qb_count
+        self.mcq_count = mcq_count
+        self.stream_chunk_chars = stream_chunk_chars
+
+
+class RequestLog:
+    """Thread-safe per-route record of status codes and server-side latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statuses = {}
+        self.latencies = {}
+
+    def record(self, route, status, latency):
+        with self._lock:
+            counts = self.statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+            self.latencies.setdefault(route, []).append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: dict(counts) for route, counts in self.statuses.items()}
+
+
+def _route(path):
+    path = path.split('?', 1)[0]
+    if path.startswith('/openai/deployments/') and path.endswith('/chat/completions'):
+        return 'chat_completions'
+    return ROUTES.get(path)
+
+
+def _completion_text(messages, mcq_count, seed):
+    text = ' '.join(str(message.get('content', '')) for message in messages)
+    if 'code reviewer' in text:
+        return "\n".join(f"- Issue {i}: the loop does not handle empty input." for i in range(1, 6))
+    if 'MCQ planning' in text:
+        return "\n".join(f"{i}. Cover sub-topic {i} with one question." for i in range(1, mcq_count + 1))
+    return fixtures.generated_mcq_text(mcq_count, seed)
+
+
+def _structured_questions(mcq_count, seed):
+    rng = random.Random(seed)
+    return [{
+        'question_text': f"Which statement is correct in load-test scenario {seed}-{i}-{rng.randint(1, 10 ** 6)}?",
+        'code_snippet': '',
+        'options': [f"Option {n}" for n in range(1, 5)],
+        'correct_option': rng.randint(1, 4),
+        'difficulty': 'Medium',
+        'subject': 'Computer Science',
+        'sub_topic': 'Load testing',
+        'tags': ['loadtest']
+    } for i in range(mcq_count)]
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _in_burst(self):
+        config = self.config
+        if not config.burst_every_s:
+            return False
+        elapsed = time.monotonic() - self.server.started_at
+        return elapsed % config.burst_every_s < config.burst_length_s
+
+    def do_POST(self):
+        start = time.perf_counter()
+        route = _route(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+
+        config = self.config
+        if route is None:
+            status = 404
+            self._send_json(status, {'error': 'not found'})
+        elif self._in_burst():
+            status = 429
+            self._send_json(status, {'error': 'rate limited'}, {'Retry-After': str(config.retry_after_s)})
+        elif random.random() < config.error_rate:
+            status = 500
+            self._send_json(status, {'error': 'injected failure'})
+        else:
+            base = config.llm_latency_ms if route == 'chat_completions' else config.latency_ms
+            delay = max(0.0, base + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+            status = 200
+            if route == 'chat_completions' and body.get('stream'):
+                # Spread the delay over the stream, like tokens arriving.
+                self._stream_completion(body, delay)
+            else:
+                time.sleep(delay)
+                self._send_json(status, getattr(self, f'_{route}')(body))
+        self.server.request_log.record(route or self.path, status, time.perf_counter() - start)
+
+    def _resultanalysis(self, body):
+        seed = sum(ord(c) for c in str(body.get('id', '')))
+        return fixtures.resultanalysis_payload(self.config.result_questions, self.config.testcases, seed)
+
+    def _questionbanks(self, body):
+        page, limit = int(body.get('page', 1)), int(body.get('limit', 100))
+        start = (page - 1) * limit
+        qbs = [{'qb_id': f"qb-{i}", 'qb_name': f"Load test bank {i}"}
+               for i in range(start, min(start + limit, self.config.qb_count))]
+        return {'results': {'questionbanks': qbs, 'count': self.config.qb_count}}
+
+    def _mcq_create(self, body):
+        question_id = str(uuid.uuid4())
+        self.server.store_question(body.get('qb_id'), dict(body, q_id=question_id))
+        return {'success': True, 'id': question_id}
+
+    def _qb_questions(self, body):
+        page, limit = int(body.get('page', 1)), int(body.get('limit', 100))
+        questions = self.server.bank_questions(body.get('qb_id'))
+        return {'results': {'questions': questions[(page - 1) * limit:page * limit], 'count': len(questions)}}
+
+    def _chat_completions(self, body):
+        seed = self.server.next_seed()
+        message = {'role': 'assistant', 'content': None}
+        if body.get('tools'):
+            arguments = json.dumps({'questions': _structured_questions(self.config.mcq_count, seed)})
+            message['tool_calls'] = [{
+                'id': f"call_{seed}",
+                'type': 'function',
+                'function': {'name': 'submit_mcqs', 'arguments': arguments}
+            }]
+            finish_reason = 'tool_calls'
+        else:
+            message['content'] = _completion_text(body.get('messages', []), self.config.mcq_count, seed)
+            finish_reason = 'stop'
+        return {
+            'id': f"chatcmpl-{seed}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'loadtest'),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
+
+    def _stream_completion(self, body, delay):
+        seed = self.server.next_seed()
+        text = _completion_text(body.get('messages', []), self.config.mcq_count, seed)
+        size = self.config.stream_chunk_chars
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+        pause = delay / len(pieces)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for piece in pieces + [None]:
+            chunk = {
+                'id': f"chatcmpl-{seed}",
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'loadtest'),
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': piece} if piece is not None else {},
+                    'finish_reason': None if piece is not None else 'stop'
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if piece is not None:
+                time.sleep(pause)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None):
+        super().__init__(address, FakeServiceHandler)
+        self.config = config or FakeServiceConfig()
+        self.request_log = RequestLog()
+        self.started_at = time.monotonic()
+        self._seed = 0
+        self._seed_lock = threading.Lock()
+        self._banks = {}
+
+    def next_seed(self):
+        with self._seed_lock:
+            self._seed += 1
+            return self._seed
+
+    def store_question(self, qb_id, question):
+        with self._seed_lock:
+            self._banks.setdefault(qb_id, []).insert(0, question)
+
+    def bank_questions(self, qb_id):
+        # Newest first, like the platform
+        with self._seed_lock:
+            return list(self._banks.get(qb_id, []))
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """Start the stand-in server on a background thread and return it."""
+    server = FakeServiceServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name='fake-services', daemon=True)
+    thread.start()
+    return server
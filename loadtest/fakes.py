@@ -0,0 +1,302 @@
+"""In-process stand-ins for Elasticsearch and the embedding model.
+
+FakeElasticsearch implements the subset of the elasticsearch-py 7.x client
+that QuestionBank and reindex.py use (aliases, points in time, bulk and
+mget included), with an optional per-call latency. HashEmbedder
+returns deterministic, normalized bag-of-words vectors so that nothing has
+to be downloaded. Pass both to QuestionBank(client=..., embedder=...).
+"""
+import copy
+import fnmatch
+import hashlib
+import math
+import re
+import threading
+import time
+import uuid
+
+
+def _tokens(text):
+    return re.findall(r'[0-9a-z]+', (text or '').lower())
+
+
+def _phrase_matches(query_tokens, doc_tokens, slop):
+    # Approximates match_phrase with slop: the query tokens appear in order
+    # within a window of len(query) + slop document tokens.
+    if not query_tokens:
+        return False
+    window = len(query_tokens) + slop
+    first = query_tokens[0]
+    for start, token in enumerate(doc_tokens):
+        if token != first:
+            continue
+        position = 1
+        for candidate in doc_tokens[start + 1:start + window]:
+            if position < len(query_tokens) and candidate == query_tokens[position]:
+                position += 1
+        if position == len(query_tokens):
+            return True
+    return False
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class NotFoundError(Exception):
+    status_code = 404
+
+
+class ConflictError(Exception):
+    status_code = 409
+
+
+def _field(source, field):
+    # A keyword subfield (e.g. fingerprint.keyword) holds the same value as its field.
+    return source.get(field[:-len('.keyword')] if field.endswith('.keyword') else field)
+
+
+def _filter_source(source, spec):
+    if spec is False:
+        return None
+    if isinstance(spec, list):
+        spec = {'includes': spec}
+    if isinstance(spec, dict):
+        includes = spec.get('includes')
+        excludes = set(spec.get('excludes', []))
+        return {k: v for k, v in source.items() if k not in excludes and (includes is None or k in includes)}
+    return source
+
+
+class _FakeIndices:
+    def __init__(self, es):
+        self._es = es
+
+    def exists(self, index):
+        self._es._delay()
+        return index in self._es.docs or index in self._es.aliases
+
+    def create(self, index, body=None):
+        self._es._delay()
+        with self._es._lock:
+            self._es.docs.setdefault(index, {})
+            self._es.bodies[index] = copy.deepcopy(body or {})
+            for alias in (body or {}).get('aliases', {}):
+                self._es.aliases.setdefault(alias, set()).add(index)
+        return {'acknowledged': True, 'index': index}
+
+    def get(self, index):
+        with self._es._lock:
+            patterns = self._es._resolve(index)
+            return {name: self._es.bodies.get(name, {}) for name in self._es.docs
+                    if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)}
+
+    def exists_alias(self, name):
+        return bool(self._es.aliases.get(name))
+
+    def get_alias(self, name):
+        with self._es._lock:
+            if not self._es.aliases.get(name):
+                raise NotFoundError(f"alias [{name}] missing")
+            return {index: {'aliases': {name: {}}} for index in self._es.aliases[name]}
+
+    def update_aliases(self, body):
+        # Applied under one lock, so readers never see a half-applied swap.
+        with self._es._lock:
+            for action in body['actions']:
+                (kind, spec), = action.items()
+                if kind == 'add':
+                    self._es.aliases.setdefault(spec['alias'], set()).add(spec['index'])
+                elif kind == 'remove':
+                    self._es.aliases.get(spec['alias'], set()).discard(spec['index'])
+                elif kind == 'remove_index':
+                    self._es.docs.pop(spec['index'], None)
+        return {'acknowledged': True}
+
+    def put_mapping(self, index, body):
+        with self._es._lock:
+            for name in self._es._resolve(index):
+                mappings = self._es.bodies.setdefault(name, {}).setdefault('mappings', {})
+                mappings.setdefault('properties', {}).update(copy.deepcopy(body['properties']))
+        return {'acknowledged': True}
+
+    def put_settings(self, index, body):
+        return {'acknowledged': True}
+
+    def refresh(self, index):
+        return {'_shards': {'failed': 0}}
+
+    def delete(self, index):
+        with self._es._lock:
+            self._es.docs.pop(index, None)
+            for indices in self._es.aliases.values():
+                indices.discard(index)
+        return {'acknowledged': True}
+
+
+class FakeElasticsearch:
+    """Thread-safe in-memory index with ES-shaped responses."""
+
+    def __init__(self, latency_ms=0, version='7.17.9'):
+        self.latency_ms = latency_ms
+        self.version = version
+        self.docs = {}
+        self.bodies = {}
+        self.aliases = {}
+        self.pits = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.indices = _FakeIndices(self)
+
+    def _delay(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def ping(self):
+        return True
+
+    def info(self):
+        return {'version': {'number': self.version}}
+
+    def _resolve(self, index):
+        # Concrete index names behind an index name or alias; callers hold the lock.
+        if index in self.aliases:
+            return sorted(self.aliases[index])
+        return [index]
+
+    def _docs(self, index):
+        with self._lock:
+            return [(doc_id, source) for name in self._resolve(index) for doc_id, source in self.docs.get(name, {}).items()]
+
+    def index(self, index, body, id=None, op_type='index'):
+        self._delay()
+        self._count('index')
+        doc_id = id or uuid.uuid4().hex
+        with self._lock:
+            docs = self.docs.setdefault(self._resolve(index)[0], {})
+            if op_type == 'create' and doc_id in docs:
+                raise ConflictError(f"[{doc_id}]: version conflict, document already exists")
+            result = 'updated' if doc_id in docs else 'created'
+            docs[doc_id] = copy.deepcopy(body)
+        return {'_index': index, '_id': doc_id, 'result': result}
+
+    def bulk(self, body):
+        self._delay()
+        self._count('bulk')
+        items = []
+        with self._lock:
+            for action, source in zip(body[::2], body[1::2]):
+                spec = action['index']
+                docs = self.docs.setdefault(self._resolve(spec['_index'])[0], {})
+                doc_id = spec.get('_id') or uuid.uuid4().hex
+                result = 'updated' if doc_id in docs else 'created'
+                docs[doc_id] = copy.deepcopy(source)
+                items.append({'index': {'_index': spec['_index'], '_id': doc_id, 'result': result, 'status': 201}})
+        return {'errors': False, 'items': items}
+
+    def mget(self, body, index, _source=True):
+        self._delay()
+        self._count('mget')
+        docs = dict(self._docs(index))
+        return {'docs': [
+            {'_id': doc_id, 'found': True, '_source': _filter_source(docs[doc_id], _source)} if doc_id in docs
+            else {'_id': doc_id, 'found': False}
+            for doc_id in body['ids']
+        ]}
+
+    def count(self, index):
+        return {'count': len(self._docs(index))}
+
+    def open_point_in_time(self, index, keep_alive):
+        pit_id = uuid.uuid4().hex
+        snapshot = sorted(self._docs(index))
+        with self._lock:
+            self.pits[pit_id] = copy.deepcopy(snapshot)
+        return {'id': pit_id}
+
+    def close_point_in_time(self, body):
+        with self._lock:
+            self.pits.pop(body['id'], None)
+        return {'succeeded': True}
+
+    def search(self, index=None, body=None):
+        self._delay()
+        self._count('search')
+        body = body or {}
+        if 'pit' in body:
+            return self._search_pit(body)
+        docs = self._docs(index)
+        hits = [{'_id': doc_id, '_score': score, '_source': source}
+                for doc_id, source, score in self._query(body.get('query', {'match_all': {}}), docs)]
+        hits.sort(key=lambda hit: -hit['_score'])
+        if 'collapse' in body:
+            field = body['collapse']['field']
+            seen = set()
+            hits = [hit for hit in hits if _field(hit['_source'], field) not in seen and not seen.add(_field(hit['_source'], field))]
+        hits = [dict(hit, _source=_filter_source(hit['_source'], body.get('_source', True))) for hit in hits]
+        return {'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': hits[:body.get('size', 10)]}}
+
+    def _search_pit(self, body):
+        # Only match_all sorted by _shard_doc, which is all reindex.py needs.
+        pit_id = body['pit']['id']
+        with self._lock:
+            if pit_id not in self.pits:
+                raise NotFoundError(f"No search context found for id [{pit_id}]")
+            snapshot = self.pits[pit_id]
+        start = body.get('search_after', [-1])[0] + 1
+        hits = [{'_id': doc_id, '_score': None, '_source': _filter_source(source, body.get('_source', True)), 'sort': [position]}
+                for position, (doc_id, source) in enumerate(snapshot[start:start + body.get('size', 10)], start)]
+        return {'pit_id': pit_id, 'hits': {'total': {'value': len(snapshot), 'relation': 'eq'}, 'hits': hits}}
+
+    def _query(self, query, docs):
+        if 'match_all' in query:
+            return [(doc_id, source, 1.0) for doc_id, source in docs]
+        if 'bool' in query:
+            matches = docs
+            for clause in query['bool'].get('must', []):
+                matched = {doc_id for doc_id, _, _ in self._query(clause, matches)}
+                matches = [(doc_id, source) for doc_id, source in matches if doc_id in matched]
+            return [(doc_id, source, 1.0) for doc_id, source in matches]
+        if 'terms' in query:
+            field, values = next(iter(query['terms'].items()))
+            values = set(values)
+            return [(doc_id, source, 1.0) for doc_id, source in docs if _field(source, field) in values]
+        if 'match_phrase' in query:
+            field, spec = next(iter(query['match_phrase'].items()))
+            if not isinstance(spec, dict):
+                spec = {'query': spec}
+            query_tokens = _tokens(spec['query'])
+            return [(doc_id, source, 1.0) for doc_id, source in docs
+                    if _phrase_matches(query_tokens, _tokens(source.get(field)), spec.get('slop', 0))]
+        if 'script_score' in query:
+            vector = query['script_score']['script']['params']['query_vector']
+            return [(doc_id, source, _cosine(vector, source['question_vector']) + 1.0)
+                    for doc_id, source, _ in self._query(query['script_score']['query'], docs)
+                    if source.get('question_vector')]
+        raise NotImplementedError(f"FakeElasticsearch does not support query {query}")
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the sentence-transformer, same dimensions."""
+
+    model_name = 'hash-embedder'
+
+    def __init__(self, dims=384):
+        self.dims = dims
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dims
+            for token in _tokens(text):
+                bucket = int(hashlib.md5(token.encode('utf-8')).hexdigest()[:8], 16)
+                vector[bucket % self.dims] += 1.0
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
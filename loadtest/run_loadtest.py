@@ -0,0 +1,260 @@
+"""Drive both pipelines end to end against local stand-ins, at a target rate.
+
+Run from the repository root; no network access or credentials needed:
+
+    python loadtest/run_loadtest.py --pipeline both --rate 2 --duration 30
+    python loadtest/run_loadtest.py --pipeline mcq --rate 5 --error-rate 0.05 --burst-every 10
+
+The two apps pin different openai versions (the code analyzer uses the
+0.27 ChatCompletion API, the MCQ app the 1.x client), so each pipeline
+runs in its own process with its own stand-in services. --pipeline both
+starts one process per pipeline, with --mcq-python and --code-python
+choosing the interpreter (for example each app's virtualenv):
+
+    python loadtest/run_loadtest.py --code-python ../analyzer-venv/bin/python
+
+The MCQ pipeline fetches a page of question banks, generates MCQs, parses
+them, dedupes and indexes them in QuestionBank (backed by an in-process
+Elasticsearch) and uploads the unique ones with bulk_import_mcqs. The
+code-analysis pipeline fetches the stand-in resultanalysis response and
+analyzes its answers as CodeExtractor.get_coding_answers does; a job
+fails if any answer's analysis failed, including model calls that failed
+on every tier.
+
+Jobs are started on an open-loop schedule (rate per second, regardless of
+how many are still running), and latency is measured from the scheduled
+start, so time spent waiting for a free worker counts too.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+APP_DIRS = {
+    'mcq': os.path.join(ROOT, 'mcq-generator-master'),
+    'code': os.path.join(ROOT, 'cod-analyizer-master', 'code_analysis'),
+}
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, HERE)
+
+from fake_server import FakeServiceConfig, start_server  # noqa: E402
+from fakes import FakeElasticsearch, HashEmbedder  # noqa: E402
+from harness import percentile  # noqa: E402
+
+TOPICS = ['Linked Lists', 'Binary Trees', 'Java Collections', 'SQL Joins', 'React Hooks', 'Exception Handling']
+
+
+def configure_environment(base_url):
+    # Must run before the app modules are imported: they read these at import time.
+    os.environ['EXAMLY_API_BASE'] = base_url
+    os.environ['AZURE_OPENAI_ENDPOINT'] = base_url
+    os.environ['AZURE_OPENAI_API_KEY'] = 'loadtest'
+    os.environ['AZURE_OPENAI_API_VERSION'] = '2024-02-01'
+    os.environ['AZURE_OPENAI_MODEL'] = 'loadtest'
+    os.environ['EMBEDDING_CACHE_PATH'] = ''
+
+
+class LoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.failures = {}
+
+    def record(self, pipeline, latency, ok):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(pipeline, []).append(latency)
+            else:
+                self.failures[pipeline] = self.failures.get(pipeline, 0) + 1
+
+
+def make_mcq_job(args):
+    from api_handler import bulk_import_mcqs, fetch_question_banks
+    from convertor import convert_text_to_json_format
+    from db import QuestionBank
+    from prompt import generate_mcqs
+
+    question_bank = QuestionBank(client=FakeElasticsearch(latency_ms=args.es_latency_ms), embedder=HashEmbedder())
+
+    def run(n):
+        fetch_question_banks('loadtest', 'LTI', page=1)
+        text = generate_mcqs(TOPICS[n % len(TOPICS)], args.mcq_count, 'Medium', 'Conceptual')
+        questions = convert_text_to_json_format(text, None, 'loadtest')
+        unique_questions, _ = question_bank.add_unique_questions(questions)
+        outcomes = bulk_import_mcqs(unique_questions, 'qb-loadtest', 'loadtest', 'LTI',
+                                    max_workers=args.upload_workers, checkpoint_file=None, sync_existing=False)
+        return all(outcome['status'] != 'failed' for outcome in outcomes)
+
+    return run
+
+
+def _analysis_failed(analysis):
+    # Model failures are caught inside the analyzer and come back as an error text
+    insights = analysis.get('insights')
+    texts = insights.values() if isinstance(insights, dict) else [insights or '']
+    return bool(analysis.get('error')) or any(text.startswith('Error generating') for text in texts)
+
+
+def make_code_job(args):
+    from code_extractor import CodeExtractor
+
+    analysis_prompt = "Check why the testcase failed, give in 3 lines"
+
+    def run(n):
+        extractor = CodeExtractor()
+        response = extractor.fetch_result_analysis(f"loadtest-{n}", 'loadtest')
+        if response.status_code != 200:
+            return False
+        coding_answers = extractor.extract_coding_answers(response.json())
+        analyses = extractor.file_handler.save_analysis(coding_answers, analysis_prompt, extractor.gpt_analyzer)
+        return bool(analyses) and not any(_analysis_failed(analysis) for analysis in analyses)
+
+    return run
+
+
+def run_load(jobs, rate, duration, concurrency, stats):
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for n in range(total):
+            scheduled = start + n / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            for name, job in jobs.items():
+                executor.submit(_timed, name, job, n, scheduled, stats)
+    return time.perf_counter() - start
+
+
+def _timed(name, job, n, scheduled, stats):
+    try:
+        ok = job(n)
+    except Exception as e:
+        print(f"{name} job {n} failed: {e}", file=sys.__stderr__)
+        ok = False
+    stats.record(name, time.perf_counter() - scheduled, ok)
+
+
+def print_report(stats, elapsed, server):
+    print(f"\n{'pipeline':<10} {'ok':>6} {'failed':>7} {'jobs/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8}")
+    for name in sorted(set(stats.latencies) | set(stats.failures)):
+        latencies = sorted(stats.latencies.get(name, []))
+        print(f"{name:<10} {len(latencies):>6} {stats.failures.get(name, 0):>7} {len(latencies) / elapsed:>8.2f} "
+              f"{percentile(latencies, 0.50):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+              f"{percentile(latencies, 0.99):>8.2f} {(latencies[-1] if latencies else 0):>8.2f}")
+
+    print(f"\n{'endpoint':<20} {'requests':>9} {'p95 ms':>8}  status codes")
+    log = server.request_log
+    for route, counts in sorted(log.snapshot().items()):
+        latencies = sorted(log.latencies[route])
+        codes = ', '.join(f"{status}: {count}" for status, count in sorted(counts.items()))
+        print(f"{route:<20} {sum(counts.values()):>9} {percentile(latencies, 0.95) * 1000:>8.0f}  {codes}")
+
+    from flow_control import flow_controller
+    print(f"\n{'flow-controlled endpoint':<60} {'limit':>6} {'ok':>6} {'429':>5} {'5xx':>5} {'retries':>8}")
+    for row in flow_controller.snapshot():
+        print(f"{row['endpoint']:<60} {row['limit']:>6} {row['succeeded']:>6} {row['throttled']:>5} {row['errors']:>5} {row['retries']:>8}")
+
+    if 'code' in set(stats.latencies) | set(stats.failures):
+        from model_router import model_router
+        print(f"\n{'model tier':<10} {'deployment':<20} {'calls':>6} {'failed':>7} {'fallback':>9} {'p50 ms':>7} {'p95 ms':>7}")
+        for row in model_router.snapshot():
+            print(f"{row['tier']:<10} {str(row['deployment']):<20} {row['calls']:>6} {row['failures']:>7} {row['fallbacks']:>9} "
+                  f"{str(row['p50_ms']):>7} {str(row['p95_ms']):>7}")
+
+
+def run_pipelines_in_subprocesses(args, argv):
+    """Run each pipeline in its own interpreter, concurrently, and relay their reports."""
+    interpreters = {'mcq': args.mcq_python, 'code': args.code_python}
+    # Drop the options that only the parent uses
+    child_argv = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in ('--pipeline', '--mcq-python', '--code-python'):
+            skip = True
+        elif not arg.startswith(('--pipeline=', '--mcq-python=', '--code-python=')):
+            child_argv.append(arg)
+    processes = {
+        name: subprocess.Popen(
+            [interpreter, os.path.abspath(__file__), '--pipeline', name] + child_argv,
+            stdout=subprocess.PIPE, text=True
+        )
+        for name, interpreter in interpreters.items()
+    }
+    status = 0
+    for name, process in processes.items():
+        output, _ = process.communicate()
+        print(f"===== {name} pipeline ({interpreters[name]}) =====")
+        print(output)
+        status = status or process.returncode
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pipeline', choices=['mcq', 'code', 'both'], default='both')
+    parser.add_argument('--rate', type=float, default=1.0, help='jobs started per second, per pipeline')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to keep starting jobs')
+    parser.add_argument('--concurrency', type=int, default=16, help='jobs allowed to run at once')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--llm-latency-ms', type=float, default=800)
+    parser.add_argument('--es-latency-ms', type=float, default=2)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--burst-every', type=float, default=0, help='seconds between 429 bursts (0 = none)')
+    parser.add_argument('--burst-length', type=float, default=1)
+    parser.add_argument('--mcq-count', type=int, default=10, help='questions per generated completion')
+    parser.add_argument('--result-questions', type=int, default=5, help='coding questions per resultanalysis response')
+    parser.add_argument('--testcases', type=int, default=20)
+    parser.add_argument('--upload-workers', type=int, default=8)
+    parser.add_argument('--mcq-python', default=sys.executable, help='interpreter for the MCQ pipeline with --pipeline both')
+    parser.add_argument('--code-python', default=sys.executable, help='interpreter for the code pipeline with --pipeline both')
+    args = parser.parse_args()
+
+    if args.pipeline == 'both':
+        sys.exit(run_pipelines_in_subprocesses(args, sys.argv[1:]))
+    # Only this pipeline's app is importable, so the two apps' modules never mix
+    sys.path.insert(0, APP_DIRS[args.pipeline])
+
+    server = start_server(FakeServiceConfig(
+        latency_ms=args.latency_ms,
+        llm_latency_ms=args.llm_latency_ms,
+        error_rate=args.error_rate,
+        burst_every_s=args.burst_every,
+        burst_length_s=args.burst_length,
+        result_questions=args.result_questions,
+        testcases=args.testcases,
+        mcq_count=args.mcq_count
+    ))
+    configure_environment(server.base_url)
+    print(f"Stand-in services on {server.base_url}")
+
+    jobs = {args.pipeline: make_mcq_job(args) if args.pipeline == 'mcq' else make_code_job(args)}
+
+    stats = LoadStats()
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    cwd = os.getcwd()
+    os.chdir(workdir)  # the code analyzer writes analysis_report.txt to the working directory
+    try:
+        # Both apps print and log per request; keep that out of the report.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            logging.disable(logging.CRITICAL)
+            elapsed = run_load(jobs, args.rate, args.duration, args.concurrency, stats)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+    print_report(stats, elapsed, server)
+
+
+if __name__ == '__main__':
+    main()
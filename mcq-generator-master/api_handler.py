@@ -1,141 +1,363 @@
 import requests
 import json
+import hashlib
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from db import question_fingerprint
+from flow_control import endpoint_name, flow_controller
 
-def get_all_qbs(token, search=None, page=1, limit=100):
-    url = 'https://api.examly.io/api/v2/questionbanks'
-    headers = {
-        'accept': 'application/json, text/plain, */*',
-        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
-        'authorization': token,
-        'content-type': 'application/json',
-        'origin': 'https://admin.ltimindtree.iamneo.ai',
-        'referer': 'https://admin.ltimindtree.iamneo.ai/',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
-    }
+load_dotenv()
+
+# Overridable so the importer can be pointed at a staging or local stand-in server.
+EXAMLY_API_BASE = os.getenv('EXAMLY_API_BASE', 'https://api.examly.io').rstrip('/')
+# Endpoint listing the questions of one question bank, used to skip uploads of questions it already has.
+EXAMLY_QB_QUESTIONS_PATH = os.getenv('EXAMLY_QB_QUESTIONS_PATH', '/api/v2/questionbank/questions')
+# Syncing pulls the whole bank on first use, so it is off unless enabled here or per import.
+SYNC_EXISTING_QUESTIONS = os.getenv('SYNC_EXISTING_QUESTIONS', '').lower() in ('1', 'true', 'yes')
+
+DOMAIN_ORIGINS = {
+    'LTI': 'https://admin.ltimindtree.iamneo.ai',
+    'Neowise': 'https://admin.neowise.examly.io',
+}
+DEPARTMENT_IDS = {
+    'LTI': ["617346bd-b9c8-468d-9099-12170fb3b570","8c9bb195-1e81-4506-bc39-c48e6450c2a0","58efa904-a695-4c14-8335-124c9ec5e95a","4b375029-26ec-4d20-bf46-1122dfc584ae","d40c4d09-8ac5-4a26-b969-ce9cc8685180","e0f02ce1-486b-4122-8f1b-d80f7076bee3","04c14795-d8b2-41c0-9c41-997a5630f455","074cbc54-a20f-4a5d-9c02-1ca6a1bed28f","da3f5269-34b1-49c4-8d38-30c18b4f6598","f04c0f04-f6d7-434d-b8c9-5c356805ffab","f0b8af1b-288a-4b41-97b1-27447014ada3","2b60843d-7972-4235-82cb-0ebc33d75d63","78b66861-c946-4d83-9754-75c32925b5a9","5d1e18e7-b9aa-4d43-93b3-eb0a7a3df0d6","82208516-6d07-4fc0-8ee4-4205601c6695","b55a5b74-7f4a-428e-a59b-377dd8c7e4ba","35700f99-19f6-42c2-a336-d32687690e4a","c47b433a-7f1d-4014-a5b9-415187ed118b","fb751a89-c97a-47a6-9795-a33b3ba2eede","c02099c7-354a-48a9-867c-91cd16c6de38","4bb74161-364a-4012-9122-be5597db9f9e","a9ac9b80-daf9-45c3-aa4e-3aecd0a3820b","91f6683d-2512-416a-a355-2c6eefe9507b","6aa4e718-9fd9-4911-85c0-b900eed73547","2d24fa30-2621-418b-9597-0442ff8997df","5d4d3d63-73cd-4b04-a579-6c4f9fdf7473","55faaca8-4375-4bc6-874e-740dbf3dd22e","e100cac4-4586-4f3a-b598-24ee8d6c7a92","ffa1501f-1747-4ea7-9b83-22b3ab409d51","97c0a54a-67d2-4bc6-87b6-74b369e15889","627f1e5a-3e5e-4e14-b948-eab0baf714c4","d7d9bd6a-7bdc-46aa-8929-458e674f94c5","c3d1f72d-aa83-4276-9976-c5fcb06f70f8","4bf536a6-a9fa-4215-a803-056f0074e3e7","2680fe23-89dc-4035-a7a6-eb1869630f81","1dce25ce-cb7a-4826-a7e4-ab4c189bf436","e641144f-f801-4f79-8f3b-cff27ab3a123","7296cb61-76ce-4064-8928-328f2a545666","48942306-1e80-4db5-bd3b-e3075202d9b8","0ba8c5fa-9754-4d7f-851a-aa4791b9b445","8b0329c3-626e-4644-b6f4-dcb0424ed9fa","969b5384-e5ac-46aa-996b-547e5c77c3bf","41b64d5f-bb55-47a7-ad77-208e27ccae80","0400731b-2ab3-4644-828e-7c1618b23aac","e024b5b6-d6db-4fe6-a445-8b49facf10bb","d5c3f38f-fc70-4ac8-af83-372cd006396f","09f0cbe3-5c20-4c75-9c50-b4ee6fa6d09a","8154bcaa-3ee6-423f-938e-e4ccfe6002a7","4d037902-f46b-4fcf-824a-8f65376dbdcc","4ced5ede-47de-42b8-a5e3-a5af9d0ce415","566994d3-6a6f-4174-899a-700468f4bc7a","ebd40260-e32b-4367-8b8f-c606793e423b","6adf26cd-4949-4501-99c4-336401d84b49","64195871-472d-4520-839b-be0b8cbf2a94","4af00c09-f6a8-4099-8699-1c6a57db677b","0eb0005e-01b2-412a-a325-d0ea0ab9d64c","282bae70-ecb4-469a-94d0-8df0917b6ed4","62024afb-ea1e-4a6b-ad01-cbf1e592ed3c","662bd1f5-9c20-411a-aad0-e00e1881a6f2","54d15165-fc20-4e2e-bc1a-19e46c6a6f30","3f3711bd-ba73-404a-b72a-dee82166d2b4","a17c1837-80dd-4d0f-9a05-629e8f00eeb5","617ce4f5-33ec-4ff6-b1a6-1c74220be379","bf6ce3d6-8552-4959-bc65-9068c8f7738b","3f0fd32e-4290-488f-8e93-ba49d4dc1ecd","51827123-a24e-4aac-a23b-cbf3b95177e5","7a309bfc-d490-4269-8c36-f2899e02de65","9a64ffc7-47af-4f28-8dfa-31718a16ea7b","bd3777c4-635f-435a-94da-3426f786d592","6204bdfd-9a00-42b5-b951-0ab9a7a22105","173df851-7e75-43f1-9185-19028621a66f","e9fecb8e-8553-4d23-ac96-eca3da15af90","8eeae087-ce46-4d8a-9d0d-aefef190f0cd","00522911-f5fa-48fd-acb2-333b40117b82","41698284-bb61-4f6c-aaf1-591182d9025d","901ff1b8-cc03-4bb3-96b9-42bb53e86701","5c490195-95f7-4577-a9cb-3096d940af5d","1b18fbbf-a4ca-45df-ab78-75480a154b4a","ef6771c4-b9f5-4593-b4f6-ae9cd8845ec2","b073f250-c7eb-4d6b-829e-3af6ceb94037","78dc3377-b4a2-4338-b17e-6d8dde7cfeb1","ba75398b-44ce-487a-9dcd-f57339241e8d","a09496c9-0412-4649-944f-2edca43cb252","756c5ccf-535e-4b26-8d5f-3acc607e9a81","34c1f447-25af-4a75-9abf-be10d1626076"],
+    'Neowise': ["135950e9-d50e-46e0-bd83-672abdd75a44","e7ff788f-c169-4912-becc-922f60c22f33","1eb3f9be-949f-4366-93ff-38e8bc294204","8ce00f56-d771-4022-9db3-9cce403018bb","828a7982-06ea-42e9-ab66-49d479b74a1b","5c7faff9-4310-4052-9436-87fc02c0c8c7","02ff769d-0bdc-4b25-9598-6dd51ece3f94","b2a160ce-3c07-4f76-9141-9b183c1bc6d8","fde42d90-8163-479c-a4ab-fde8215ad22f","061912a6-6a43-4ace-b2a0-148ced4eb965","86430ada-0377-4cc9-9d1c-457928599f80","607bcef9-d910-4aac-b8dd-9db51424b370","072ec628-8569-43b3-a232-b5048398bbb3","3127e585-28e1-4140-8322-4081a22bb52b","3b13d51e-8e1e-47be-97ed-0801312ebf5f","ea34c967-7202-493f-ac56-c79ae79e06c5","55e39f8a-919f-4da6-a1e3-a700cef45cf2","cef01ce9-8b8a-494e-a0f5-2c56925fb7bf","f03e4d7d-ab35-4164-a9e8-580fce7acc1f","dc8f9b62-4920-4405-90d9-4debfa298549","05542ae9-203f-48cb-8090-01409d1415e7","720ce887-66da-4927-ad6a-ab9c07aa9492","497de26c-ecf6-4734-aac8-86e87e75daa5"],
+}
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MCQ_CREATE_PATH = '/api/mcq_question/create'
+# mcq_question/create is not idempotent: a 5xx from a gateway or a read
+# timeout can come after the question was created, so its posts are only
+# retried on answers that say the request was not processed.
+CREATE_RETRY_STATUS_CODES = (429, 503)
+DEFAULT_CHECKPOINT_FILE = 'import_checkpoint.jsonl'
+# Upper bounds on upload threads; how many uploads actually run at once is
+# decided per endpoint by the flow controller.
+MAX_UPLOAD_WORKERS = 32
+DOMAIN_MAX_WORKERS = {'LTI': MAX_UPLOAD_WORKERS, 'Neowise': MAX_UPLOAD_WORKERS}
+
+
+def fetch_question_banks(token, domain, search=None, page=1, limit=100, session=None):
+    """Fetch one page of question banks; raises requests.exceptions.RequestException on failure."""
+    url = f'{EXAMLY_API_BASE}/api/v2/questionbanks'
     payload = {
         "branch_id": "all",
         "page": page,
         "limit": limit,
         "visibility": "All",
-        "department_id": ["617346bd-b9c8-468d-9099-12170fb3b570","8c9bb195-1e81-4506-bc39-c48e6450c2a0","58efa904-a695-4c14-8335-124c9ec5e95a","4b375029-26ec-4d20-bf46-1122dfc584ae","d40c4d09-8ac5-4a26-b969-ce9cc8685180","e0f02ce1-486b-4122-8f1b-d80f7076bee3","04c14795-d8b2-41c0-9c41-997a5630f455","074cbc54-a20f-4a5d-9c02-1ca6a1bed28f","da3f5269-34b1-49c4-8d38-30c18b4f6598","f04c0f04-f6d7-434d-b8c9-5c356805ffab","f0b8af1b-288a-4b41-97b1-27447014ada3","2b60843d-7972-4235-82cb-0ebc33d75d63","78b66861-c946-4d83-9754-75c32925b5a9","5d1e18e7-b9aa-4d43-93b3-eb0a7a3df0d6","82208516-6d07-4fc0-8ee4-4205601c6695","b55a5b74-7f4a-428e-a59b-377dd8c7e4ba","35700f99-19f6-42c2-a336-d32687690e4a","c47b433a-7f1d-4014-a5b9-415187ed118b","fb751a89-c97a-47a6-9795-a33b3ba2eede","c02099c7-354a-48a9-867c-91cd16c6de38","4bb74161-364a-4012-9122-be5597db9f9e","a9ac9b80-daf9-45c3-aa4e-3aecd0a3820b","91f6683d-2512-416a-a355-2c6eefe9507b","6aa4e718-9fd9-4911-85c0-b900eed73547","2d24fa30-2621-418b-9597-0442ff8997df","5d4d3d63-73cd-4b04-a579-6c4f9fdf7473","55faaca8-4375-4bc6-874e-740dbf3dd22e","e100cac4-4586-4f3a-b598-24ee8d6c7a92","ffa1501f-1747-4ea7-9b83-22b3ab409d51","97c0a54a-67d2-4bc6-87b6-74b369e15889","627f1e5a-3e5e-4e14-b948-eab0baf714c4","d7d9bd6a-7bdc-46aa-8929-458e674f94c5","c3d1f72d-aa83-4276-9976-c5fcb06f70f8","4bf536a6-a9fa-4215-a803-056f0074e3e7","2680fe23-89dc-4035-a7a6-eb1869630f81","1dce25ce-cb7a-4826-a7e4-ab4c189bf436","e641144f-f801-4f79-8f3b-cff27ab3a123","7296cb61-76ce-4064-8928-328f2a545666","48942306-1e80-4db5-bd3b-e3075202d9b8","0ba8c5fa-9754-4d7f-851a-aa4791b9b445","8b0329c3-626e-4644-b6f4-dcb0424ed9fa","969b5384-e5ac-46aa-996b-547e5c77c3bf","41b64d5f-bb55-47a7-ad77-208e27ccae80","0400731b-2ab3-4644-828e-7c1618b23aac","e024b5b6-d6db-4fe6-a445-8b49facf10bb","d5c3f38f-fc70-4ac8-af83-372cd006396f","09f0cbe3-5c20-4c75-9c50-b4ee6fa6d09a","8154bcaa-3ee6-423f-938e-e4ccfe6002a7","4d037902-f46b-4fcf-824a-8f65376dbdcc","4ced5ede-47de-42b8-a5e3-a5af9d0ce415","566994d3-6a6f-4174-899a-700468f4bc7a","ebd40260-e32b-4367-8b8f-c606793e423b","6adf26cd-4949-4501-99c4-336401d84b49","64195871-472d-4520-839b-be0b8cbf2a94","4af00c09-f6a8-4099-8699-1c6a57db677b","0eb0005e-01b2-412a-a325-d0ea0ab9d64c","282bae70-ecb4-469a-94d0-8df0917b6ed4","62024afb-ea1e-4a6b-ad01-cbf1e592ed3c","662bd1f5-9c20-411a-aad0-e00e1881a6f2","54d15165-fc20-4e2e-bc1a-19e46c6a6f30","3f3711bd-ba73-404a-b72a-dee82166d2b4","a17c1837-80dd-4d0f-9a05-629e8f00eeb5","617ce4f5-33ec-4ff6-b1a6-1c74220be379","bf6ce3d6-8552-4959-bc65-9068c8f7738b","3f0fd32e-4290-488f-8e93-ba49d4dc1ecd","51827123-a24e-4aac-a23b-cbf3b95177e5","7a309bfc-d490-4269-8c36-f2899e02de65","9a64ffc7-47af-4f28-8dfa-31718a16ea7b","bd3777c4-635f-435a-94da-3426f786d592","6204bdfd-9a00-42b5-b951-0ab9a7a22105","173df851-7e75-43f1-9185-19028621a66f","e9fecb8e-8553-4d23-ac96-eca3da15af90","8eeae087-ce46-4d8a-9d0d-aefef190f0cd","00522911-f5fa-48fd-acb2-333b40117b82","41698284-bb61-4f6c-aaf1-591182d9025d","901ff1b8-cc03-4bb3-96b9-42bb53e86701","5c490195-95f7-4577-a9cb-3096d940af5d","1b18fbbf-a4ca-45df-ab78-75480a154b4a","ef6771c4-b9f5-4593-b4f6-ae9cd8845ec2","b073f250-c7eb-4d6b-829e-3af6ceb94037","78dc3377-b4a2-4338-b17e-6d8dde7cfeb1","ba75398b-44ce-487a-9dcd-f57339241e8d","a09496c9-0412-4649-944f-2edca43cb252","756c5ccf-535e-4b26-8d5f-3acc607e9a81","34c1f447-25af-4a75-9abf-be10d1626076"],
+        "department_id": DEPARTMENT_IDS[domain],
         "mainDepartmentUser": True
     }
     
     if search:
         payload["search"] = search
 
+    with flow_controller.slot(endpoint_name(url)) as call:
+        response = (session or requests).post(url, headers=_build_headers(token, domain), json=payload, timeout=60)
+        call.status = response.status_code
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_qb_questions(token, domain, qb_id, page=1, limit=100, session=None):
+    """Fetch one page of the questions in a question bank, most recently added first.
+
+    Raises requests.exceptions.RequestException on failure.
+    """
+    url = f'{EXAMLY_API_BASE}{EXAMLY_QB_QUESTIONS_PATH}'
+    payload = {"qb_id": qb_id, "page": page, "limit": limit}
+
+    with flow_controller.slot(endpoint_name(url)) as call:
+        response = (session or requests).post(url, headers=_build_headers(token, domain), json=payload, timeout=60)
+        call.status = response.status_code
+    response.raise_for_status()
+    return response.json()
+
+
+def get_all_qbs(token, search=None, page=1, limit=100):
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()
+        return fetch_question_banks(token, 'LTI', search, page, limit)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching Question Banks: {e}")
-        if hasattr(e, 'response'):
+        if getattr(e, 'response', None) is not None:
             logging.error(f"Response content: {e.response.content}")
         return None
 
-def import_mcqs_to_examly(input_file, qb_id, created_by, token):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        unique_questions = json.load(f)
-    
-    url = 'https://api.examly.io/api/mcq_question/create'
-    headers = {
-        'accept': 'application/json, text/plain, */*',
-        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
-        'authorization': token,
-        'content-type': 'application/json',
-        'origin': 'https://admin.ltimindtree.iamneo.ai',
-        'referer': 'https://admin.ltimindtree.iamneo.ai/',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
-    }
-    
-    successful_uploads = 0
-    failed_uploads = 0
-
-    for question in unique_questions:
-        question_to_post = question.copy()
-        question_to_post.pop('question_vector', None)
-        question_to_post['qb_id'] = qb_id
-        if not question_to_post['tags']:
-            question_to_post['tags'] = [""]
-        
-        try:
-            response = requests.post(url, json=question_to_post, headers=headers)
-            response.raise_for_status()
-            successful_uploads += 1
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error posting question: {e}")
-            failed_uploads += 1
-    
-    return successful_uploads, failed_uploads
+class _ObservedRetry(Retry):
+    """Retry that reports every retried attempt to the flow controller, so
+    throttling is seen even when a later attempt succeeds."""
 
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if _pool is not None and url:
+            status = response.status if response is not None else None
+            flow_controller.record_retry(f"{_pool.host}{url.split('?', 1)[0]}", status)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
 
-    
-def get_all_qbs_neowise(token, search=None, page=1, limit=25):
-    url = 'https://api.examly.io/api/v2/questionbanks'
-    headers = {
+
+class _CreateRetry(_ObservedRetry):
+    """Retry for mcq_question/create: connection failures, 429, and 503
+    only when it carries Retry-After. Read errors are not retried."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 503 and not has_retry_after:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_session(max_connections=8, max_retries=3, backoff_factor=1):
+    """Keep-alive session that retries 429/5xx responses with exponential backoff.
+
+    Posts to mcq_question/create are retried only as _CreateRetry allows,
+    so a question the server already created is not posted twice.
+    """
+    retry = _ObservedRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    create_retry = _CreateRetry(
+        total=max_retries,
+        read=False,
+        other=0,
+        backoff_factor=backoff_factor,
+        status_forcelist=CREATE_RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=retry)
+    create_adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=create_retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # The longest matching prefix wins, so creates get their own retry policy.
+    session.mount(f'{EXAMLY_API_BASE}{MCQ_CREATE_PATH}', create_adapter)
+    return session
+
+
+def _build_headers(token, domain):
+    origin = DOMAIN_ORIGINS[domain]
+    return {
         'accept': 'application/json, text/plain, */*',
         'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
         'authorization': token,
         'content-type': 'application/json',
-        'origin': 'https://admin.neowise.examly.io',
-        'referer': 'https://admin.neowise.examly.io/',
+        'origin': origin,
+        'referer': f'{origin}/',
         'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
     }
-    payload = {
-        "branch_id": "all",
-        "page": page,
-        "limit": limit,
-        "visibility": "All",
-        "department_id": ["135950e9-d50e-46e0-bd83-672abdd75a44","e7ff788f-c169-4912-becc-922f60c22f33","1eb3f9be-949f-4366-93ff-38e8bc294204","8ce00f56-d771-4022-9db3-9cce403018bb","828a7982-06ea-42e9-ab66-49d479b74a1b","5c7faff9-4310-4052-9436-87fc02c0c8c7","02ff769d-0bdc-4b25-9598-6dd51ece3f94","b2a160ce-3c07-4f76-9141-9b183c1bc6d8","fde42d90-8163-479c-a4ab-fde8215ad22f","061912a6-6a43-4ace-b2a0-148ced4eb965","86430ada-0377-4cc9-9d1c-457928599f80","607bcef9-d910-4aac-b8dd-9db51424b370","072ec628-8569-43b3-a232-b5048398bbb3","3127e585-28e1-4140-8322-4081a22bb52b","3b13d51e-8e1e-47be-97ed-0801312ebf5f","ea34c967-7202-493f-ac56-c79ae79e06c5","55e39f8a-919f-4da6-a1e3-a700cef45cf2","cef01ce9-8b8a-494e-a0f5-2c56925fb7bf","f03e4d7d-ab35-4164-a9e8-580fce7acc1f","dc8f9b62-4920-4405-90d9-4debfa298549","05542ae9-203f-48cb-8090-01409d1415e7","720ce887-66da-4927-ad6a-ab9c07aa9492","497de26c-ecf6-4734-aac8-86e87e75daa5"],
-        "mainDepartmentUser": True
-    }
-    
-    if search:
-        payload["search"] = search
+
+
+def question_key(question):
+    """Stable identifier of a question's content, used by the import checkpoint."""
+    content = {k: v for k, v in question.items() if k not in ('question_vector', 'qb_id')}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ImportCheckpoint:
+    """Append-only record of questions already created in each question bank.
+
+    A failed or interrupted import can be re-run with the same checkpoint
+    file and only the questions that were not created yet are posted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._done.add((entry['qb_id'], entry['key']))
+                    except (ValueError, KeyError):
+                        continue
+
+    def is_done(self, qb_id, key):
+        return (qb_id, key) in self._done
+
+    def mark_done(self, qb_id, key):
+        with self._lock:
+            self._done.add((qb_id, key))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'qb_id': qb_id, 'key': key}) + '\n')
+
+
+def _post_question(session, url, headers, question, qb_id):
+    question_to_post = question.copy()
+    question_to_post.pop('question_vector', None)
+    question_to_post['qb_id'] = qb_id
+    if not question_to_post['tags']:
+        question_to_post['tags'] = [""]
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        with flow_controller.slot(endpoint_name(url)) as call:
+            response = session.post(url, json=question_to_post, headers=headers, timeout=60)
+            call.status = response.status_code
         response.raise_for_status()
-        return response.json()
+        return {'status': 'created', 'http_status': response.status_code, 'error': None}
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching Question Banks from Neowise: {e}")
-        if hasattr(e, 'response'):
-            logging.error(f"Response content: {e.response.content}")
-        return None
+        logging.error(f"Error posting question to {qb_id}: {e}")
+        response = getattr(e, 'response', None)
+        return {
+            'status': 'failed',
+            'http_status': response.status_code if response is not None else None,
+            'error': str(e)
+        }
+
+
+def _submit_uploads(executor, session, questions, qb_id, token, domain, checkpoint, existing=None):
+    """existing, if given, holds fingerprints of the questions already in the question bank."""
+    url = f'{EXAMLY_API_BASE}{MCQ_CREATE_PATH}'
+    headers = _build_headers(token, domain)
+
+    def upload(index, question):
+        key = question_key(question)
+        outcome = {'index': index, 'question': question.get('question_data', '')[:80]}
+        if checkpoint and checkpoint.is_done(qb_id, key):
+            outcome.update({'status': 'skipped', 'http_status': None, 'error': None})
+            return outcome
+        if existing and question_fingerprint(question) in existing:
+            outcome.update({'status': 'exists', 'http_status': None, 'error': None})
+            return outcome
+        outcome.update(_post_question(session, url, headers, question, qb_id))
+        if checkpoint and outcome['status'] == 'created':
+            checkpoint.mark_done(qb_id, key)
+        return outcome
+
+    return [executor.submit(upload, index, question) for index, question in enumerate(questions)]
+
 
-def import_mcqs_to_neowise(input_file, qb_id, created_by, token):
+def _existing_fingerprints(token, domain, qb_id, session):
+    # New questions of the bank also go into the local index. A failed sync
+    # only means nothing is filtered out; the import still runs.
+    from db import get_question_bank
+    from qb_sync import QuestionBankSync
+    try:
+        qb_sync = QuestionBankSync(domain, qb_id, question_bank=get_question_bank())
+        qb_sync.sync(token, session=session)
+        return qb_sync.fingerprints()
+    except Exception as e:
+        logging.error(f"Could not sync existing questions of {domain} question bank {qb_id}: {e}")
+        return set()
+
+
+def bulk_import_mcqs(questions, qb_id, token, domain, max_workers=MAX_UPLOAD_WORKERS, session=None, checkpoint_file=DEFAULT_CHECKPOINT_FILE,
+                     sync_existing=None):
+    """Post questions to a question bank concurrently.
+
+    Returns one outcome per question, in input order, with a status of
+    'created', 'failed', 'skipped' (already created according to the
+    checkpoint file) or 'exists' (the question bank already has it, per
+    the sync done first when sync_existing is set; it defaults to
+    SYNC_EXISTING_QUESTIONS).
+    """
+    session = session or create_session(max_connections=max_workers)
+    checkpoint = ImportCheckpoint(checkpoint_file) if checkpoint_file else None
+    if sync_existing is None:
+        sync_existing = SYNC_EXISTING_QUESTIONS
+    existing = _existing_fingerprints(token, domain, qb_id, session) if sync_existing else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = _submit_uploads(executor, session, questions, qb_id, token, domain, checkpoint, existing)
+        outcomes = [future.result() for future in futures]
+
+    summary = summarize_outcomes(outcomes)
+    logging.info(f"Import to {domain} question bank {qb_id}: {summary}")
+    return outcomes
+
+
+def import_mcqs_to_targets(input_file, targets, tokens, max_workers_per_domain=None, checkpoint_file=DEFAULT_CHECKPOINT_FILE,
+                           sync_existing=None):
+    """Import one question set into several question banks at once.
+
+    targets is a list of (domain, qb_id) pairs and tokens maps each domain
+    to its authorization token. The input file is read once. Every domain
+    gets its own connection pool and upload pool, sized by
+    max_workers_per_domain (DOMAIN_MAX_WORKERS by default), and all
+    targets upload at the same time. With sync_existing, each target's
+    existing questions are synced first and skipped as 'exists'
+    (default SYNC_EXISTING_QUESTIONS). Returns {(domain, qb_id): outcomes}.
+    """
     with open(input_file, 'r', encoding='utf-8') as f:
         unique_questions = json.load(f)
+    if sync_existing is None:
+        sync_existing = SYNC_EXISTING_QUESTIONS
+
+    max_workers_per_domain = {**DOMAIN_MAX_WORKERS, **(max_workers_per_domain or {})}
+    checkpoint = ImportCheckpoint(checkpoint_file) if checkpoint_file else None
+    targets = list(dict.fromkeys(targets))
+    domains = {domain for domain, _ in targets}
+
+    executors = {domain: ThreadPoolExecutor(max_workers=max_workers_per_domain[domain]) for domain in domains}
+    sessions = {domain: create_session(max_connections=max_workers_per_domain[domain]) for domain in domains}
+    try:
+        existing = {
+            (domain, qb_id): _existing_fingerprints(tokens[domain], domain, qb_id, sessions[domain]) if sync_existing else None
+            for domain, qb_id in targets
+        }
+        futures = {
+            (domain, qb_id): _submit_uploads(
+                executors[domain], sessions[domain], unique_questions, qb_id, tokens[domain], domain, checkpoint,
+                existing[(domain, qb_id)]
+            )
+            for domain, qb_id in targets
+        }
+        results = {target: [future.result() for future in target_futures] for target, target_futures in futures.items()}
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+
+    for (domain, qb_id), outcomes in results.items():
+        logging.info(f"Import to {domain} question bank {qb_id}: {summarize_outcomes(outcomes)}")
+    return results
+
+
+def summarize_outcomes(outcomes):
+    summary = {'created': 0, 'failed': 0, 'skipped': 0, 'exists': 0}
+    for outcome in outcomes:
+        summary[outcome['status']] += 1
+    return summary
+
+
+def import_mcqs(input_file, qb_id, token, domain, max_workers=MAX_UPLOAD_WORKERS, checkpoint_file=DEFAULT_CHECKPOINT_FILE,
+                sync_existing=None):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        unique_questions = json.load(f)
+    return bulk_import_mcqs(unique_questions, qb_id, token, domain, max_workers=max_workers, checkpoint_file=checkpoint_file,
+                            sync_existing=sync_existing)
+
+
+def import_mcqs_to_examly(input_file, qb_id, created_by, token, max_workers=MAX_UPLOAD_WORKERS, checkpoint_file=DEFAULT_CHECKPOINT_FILE):
+    """Import to LTI; returns (successful, failed).
+
+    Questions skipped by the checkpoint or already in the question bank
+    count as successful; summarize_outcomes(import_mcqs(...)) gives the
+    separate counts.
+    """
+    summary = summarize_outcomes(import_mcqs(input_file, qb_id, token, 'LTI', max_workers, checkpoint_file))
+    return summary['created'] + summary['skipped'] + summary['exists'], summary['failed']
+
+
     
-    url = 'https://api.examly.io/api/mcq_question/create'
-    headers = {
-        'accept': 'application/json, text/plain, */*',
-        'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
-        'authorization': token,
-        'content-type': 'application/json',
-        'origin': 'https://admin.neowise.examly.io',
-        'referer': 'https://admin.neowise.examly.io/',
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
-    }
-    
-    successful_uploads = 0
-    failed_uploads = 0
-
-    for question in unique_questions:
-        question_to_post = question.copy()
-        question_to_post.pop('question_vector', None)
-        question_to_post['qb_id'] = qb_id
-        if not question_to_post['tags']:
-            question_to_post['tags'] = [""]
-        
-        try:
-            response = requests.post(url, json=question_to_post, headers=headers)
-            response.raise_for_status()
-            successful_uploads += 1
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error posting question to Neowise: {e}")
-            failed_uploads += 1
-    
-    return successful_uploads, failed_uploads
\ No newline at end of file
+def get_all_qbs_neowise(token, search=None, page=1, limit=25):
+    try:
+        return fetch_question_banks(token, 'Neowise', search, page, limit)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching Question Banks from Neowise: {e}")
+        if getattr(e, 'response', None) is not None:
+            logging.error(f"Response content: {e.response.content}")
+        return None
+
+def import_mcqs_to_neowise(input_file, qb_id, created_by, token, max_workers=MAX_UPLOAD_WORKERS, checkpoint_file=DEFAULT_CHECKPOINT_FILE):
+    """Import to Neowise; returns (successful, failed) like import_mcqs_to_examly."""
+    summary = summarize_outcomes(import_mcqs(input_file, qb_id, token, 'Neowise', max_workers, checkpoint_file))
+    return summary['created'] + summary['skipped'] + summary['exists'], summary['failed']
@@ -1,17 +1,36 @@
 import streamlit as st
-import json
 import os
 import logging
 import traceback
-from prompt import generate_mcqs, problem_solving_types
-from db import question_bank
-from api_handler import get_all_qbs, import_mcqs_to_examly, get_all_qbs_neowise, import_mcqs_to_neowise
-from convertor import save_to_file, convert_to_json_format, save_unique_mcqs
+from prompt import problem_solving_types, generate_mcqs_structured
+from db import get_question_bank, warm_up
+from api_handler import SYNC_EXISTING_QUESTIONS, import_mcqs, import_mcqs_to_targets, summarize_outcomes
+from qb_catalog import QuestionBankCatalog
+from convertor import save_to_file, save_unique_mcqs, structured_to_json_format
+from pipeline import stream_generate_and_index
+from topic_coverage import TopicYieldTracker, format_exclusions, get_existing_coverage
+from flow_control import flow_controller
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+
+@st.cache_resource
+def start_warm_up():
+    # Runs once per process; the model and Elasticsearch connection are
+    # prepared in the background while the UI renders.
+    return warm_up()
+
+
+start_warm_up()
+
+
+@st.cache_resource
+def get_yield_tracker():
+    return TopicYieldTracker()
+
+
 # Streamlit UI
 st.title("MCQ Generator and Importer")
 
@@ -28,26 +47,60 @@ selected_filters = []
 if question_type == "Problem-solving":
     selected_filters = st.multiselect("Select Problem-solving Question Types", problem_solving_types)
 
+structured_output = st.checkbox("Use structured output (JSON schema) instead of streaming text", value=False)
+refresh_plan = st.checkbox("Request a fresh meta-sorting plan", value=False)
+avoid_existing = st.checkbox("Steer generation away from questions already in the bank", value=True)
+
 if st.button("Generate MCQs"):
     try:
-        mcqs = generate_mcqs(topic, num_questions, difficulty, question_type, selected_filters)
-        question_prompt_file = 'question_prompt.txt'
-        save_to_file(question_prompt_file, mcqs)
-        st.success(f"{num_questions} {question_type} MCQs generated and saved to {question_prompt_file}.")
-        
-        # Convert generated MCQs to JSON format
+        question_bank = get_question_bank()
+        if question_bank is None:
+            raise Exception("Question bank is not available. Check the Elasticsearch connection.")
+
         created_by = "19d0e40a-fd35-4741-89ab-11f3c7d4b118"  # This could be made an input if needed
-        json_questions = convert_to_json_format(question_prompt_file, None, created_by)
-        
-        st.info(f"Total questions converted to JSON: {len(json_questions)}")
-        
-        # Add unique questions to Elasticsearch and get the list of unique questions
-        unique_questions, duplicates = question_bank.add_unique_questions(json_questions)
+        unique_questions = []
+        converted = 0
+        duplicates = 0
+        progress = st.empty()
+
+        yield_tracker = get_yield_tracker()
+        exclusions = ""
+        if avoid_existing and topic:
+            coverage = get_existing_coverage(question_bank, topic, yield_rate=yield_tracker.yield_rate(topic))
+            exclusions = format_exclusions(coverage)
+
+        if structured_output:
+            with st.spinner("Generating MCQs..."):
+                items = generate_mcqs_structured(topic, num_questions, difficulty, question_type, selected_filters, refresh_plan=refresh_plan, exclusions=exclusions)
+                json_questions = structured_to_json_format(items, None, created_by)
+                converted = len(json_questions)
+                unique_questions, duplicates = question_bank.add_unique_questions(json_questions)
+            events = []
+        else:
+            # Questions are parsed, deduplicated and indexed while the rest are still being generated
+            events = stream_generate_and_index(topic, num_questions, difficulty, question_type, selected_filters, created_by, question_bank, refresh_plan=refresh_plan, exclusions=exclusions)
+
+        for event in events:
+            if event['type'] == 'question':
+                converted += 1
+                if event['status'] == 'added':
+                    unique_questions.append(event['question'])
+                elif event['status'] == 'duplicate':
+                    duplicates += 1
+                progress.info(f"Questions received: {converted}, unique: {len(unique_questions)}, duplicates: {duplicates}")
+            elif event['type'] == 'done':
+                question_prompt_file = 'question_prompt.txt'
+                save_to_file(question_prompt_file, event['raw_text'])
+
+        st.info(f"Total questions converted to JSON: {converted}")
+        yield_tracker.record(topic, converted, len(unique_questions))
+        topic_yield = yield_tracker.yield_rate(topic)
+        if topic_yield is not None:
+            st.info(f"Unique-question yield for this topic so far: {topic_yield:.0%}")
         
         # Save unique questions to a new file
         unique_mcqs_file = 'unique_mcqs.json'
-        with open(unique_mcqs_file, 'w', encoding='utf-8') as f:
-            json.dump(unique_questions, f, ensure_ascii=False, indent=2)
+        save_unique_mcqs(unique_questions, unique_mcqs_file)
         
         st.success(f"{len(unique_questions)} new unique questions added to Elasticsearch and saved to {unique_mcqs_file}. {duplicates} duplicates skipped.")
         
@@ -64,27 +117,35 @@ st.header("Fetch Question Banks")
 token = st.text_input("Enter your authorization token:", type="password")
 search_query = st.text_input("Search question banks:")
 
-if 'question_banks' not in st.session_state:
-    st.session_state.question_banks = None
+if 'qb_catalogs' not in st.session_state:
+    st.session_state.qb_catalogs = {}
+if domain not in st.session_state.qb_catalogs:
+    st.session_state.qb_catalogs[domain] = QuestionBankCatalog(domain)
+catalog = st.session_state.qb_catalogs[domain]
 
-if st.button("Search Question Banks"):
+if st.button("Sync Question Banks"):
     if token:
-        with st.spinner("Searching question banks..."):
-            if domain == "LTI":
-                question_banks = get_all_qbs(token, search_query, limit=50)
-            else:  # Neowise
-                question_banks = get_all_qbs_neowise(token, search_query, limit=50)
-        st.session_state.question_banks = question_banks
+        with st.spinner("Syncing question banks..."):
+            try:
+                if catalog.qbs:
+                    changed = catalog.sync(token)
+                    st.info(f"{changed} new or updated question banks.")
+                else:
+                    catalog.prefetch(token)
+            except Exception as e:
+                st.error(f"Failed to fetch question banks. Please check your token and try again. ({str(e)})")
     else:
         st.warning("Please enter your authorization token.")
 
-if st.session_state.question_banks:
-    question_banks = st.session_state.question_banks
-    if 'results' in question_banks and 'questionbanks' in question_banks['results']:
-        qb_options = [(qb['qb_name'], qb['qb_id']) for qb in question_banks['results']['questionbanks']]
-        
-        st.success(f"Found {len(qb_options)} matching question banks.")
-        
+if catalog.qbs:
+    matches, total_matches = catalog.search(search_query)
+    qb_options = [(qb['qb_name'], qb['qb_id']) for qb in matches]
+
+    st.success(f"Found {total_matches} matching question banks out of {len(catalog.qbs)}.")
+    if total_matches > len(qb_options):
+        st.caption(f"Showing the first {len(qb_options)}. Refine the search to narrow them down.")
+
+    if qb_options:
         # Use radio buttons for selection
         st.subheader("Select a Question Bank:")
         selected_qb = st.radio(
@@ -96,8 +157,8 @@ if st.session_state.question_banks:
         if selected_qb:
             st.session_state.selected_qb_id = selected_qb[1]  # Store the selected qb_id
             st.info(f"Selected Question Bank: {selected_qb[0]}")
-    else:
-        st.error("Failed to fetch question banks. Please check your token and try again.")
+elif token:
+    st.info("Click \"Sync Question Banks\" to download the question bank list for this domain.")
 
 # MCQ Import Section
 st.header(f"Import MCQs to {domain}")
@@ -108,16 +169,77 @@ if 'selected_qb_id' in st.session_state:
 else:
     qb_id = st.text_input("Enter Question Bank ID (qb_id):")
 
+sync_existing = st.checkbox(
+    "Skip questions the question bank already has",
+    value=SYNC_EXISTING_QUESTIONS,
+    help="Downloads the question bank's existing questions before uploading. The first sync of a large bank can take minutes."
+)
+if sync_existing:
+    st.caption("Existing-question sync is on: each target question bank is synced before its upload.")
+
 if st.button(f"Import MCQs to {domain}"):
     if qb_id and token:
         try:
-            if domain == "LTI":
-                successful_uploads, failed_uploads = import_mcqs_to_examly('unique_mcqs.json', qb_id, "19d0e40a-fd35-4741-89ab-11f3c7d4b118", token)
-            else:  # Neowise
-                successful_uploads, failed_uploads = import_mcqs_to_neowise('unique_mcqs.json', qb_id, "19d0e40a-fd35-4741-89ab-11f3c7d4b118", token)
-            st.success(f"MCQs imported to {domain}. Successful: {successful_uploads}, Failed: {failed_uploads}")
+            with st.spinner(f"Syncing existing questions and importing MCQs to {domain}..." if sync_existing else f"Importing MCQs to {domain}..."):
+                outcomes = import_mcqs('unique_mcqs.json', qb_id, token, domain, sync_existing=sync_existing)
+            summary = summarize_outcomes(outcomes)
+            st.success(f"MCQs imported to {domain}. Successful: {summary['created']}, Failed: {summary['failed']}, Already imported: {summary['skipped']}, Already in question bank: {summary['exists']}")
+            failed = [outcome for outcome in outcomes if outcome['status'] == 'failed']
+            if failed:
+                st.warning("Some questions failed to upload. Run the import again to retry only those questions.")
+                st.table(failed)
+        except Exception as e:
+            st.error(f"Error importing MCQs: {str(e)}")
+            st.error(f"Error details: {traceback.format_exc()}")
+    else:
+        st.warning("Please enter valid Question Bank ID and Authorization Token.")
+
+# Multi-target Import Section
+st.header("Import MCQs to Multiple Question Banks")
+
+if 'import_targets' not in st.session_state:
+    st.session_state.import_targets = {}
+if 'domain_tokens' not in st.session_state:
+    st.session_state.domain_tokens = {}
+
+if st.button(f"Add selected {domain} question bank to targets"):
+    if qb_id and token:
+        st.session_state.domain_tokens[domain] = token
+        name = catalog.qbs.get(qb_id, {}).get('qb_name', qb_id)
+        st.session_state.import_targets[(domain, qb_id)] = name
+    else:
+        st.warning("Please select a question bank and enter the authorization token for this domain.")
+
+if st.session_state.import_targets and st.button("Clear targets"):
+    st.session_state.import_targets = {}
+
+if st.session_state.import_targets:
+    st.write("Import targets:")
+    for (target_domain, target_qb_id), name in st.session_state.import_targets.items():
+        st.write(f"- {target_domain}: {name}")
+
+    if st.button("Import MCQs to all targets"):
+        try:
+            with st.spinner("Importing MCQs to all targets..."):
+                results = import_mcqs_to_targets(
+                    'unique_mcqs.json',
+                    list(st.session_state.import_targets),
+                    st.session_state.domain_tokens,
+                    sync_existing=sync_existing
+                )
+            for (target_domain, target_qb_id), outcomes in results.items():
+                summary = summarize_outcomes(outcomes)
+                name = st.session_state.import_targets[(target_domain, target_qb_id)]
+                st.write(f"{target_domain} / {name}: Successful: {summary['created']}, Failed: {summary['failed']}, Already imported: {summary['skipped']}, Already in question bank: {summary['exists']}")
         except Exception as e:
             st.error(f"Error importing MCQs: {str(e)}")
             st.error(f"Error details: {traceback.format_exc()}")
+
+# Flow Control Metrics
+with st.expander("Upstream flow control"):
+    # Current in-flight limit, outcomes and latency per external endpoint
+    snapshot = flow_controller.snapshot()
+    if snapshot:
+        st.table(snapshot)
     else:
-        st.warning("Please enter valid Question Bank ID and Authorization Token.")
\ No newline at end of file
+        st.write("No external calls made yet.")
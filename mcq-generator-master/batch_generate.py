@@ -0,0 +1,306 @@
+"""Generate MCQs for a whole syllabus in one resumable batch job.
+
+    python batch_generate.py syllabus.json --workers 8 --rpm 60
+    python batch_generate.py syllabus.json --resume
+
+The syllabus lists topics with their target number of unique questions,
+difficulty mix and question types; anything a topic leaves out comes
+from "defaults":
+
+    {
+      "defaults": {"questions": 50, "difficulty_mix": {"Easy": 0.3, "Medium": 0.5, "Hard": 0.2},
+                   "question_types": ["Conceptual"]},
+      "topics": [
+        "Python decorators",
+        {"topic": "SQL joins", "questions": 120, "question_types": ["Conceptual", "Problem-solving"],
+         "selected_filters": []}
+      ]
+    }
+
+Each topic's target is split across its difficulty mix and question types
+into cells. A worker pool generates one batch of up to --batch-size
+questions per cell at a time with structured output, steered away from
+what the bank already covers. It adds the unique ones to QuestionBank
+immediately and schedules another batch while the cell is below target.
+A cell gives up after --max-rounds batches. All workers share one
+requests-per-minute budget, covering every LLM request of the job (meta-
+sorting plans and retries included), on top of the flow controller's
+per-endpoint concurrency limit.
+
+Progress is checkpointed after every batch and unique questions are
+appended to --output as JSON lines, so --resume continues where an
+interrupted run stopped; without --resume, --output is emptied first. At
+the end the unique questions are also written to --import-file in the
+format import_mcqs expects, and the unique-question yield of every topic
+is printed (and saved to --report if given).
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from convertor import save_unique_mcqs, structured_to_json_format
+from prompt import generate_mcqs_structured, set_rate_limiter
+from topic_coverage import TopicYieldTracker, format_exclusions, get_existing_coverage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+QUESTION_TYPES = ["Conceptual", "Factual", "Problem-solving", "Scenario-based"]
+DEFAULT_CREATED_BY = "19d0e40a-fd35-4741-89ab-11f3c7d4b118"
+BATCH_CHECKPOINT_PATH = os.getenv('BATCH_CHECKPOINT_PATH', 'batch_checkpoint.json')
+BATCH_LLM_RPM = float(os.getenv('BATCH_LLM_RPM', '60'))
+MAX_BATCH_ERRORS = 3
+
+
+class RateLimiter:
+    """Spaces calls evenly so that at most `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _split(total, weights):
+    """Split total across weights (a dict) by largest remainder, so the parts add up to total."""
+    weight_sum = sum(weights.values()) or 1
+    exact = {key: total * weight / weight_sum for key, weight in weights.items()}
+    parts = {key: math.floor(value) for key, value in exact.items()}
+    for key in sorted(exact, key=lambda k: exact[k] - parts[k], reverse=True)[:total - sum(parts.values())]:
+        parts[key] += 1
+    return parts
+
+
+def load_syllabus(path):
+    """Cells of the syllabus: {key: {topic, difficulty, question_type, selected_filters, target}}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        syllabus = json.load(f)
+    defaults = {'questions': 50, 'difficulty_mix': {'Medium': 1}, 'question_types': ['Conceptual'], 'selected_filters': []}
+    defaults.update(syllabus.get('defaults', {}))
+
+    cells = {}
+    for entry in syllabus['topics']:
+        entry = {'topic': entry} if isinstance(entry, str) else entry
+        spec = dict(defaults, **entry)
+        for difficulty in spec['difficulty_mix']:
+            if difficulty not in DIFFICULTIES:
+                raise ValueError(f"{spec['topic']}: invalid difficulty {difficulty!r}, must be one of {DIFFICULTIES}")
+        for question_type in spec['question_types']:
+            if question_type not in QUESTION_TYPES:
+                raise ValueError(f"{spec['topic']}: invalid question type {question_type!r}, must be one of {QUESTION_TYPES}")
+
+        by_difficulty = _split(int(spec['questions']), spec['difficulty_mix'])
+        for difficulty, count in by_difficulty.items():
+            by_type = _split(count, {question_type: 1 for question_type in spec['question_types']})
+            for question_type, target in by_type.items():
+                if target:
+                    key = f"{spec['topic']}|{difficulty}|{question_type}"
+                    cells[key] = {
+                        'topic': spec['topic'],
+                        'difficulty': difficulty,
+                        'question_type': question_type,
+                        'selected_filters': spec['selected_filters'],
+                        'target': target,
+                    }
+    return cells
+
+
+class BatchGenerator:
+    def __init__(self, question_bank, cells, checkpoint_path=BATCH_CHECKPOINT_PATH, output_path='batch_unique_mcqs.jsonl',
+                 workers=4, rpm=BATCH_LLM_RPM, batch_size=20, max_rounds=None, created_by=DEFAULT_CREATED_BY,
+                 yield_tracker=None):
+        self.question_bank = question_bank
+        self.cells = cells
+        self.checkpoint_path = checkpoint_path
+        self.output_path = output_path
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rpm)
+        self.batch_size = min(batch_size, 100)
+        self.max_rounds = max_rounds
+        self.created_by = created_by
+        self.yield_tracker = yield_tracker or TopicYieldTracker()
+        self.progress = {}
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.progress = json.load(f)['cells']
+
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'cells': self.progress}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _state(self, key):
+        return self.progress.setdefault(key, {'generated': 0, 'unique': 0, 'rounds': 0, 'errors': 0, 'status': 'pending'})
+
+    def _rounds_allowed(self, cell):
+        return self.max_rounds or 3 * math.ceil(cell['target'] / self.batch_size)
+
+    def _next_batch(self, key):
+        """Questions to ask for in the cell's next batch, or 0 when the cell is finished."""
+        cell, state = self.cells[key], self._state(key)
+        if state['status'] != 'pending':
+            return 0
+        remaining = cell['target'] - state['unique']
+        if remaining <= 0:
+            state['status'] = 'done'
+        elif state['rounds'] >= self._rounds_allowed(cell):
+            state['status'] = 'saturated'
+        elif state['errors'] >= MAX_BATCH_ERRORS:
+            state['status'] = 'failed'
+        else:
+            return min(remaining, self.batch_size)
+        return 0
+
+    def _generate_batch(self, key, count):
+        """Generate one batch for a cell and index it; returns (generated, unique questions)."""
+        cell = self.cells[key]
+        coverage = get_existing_coverage(self.question_bank, cell['topic'], yield_rate=self.yield_tracker.yield_rate(cell['topic']))
+        items = generate_mcqs_structured(
+            cell['topic'], count, cell['difficulty'], cell['question_type'], cell['selected_filters'],
+            exclusions=format_exclusions(coverage)
+        )
+        json_questions = structured_to_json_format(items, None, self.created_by)
+        unique_questions, _ = self.question_bank.add_unique_questions(json_questions)
+        return len(json_questions), unique_questions
+
+    def _record(self, key, generated, unique_questions):
+        with self._lock:
+            state = self._state(key)
+            state['rounds'] += 1
+            state['generated'] += generated
+            state['unique'] += len(unique_questions)
+            with open(self.output_path, 'a', encoding='utf-8') as f:
+                for question in unique_questions:
+                    question = {k: v for k, v in question.items() if k != 'question_vector'}
+                    f.write(json.dumps({'cell': key, 'question': question}, ensure_ascii=False) + '\n')
+            self._save_checkpoint()
+        self.yield_tracker.record(self.cells[key]['topic'], generated, len(unique_questions))
+
+    def run(self, resume=False):
+        """Generate until every cell is done, saturated or failed; returns the per-topic report."""
+        if resume:
+            self._load_checkpoint()
+        elif os.path.exists(self.checkpoint_path):
+            raise Exception(f"{self.checkpoint_path} exists; pass --resume or remove it")
+        if not self.progress:
+            # Nothing to continue from, so earlier runs' questions must not end up in this run's export
+            open(self.output_path, 'w', encoding='utf-8').close()
+
+        set_rate_limiter(self.rate_limiter)
+        try:
+            self._run_cells()
+        finally:
+            set_rate_limiter(None)
+        with self._lock:
+            self._save_checkpoint()
+        return self.report()
+
+    def _run_cells(self):
+        ready = list(self.cells)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while ready or in_flight:
+                while ready and len(in_flight) < self.workers:
+                    key = ready.pop(0)
+                    count = self._next_batch(key)
+                    if count:
+                        in_flight[executor.submit(self._generate_batch, key, count)] = key
+                if not in_flight:
+                    continue
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = in_flight.pop(future)
+                    try:
+                        generated, unique_questions = future.result()
+                        self._record(key, generated, unique_questions)
+                        logger.info(f"{key}: {len(unique_questions)}/{generated} unique, "
+                                    f"{self.progress[key]['unique']}/{self.cells[key]['target']} so far")
+                    except Exception as e:
+                        logger.error(f"{key}: batch failed: {e}")
+                        with self._lock:
+                            self._state(key)['errors'] += 1
+                            self._save_checkpoint()
+                    # Back of the queue, so other cells get their turn first
+                    ready.append(key)
+
+    def report(self):
+        """Per topic: target, generated, unique, yield and the cell statuses."""
+        topics = {}
+        for key, cell in self.cells.items():
+            state = self._state(key)
+            row = topics.setdefault(cell['topic'], {'topic': cell['topic'], 'target': 0, 'generated': 0, 'unique': 0, 'statuses': {}})
+            row['target'] += cell['target']
+            row['generated'] += state['generated']
+            row['unique'] += state['unique']
+            row['statuses'][state['status']] = row['statuses'].get(state['status'], 0) + 1
+        for row in topics.values():
+            row['yield'] = round(row['unique'] / row['generated'], 3) if row['generated'] else None
+        return sorted(topics.values(), key=lambda row: (row['yield'] is None, row['yield'] or 0))
+
+    def unique_questions(self):
+        questions = []
+        if os.path.exists(self.output_path):
+            with open(self.output_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    questions.append(json.loads(line)['question'])
+        return questions
+
+
+def main():
+    from db import get_question_bank
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('syllabus', help='syllabus JSON file')
+    parser.add_argument('--workers', type=int, default=4, help='batches generated at once')
+    parser.add_argument('--rpm', type=float, default=BATCH_LLM_RPM, help='LLM requests started per minute, across all workers')
+    parser.add_argument('--batch-size', type=int, default=20, help='questions asked for per request (at most 100)')
+    parser.add_argument('--max-rounds', type=int, default=None, help='batches per cell before giving up (default: 3x the batches its target needs)')
+    parser.add_argument('--checkpoint', default=BATCH_CHECKPOINT_PATH)
+    parser.add_argument('--output', default='batch_unique_mcqs.jsonl', help='unique questions, appended as JSON lines')
+    parser.add_argument('--import-file', default='unique_mcqs.json', help='unique questions in the format import_mcqs reads')
+    parser.add_argument('--report', help='write the per-topic yield report to this JSON file')
+    parser.add_argument('--created-by', default=DEFAULT_CREATED_BY)
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint of an interrupted run')
+    args = parser.parse_args()
+
+    question_bank = get_question_bank()
+    if question_bank is None:
+        raise SystemExit("Question bank is not available. Check the Elasticsearch connection.")
+
+    generator = BatchGenerator(
+        question_bank, load_syllabus(args.syllabus), checkpoint_path=args.checkpoint, output_path=args.output,
+        workers=args.workers, rpm=args.rpm, batch_size=args.batch_size, max_rounds=args.max_rounds,
+        created_by=args.created_by
+    )
+    report = generator.run(resume=args.resume)
+    save_unique_mcqs(generator.unique_questions(), args.import_file)
+
+    print(f"\n{'topic':<40} {'target':>7} {'generated':>10} {'unique':>7} {'yield':>6}  cells")
+    for row in report:
+        topic_yield = f"{row['yield']:.0%}" if row['yield'] is not None else '-'
+        statuses = ', '.join(f"{status}: {count}" for status, count in sorted(row['statuses'].items()))
+        print(f"{row['topic'][:40]:<40} {row['target']:>7} {row['generated']:>10} {row['unique']:>7} {topic_yield:>6}  {statuses}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,103 +11,237 @@ def save_to_file(filename, text):
         logging.error(f"Failed to save file {filename}: {e}")
 
 
-def convert_to_json_format(input_file, qb_id, created_by):
-    with open(input_file, 'r', encoding='utf-8') as file:
-        content = file.read()
+QUESTION_START = re.compile(r'^\W*Q\d+\.')
+TAGS_LINE = re.compile(r'^\W*Tags:')
+
+
+def _build_json_question(question_text, code_block, options, correct_answer_index, difficulty, tags, qb_id, created_by):
+    # Combine question text and code block
+    question_data = f"<p>{question_text}</p>"
+    if code_block:
+        question_data += f"$$$examly{code_block}"
+
+    json_question = {
+        "question_type": "mcq_single_correct",
+        "question_data": question_data,
+        "options": [{"text": opt, "media": ""} for opt in options],
+        "answer": {
+            "args": [options[correct_answer_index]],
+            "partial": []
+        },
+        "subject_id": None,
+        "topic_id": None,
+        "sub_topic_id": None,
+        "blooms_taxonomy": None,
+        "course_outcome": None,
+        "program_outcome": None,
+        "hint": [],
+        "answer_explanation": {
+            "args": []
+        },
+        "manual_difficulty": difficulty,
+        "question_editor_type": 3 if code_block else 1,
+        "linked_concepts": "",
+        "tags": tags,
+        "question_media": [],
+        "createdBy": created_by
+    }
+    if qb_id:
+        json_question["qb_id"] = qb_id
+    return json_question
+
+
+def parse_question(question, i, qb_id, created_by):
+    """Convert one generated question block to the examly JSON format, or None if it is malformed."""
+    logging.info(f"Processing question {i}")
+    
+    try:
+        # Extract question text and code block, removing the trailing asterisks
+        question_match = re.search(r'Q\d+\.\s*(.*?)(?:\*\*)?(?=\n```|\n1\)|\Z)', question, re.DOTALL)
+        if not question_match:
+            logging.warning(f"Question {i}: No match for question text")
+            return None
+        question_text = question_match.group(1).strip()
+
+        # Extract code snippet
+        code_match = re.search(r'```(?:java|javascript|html|typescript|cpp|csharp|js|css|sql|yaml|bash)\n(.*?)```', question, re.DOTALL)
+        code_block = code_match.group(1).strip() if code_match else ""
+
+        # Extract options (ensure exactly four)
+        options = re.findall(r'\d+\)\s*(.*?)(?=\n\d+\)|\nCorrect answer:|\Z)', question, re.DOTALL)
+        options = [opt.strip() for opt in options if opt.strip()]
+
+        # If more than 4 options, remove the first one
+        if len(options) > 4:
+            logging.warning(f"Question {i}: More than 4 options found. Removing the first option.")
+            options.pop(0)  # Remove the first option
+
+        # Ensure exactly 4 options remain
+        if len(options) != 4:
+            logging.warning(f"Question {i}: Incorrect number of options ({len(options)}). Skipping question.")
+            return None  # Skip this question if there are not exactly 4 options
+
+        # Extract correct answer
+        correct_answer_match = re.search(r'Correct answer:\s*(\d+)', question)
+        if not correct_answer_match:
+            logging.warning(f"Question {i}: No correct answer found")
+            return None
+        correct_answer_index = int(correct_answer_match.group(1)) - 1
+
+        # Ensure correct answer index is within range
+        if correct_answer_index < 0 or correct_answer_index >= len(options):
+            logging.warning(f"Question {i}: Correct answer index out of range. Index: {correct_answer_index}, Options: {len(options)}")
+            return None
+
+        difficulty = re.search(r'Difficulty:\s*(\w+)', question)
+        difficulty = difficulty.group(1) if difficulty else "Easy"
+
+        tags_match = re.search(r'Tags:\s*(.*)', question)
+        tags = [tag.strip() for tag in tags_match.group(1).split(',')] if tags_match else []
+
+        json_question = _build_json_question(question_text, code_block, options, correct_answer_index, difficulty, tags, qb_id, created_by)
+        logging.info(f"Successfully processed question {i}")
+        return json_question
+    except Exception as e:
+        logging.error(f"Error processing question {i}: {str(e)}")
+        logging.debug(f"Question content: {question}")
+        return None
 
+
+def convert_text_to_json_format(content, qb_id, created_by):
     questions = re.split(r'\n---\n', content)
     logging.info(f"Total questions split: {len(questions)}")
     json_questions = []
 
     for i, question in enumerate(questions, 1):
-        logging.info(f"Processing question {i}")
-        
-        try:
-            # Extract question text and code block, removing the trailing asterisks
-            question_match = re.search(r'Q\d+\.\s*(.*?)(?:\*\*)?(?=\n```|\n1\)|\Z)', question, re.DOTALL)
-            if not question_match:
-                logging.warning(f"Question {i}: No match for question text")
-                continue
-            question_text = question_match.group(1).strip()
-
-            # Extract code snippet
-            code_match = re.search(r'```(?:java|javascript|html|typescript|cpp|csharp|js|css|sql|yaml|bash)\n(.*?)```', question, re.DOTALL)
-            code_block = code_match.group(1).strip() if code_match else ""
-
-            # Combine question text and code block
-            question_data = f"<p>{question_text}</p>"
-            if code_block:
-                question_data += f"$$$examly{code_block}"
-
-            # Extract options (ensure exactly four)
-            options = re.findall(r'\d+\)\s*(.*?)(?=\n\d+\)|\nCorrect answer:|\Z)', question, re.DOTALL)
-            options = [opt.strip() for opt in options if opt.strip()]
-
-            # If more than 4 options, remove the first one
-            if len(options) > 4:
-                logging.warning(f"Question {i}: More than 4 options found. Removing the first option.")
-                options.pop(0)  # Remove the first option
-
-            # Ensure exactly 4 options remain
-            if len(options) != 4:
-                logging.warning(f"Question {i}: Incorrect number of options ({len(options)}). Skipping question.")
-                continue  # Skip this question if there are not exactly 4 options
-
-            # Extract correct answer
-            correct_answer_match = re.search(r'Correct answer:\s*(\d+)', question)
-            if not correct_answer_match:
-                logging.warning(f"Question {i}: No correct answer found")
-                continue
-            correct_answer_index = int(correct_answer_match.group(1)) - 1
-
-            # Ensure correct answer index is within range
-            if correct_answer_index < 0 or correct_answer_index >= len(options):
-                logging.warning(f"Question {i}: Correct answer index out of range. Index: {correct_answer_index}, Options: {len(options)}")
-                continue
-
-            difficulty = re.search(r'Difficulty:\s*(\w+)', question)
-            difficulty = difficulty.group(1) if difficulty else "Easy"
-
-            tags_match = re.search(r'Tags:\s*(.*)', question)
-            tags = [tag.strip() for tag in tags_match.group(1).split(',')] if tags_match else []
-
-            json_question = {
-                "question_type": "mcq_single_correct",
-                "question_data": question_data,
-                "options": [{"text": opt, "media": ""} for opt in options],
-                "answer": {
-                    "args": [options[correct_answer_index]],
-                    "partial": []
-                },
-                "subject_id": None,
-                "topic_id": None,
-                "sub_topic_id": None,
-                "blooms_taxonomy": None,
-                "course_outcome": None,
-                "program_outcome": None,
-                "hint": [],
-                "answer_explanation": {
-                    "args": []
-                },
-                "manual_difficulty": difficulty,
-                "question_editor_type": 3 if code_block else 1,
-                "linked_concepts": "",
-                "tags": tags,
-                "question_media": [],
-                "createdBy": created_by
-            }
-            if qb_id:
-                json_question["qb_id"] = qb_id
+        json_question = parse_question(question, i, qb_id, created_by)
+        if json_question is not None:
             json_questions.append(json_question)
-            logging.info(f"Successfully processed question {i}")
-        except Exception as e:
-            logging.error(f"Error processing question {i}: {str(e)}")
-            logging.debug(f"Question content: {question}")
-            continue
 
     logging.info(f"\nTotal questions successfully processed: {len(json_questions)}")
     return json_questions
 
+
+def convert_to_json_format(input_file, qb_id, created_by):
+    with open(input_file, 'r', encoding='utf-8') as file:
+        content = file.read()
+    return convert_text_to_json_format(content, qb_id, created_by)
+
+
+class IncrementalQuestionParser:
+    """Splits a streamed completion into question blocks as soon as each one closes.
+
+    A block closes on its "Tags:" line (the last line of the generation
+    format) once a "Correct answer:" line has been seen, on a "---"
+    delimiter, or when the next "Q<n>." line starts. Lines after an early
+    close (e.g. a trailing "Explanation:") belong to the question already
+    returned and are dropped up to the next "---" or "Q<n>." line, which
+    starts the next block from an empty buffer as convert_text_to_json_format
+    does. feed() returns the blocks closed by the new text; close() returns
+    whatever is left.
+    """
+
+    def __init__(self):
+        self._partial = ''
+        self._lines = []
+        self._closed = False
+
+    def feed(self, text):
+        self._partial += text
+        *complete_lines, self._partial = self._partial.split('\n')
+        blocks = []
+        for line in complete_lines:
+            blocks.extend(self._add_line(line))
+        return blocks
+
+    def close(self):
+        blocks = []
+        if self._partial:
+            blocks.extend(self._add_line(self._partial))
+            self._partial = ''
+        block = self._flush()
+        if block:
+            blocks.append(block)
+        return blocks
+
+    def _has_answer(self):
+        return any('Correct answer:' in line for line in self._lines)
+
+    def _flush(self):
+        block = '\n'.join(self._lines)
+        self._lines = []
+        return block if block.strip() else None
+
+    def _add_line(self, line):
+        blocks = []
+        if line.strip() == '---':
+            self._closed = False
+            block = self._flush()
+            return [block] if block else []
+        if QUESTION_START.match(line):
+            if self._closed:
+                self._closed = False
+            elif self._has_answer():
+                block = self._flush()
+                if block:
+                    blocks.append(block)
+        if self._closed:
+            return blocks
+        self._lines.append(line)
+        if TAGS_LINE.match(line) and self._has_answer():
+            blocks.append(self._flush())
+            self._closed = True
+        return blocks
+
 def save_unique_mcqs(mcqs, filename):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(mcqs, f, ensure_ascii=False, indent=2)
+
+
+def validate_structured_question(item):
+    """Check one item of a structured (JSON schema) generation; returns an error message or None."""
+    if not isinstance(item, dict):
+        return "not an object"
+    if not isinstance(item.get('question_text'), str) or not item['question_text'].strip():
+        return "missing question_text"
+    if not isinstance(item.get('code_snippet', ''), str):
+        return "code_snippet is not a string"
+    options = item.get('options')
+    if not isinstance(options, list) or len(options) != 4:
+        return f"expected 4 options, got {len(options) if isinstance(options, list) else options!r}"
+    if not all(isinstance(opt, str) and opt.strip() for opt in options):
+        return "options must be non-empty strings"
+    if len({opt.strip() for opt in options}) != 4:
+        return "options are not distinct"
+    correct_option = item.get('correct_option')
+    if isinstance(correct_option, bool) or not isinstance(correct_option, int) or not 1 <= correct_option <= 4:
+        return f"correct_option out of range: {correct_option!r}"
+    if item.get('difficulty') not in ('Easy', 'Medium', 'Hard'):
+        return f"invalid difficulty: {item.get('difficulty')!r}"
+    tags = item.get('tags', [])
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        return "tags must be a list of strings"
+    return None
+
+
+def structured_to_json_format(items, qb_id, created_by):
+    """Map validated structured-output questions straight to the examly import format."""
+    json_questions = []
+    for i, item in enumerate(items, 1):
+        error = validate_structured_question(item)
+        if error:
+            logging.warning(f"Question {i}: {error}. Skipping question.")
+            continue
+        options = [opt.strip() for opt in item['options']]
+        json_questions.append(_build_json_question(
+            item['question_text'].strip(),
+            (item.get('code_snippet') or '').strip(),
+            options,
+            item['correct_option'] - 1,
+            item['difficulty'],
+            [tag.strip() for tag in item.get('tags', []) if tag.strip()],
+            qb_id,
+            created_by
+        ))
+    logging.info(f"Total structured questions accepted: {len(json_questions)} of {len(items)}")
+    return json_questions
@@ -1,8 +1,12 @@
+import hashlib
+import html
+import math
 import os
+import re
+import threading
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
-from sentence_transformers import SentenceTransformer
 import logging
+from embeddings import get_embedder
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,24 +14,165 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Queries and writes go through this name. On a fresh install it is an alias
+# of INDEX_ALIAS_v1; reindex.py moves it to a new version without downtime.
+INDEX_ALIAS = os.getenv('ELASTICSEARCH_INDEX', 'mcq_questions')
+EMBEDDING_DIMS = int(os.getenv('EMBEDDING_DIMS', '384'))  # Dimension of the sentence transformer model
+# float stores question_vector as float32. int8 stores it as a byte
+# dense_vector, a quarter of the size in the vector index, which needs an
+# Elasticsearch 8.6+ server. The pinned 7.17 client talks to one only in
+# compatibility mode (ELASTIC_CLIENT_APIVERSIONING=true); against a 7.x
+# server int8 falls back to float. Similarity searches then rescore the
+# top num_results * VECTOR_RESCORE_FACTOR candidates with the
+# full-precision copy kept in FULL_VECTOR_FIELD, which is stored but not
+# indexed.
+VECTOR_ELEMENT_TYPE = os.getenv('VECTOR_ELEMENT_TYPE', 'float')
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', '4'))
+FULL_VECTOR_FIELD = 'question_vector_full'
+
+# Searches leave the stored vectors out of the documents they return.
+WITHOUT_VECTORS = {'excludes': ['question_vector', FULL_VECTOR_FIELD]}
+
+_question_bank = None
+_question_bank_lock = threading.Lock()
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize_text(text):
+    return _WHITESPACE.sub(' ', html.unescape(_HTML_TAG.sub(' ', text or ''))).strip().lower()
+
+
+def question_fingerprint(question):
+    """sha256 of a question's normalized stem, code block and sorted options.
+
+    The stem and options ignore markup, case and whitespace; the code block
+    only whitespace. It is stored in the fingerprint keyword field, and new
+    questions also use it as their _id, so a concurrent second write of the
+    same question is rejected.
+    """
+    stem, _, code = question.get('question_data', '').partition('$$$examly')
+    options = sorted(
+        _normalize_text(option.get('text', '') if isinstance(option, dict) else str(option))
+        for option in question.get('options') or []
+    )
+    content = '\x1f'.join([_normalize_text(stem), _WHITESPACE.sub(' ', code).strip()] + options)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def quantize_vector(vector):
+    """int8 copy of a vector for a byte dense_vector.
+
+    Each vector is scaled so its largest component is +-127; cosine
+    similarity does not depend on the scale.
+    """
+    scale = 127 / (max(abs(x) for x in vector) or 1.0)
+    return [int(round(x * scale)) for x in vector]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def supports_byte_vectors(client):
+    """Whether the cluster can store byte dense_vectors (Elasticsearch 8.6+)."""
+    version = [int(part) for part in re.findall(r'\d+', client.info()['version']['number'])[:2]]
+    return version >= [8, 6]
+
+
+def vector_element_type(client, requested=None):
+    """dense_vector element_type for new indices: 'byte' for int8 when the cluster supports it."""
+    requested = requested or VECTOR_ELEMENT_TYPE
+    if requested == 'int8':
+        if supports_byte_vectors(client):
+            return 'byte'
+        logger.warning("int8 vectors need an Elasticsearch 8.6+ server (with ELASTIC_CLIENT_APIVERSIONING=true "
+                       "for the pinned 7.17 client); storing float vectors")
+    elif requested != 'float':
+        logger.warning(f"Unknown VECTOR_ELEMENT_TYPE {requested!r}, storing float vectors")
+    return 'float'
+
+
+def create_client():
+    """Elasticsearch client for ELASTICSEARCH_HOST/ELASTICSEARCH_PORT."""
+    from elasticsearch import Elasticsearch
+    elasticsearch_host = os.getenv('ELASTICSEARCH_HOST', 'elasticsearch')
+    elasticsearch_port = os.getenv('ELASTICSEARCH_PORT', '9200')
+    return Elasticsearch(
+        hosts=[f"http://{elasticsearch_host}:{elasticsearch_port}"],
+        verify_certs=False,
+        ssl_show_warn=False,
+        request_timeout=30,
+        retry_on_timeout=True
+    )
+
+
+def build_index_body(dims=EMBEDDING_DIMS, alias=None, indexed_vectors=False, element_type='float'):
+    """Settings and mappings of a question index.
+
+    alias, when given, is attached to the new index. indexed_vectors adds
+    an HNSW index to question_vector for approximate kNN search, which
+    needs Elasticsearch 8.0 or later. element_type 'byte' stores int8
+    vectors (see vector_element_type), plus a float copy in
+    FULL_VECTOR_FIELD that is kept in _source only, for rescoring.
+    """
+    question_vector = {'type': 'dense_vector', 'dims': dims}
+    if element_type != 'float':
+        question_vector['element_type'] = element_type
+    if indexed_vectors:
+        question_vector.update({'index': True, 'similarity': 'cosine'})
+    index_body = {
+        'settings': {
+            'index': {
+                'number_of_shards': 1,
+                'number_of_replicas': 0
+            }
+        },
+        'mappings': {
+            'properties': {
+                'question_data': {'type': 'text'},
+                'options': {'type': 'nested'},
+                'answer': {'type': 'object'},
+                'difficulty': {'type': 'keyword'},
+                'tags': {'type': 'keyword'},
+                'fingerprint': {'type': 'keyword'},
+                'question_vector': question_vector
+            }
+        }
+    }
+    if element_type != 'float':
+        index_body['mappings']['properties'][FULL_VECTOR_FIELD] = {'type': 'float', 'index': False, 'doc_values': False}
+    if alias:
+        index_body['aliases'] = {alias: {}}
+    return index_body
+
+
 class QuestionBank:
-    def __init__(self):
+    def __init__(self, client=None, embedder=None):
+        """Connect to Elasticsearch and make sure the index exists.
+
+        client and embedder default to an Elasticsearch client built from
+        ELASTICSEARCH_HOST/ELASTICSEARCH_PORT and the process-wide embedder;
+        pass others in to run against a stand-in (see loadtest/).
+        """
         try:
-            elasticsearch_host = os.getenv('ELASTICSEARCH_HOST', 'elasticsearch')
-            elasticsearch_port = os.getenv('ELASTICSEARCH_PORT', '9200')
-            self.client = Elasticsearch(
-                hosts=[f"http://{elasticsearch_host}:{elasticsearch_port}"],
-                verify_certs=False,
-                ssl_show_warn=False,
-                request_timeout=30,
-                retry_on_timeout=True
-            )
-            self.index_name = 'mcq_questions'
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.client = client or create_client()
+            self.index_name = INDEX_ALIAS
+            self.embedder = embedder or get_embedder()
+            
+            self.vector_element_type = 'float'
+            # Rescoring candidates that had to be encoded for lack of a stored full-precision vector
+            self.rescore_encodes = 0
+            # Keyword field existing_fingerprints matches; None looks fingerprints up by _id instead
+            self.fingerprint_field = 'fingerprint'
             
             if self.client.ping():
                 logger.info("Connected to Elasticsearch")
                 self._create_index_if_not_exists()
+                self.vector_element_type = self._stored_element_type()
             else:
                 logger.error("Could not connect to Elasticsearch")
                 
@@ -37,67 +182,183 @@ class QuestionBank:
 
     def _create_index_if_not_exists(self):
         try:
+            # exists() is true for an alias as well as for a concrete index
+            # created before indices were versioned.
             if not self.client.indices.exists(index=self.index_name):
-                index_body = {
-                    'settings': {
-                        'index': {
-                            'number_of_shards': 1,
-                            'number_of_replicas': 0
-                        }
-                    },
-                    'mappings': {
-                        'properties': {
-                            'question_data': {'type': 'text'},
-                            'options': {'type': 'nested'},
-                            'answer': {'type': 'object'},
-                            'difficulty': {'type': 'keyword'},
-                            'tags': {'type': 'keyword'},
-                            'question_vector': {
-                                'type': 'dense_vector',
-                                'dims': 384  # Dimension of the sentence transformer model
-                            }
-                        }
-                    }
-                }
-                self.client.indices.create(index=self.index_name, body=index_body)
-                logger.info(f"Created index: {self.index_name}")
+                versioned_index = f"{self.index_name}_v1"
+                index_body = build_index_body(alias=self.index_name, element_type=vector_element_type(self.client))
+                self.client.indices.create(index=versioned_index, body=index_body)
+                logger.info(f"Created index: {versioned_index} (alias {self.index_name})")
             else:
                 logger.info(f"Index {self.index_name} already exists")
+                self._ensure_fingerprint_field()
         except Exception as e:
             logger.error(f"Error creating index: {e}")
             raise
 
+    def _ensure_fingerprint_field(self):
+        # Indices created before fingerprints were stored have no fingerprint
+        # mapping, or a dynamic text one once a fingerprint was written.
+        try:
+            for name, index in self.client.indices.get(index=self.index_name).items():
+                mapping = index.get('mappings', {}).get('properties', {}).get('fingerprint')
+                if mapping is None:
+                    self.client.indices.put_mapping(index=name, body={'properties': {'fingerprint': {'type': 'keyword'}}})
+                    logger.info(f"Added the fingerprint keyword field to index {name}")
+                elif mapping.get('type') != 'keyword':
+                    # A dynamic text mapping has a keyword subfield that still matches exactly
+                    if mapping.get('fields', {}).get('keyword', {}).get('type') == 'keyword':
+                        if self.fingerprint_field:
+                            self.fingerprint_field = 'fingerprint.keyword'
+                        logger.warning(f"fingerprint is mapped as {mapping.get('type')} in index {name}; "
+                                       f"matching fingerprint.keyword. Run reindex.py to map it as keyword.")
+                    else:
+                        self._degrade_fingerprint_lookup(f"fingerprint is mapped as {mapping.get('type')} in index {name}")
+        except Exception as e:
+            self._degrade_fingerprint_lookup(f"could not check the fingerprint mapping: {e}")
+
+    def _degrade_fingerprint_lookup(self, reason):
+        if self.fingerprint_field is None:
+            return
+        self.fingerprint_field = None
+        logger.warning(f"Exact duplicates are now looked up by _id only ({reason}), so questions stored under "
+                       f"older random ids are not found. Run reindex.py to map fingerprint as keyword.")
+
+    def _stored_element_type(self):
+        # An existing index keeps the element_type it was created with;
+        # reindex.py --vector-type changes it.
+        try:
+            for index in self.client.indices.get(index=self.index_name).values():
+                return index['mappings']['properties']['question_vector'].get('element_type', 'float')
+        except Exception as e:
+            logger.error(f"Error reading the question_vector mapping: {e}")
+        return 'float'
+
+    def _stored_vector(self, vector):
+        if self.vector_element_type == 'byte':
+            return quantize_vector(vector)
+        return vector
+
+    def _vector_fields(self, vector):
+        # question_vector as indexed, plus the full-precision copy for rescoring int8 results
+        if self.vector_element_type == 'byte':
+            return {'question_vector': quantize_vector(vector), FULL_VECTOR_FIELD: list(vector)}
+        return {'question_vector': vector}
+
     def add_unique_questions(self, questions):
         unique_questions = []
         duplicates = 0
-        for question in questions:
-            question_text = question['question_data']
-            if '$$$examly' in question_text:
-                question_text = question_text.split('$$$examly')[0]
-            
-            logger.info(f"Checking question: {question_text[:50]}...")
-            is_duplicate, existing_question = self.question_exists(question_text, question['options'])
-            if not is_duplicate:
-                # Generate the question vector
-                question_vector = self.model.encode(question_text).tolist()
-                question['question_vector'] = question_vector
-                
-                # Index the question in Elasticsearch
-                response = self.client.index(index=self.index_name, body=question)
-                if response['result'] == 'created':
-                    unique_questions.append(question)
-                    logger.info(f"Added unique question to Elasticsearch: {question_text[:50]}...")
-                else:
-                    logger.warning(f"Failed to add question to Elasticsearch: {question_text[:50]}...")
+        # Exact duplicates, of stored questions or earlier ones in the batch,
+        # are found with one terms query and never reach the phrase search or encoder.
+        fingerprints = [question_fingerprint(question) for question in questions]
+        stored = self.existing_fingerprints(fingerprints)
+        candidates = []
+        seen = set()
+        for question, fingerprint in zip(questions, fingerprints):
+            if fingerprint in stored or fingerprint in seen:
+                logger.info(f"Exact duplicate skipped: {self._question_text(question)[:50]}...")
+                duplicates += 1
             else:
+                seen.add(fingerprint)
+                candidates.append((question, fingerprint))
+
+        question_texts = [self._question_text(question) for question, _ in candidates]
+        # Encode the whole batch in one call instead of one sentence at a time
+        question_vectors = self.embedder.encode(question_texts)
+        for (question, fingerprint), question_vector in zip(candidates, question_vectors):
+            status, _ = self.add_unique_question(question, question_vector, fingerprint, exact_checked=True)
+            if status == 'added':
+                unique_questions.append(question)
+            elif status == 'duplicate':
                 duplicates += 1
-                logger.info(f"Duplicate question skipped: {question_text[:50]}...")
-                logger.info(f"Existing question: {existing_question[:50]}...")
         
         return unique_questions, duplicates
 
-    def question_exists(self, question_data, options):
+    def existing_fingerprints(self, fingerprints):
+        """The subset of fingerprints already stored.
+
+        Matches the fingerprint field rather than _id, so documents that
+        kept an older random _id through reindex.py are found too. When
+        the index cannot match the field, falls back to _id, under which
+        new questions are stored.
+        """
+        fingerprints = list(set(fingerprints))
+        if not fingerprints:
+            return set()
+        if self.fingerprint_field:
+            try:
+                response = self.client.search(index=self.index_name, body={
+                    'size': len(fingerprints),
+                    'query': {'terms': {self.fingerprint_field: fingerprints}},
+                    # One hit per fingerprint, however many copies are stored
+                    'collapse': {'field': self.fingerprint_field},
+                    '_source': ['fingerprint']
+                })
+                return {hit['_source']['fingerprint'] for hit in response['hits']['hits']}
+            except Exception as e:
+                self._degrade_fingerprint_lookup(f"the fingerprint query failed: {e}")
+        try:
+            response = self.client.mget(index=self.index_name, body={'ids': fingerprints}, _source=False)
+            return {doc['_id'] for doc in response['docs'] if doc.get('found')}
+        except Exception as e:
+            logger.error(f"Error looking up question fingerprints: {e}")
+            return set()
+
+    def add_unique_question(self, question, question_vector=None, fingerprint=None, exact_checked=False):
+        """Index a single question unless it already exists.
+
+        Returns (status, existing_question) where status is 'added',
+        'duplicate' or 'failed'. exact_checked skips the fingerprint lookup
+        when the caller has already done it.
+        """
+        question_text = self._question_text(question)
+        fingerprint = fingerprint or question_fingerprint(question)
+        logger.info(f"Checking question: {question_text[:50]}...")
+        is_duplicate, existing_question = self.question_exists(
+            question_text, question['options'], None if exact_checked else fingerprint
+        )
+        if is_duplicate:
+            logger.info(f"Duplicate question skipped: {question_text[:50]}...")
+            logger.info(f"Existing question: {existing_question[:50]}...")
+            return 'duplicate', existing_question
+
+        if question_vector is None:
+            question_vector = self.embedder.encode([question_text])[0]
+        question['question_vector'] = question_vector
+        
+        # Index the question in Elasticsearch, under its fingerprint. op_type
+        # create never overwrites: a copy indexed concurrently by another
+        # producer since the check makes this write fail with 409.
+        body = dict(question, **self._vector_fields(question_vector), fingerprint=fingerprint)
         try:
+            response = self.client.index(index=self.index_name, body=body, id=fingerprint, op_type='create')
+        except Exception as e:
+            if getattr(e, 'status_code', None) == 409:
+                logger.info(f"Duplicate question indexed concurrently, skipped: {question_text[:50]}...")
+                return 'duplicate', question_text
+            raise
+        if response['result'] == 'created':
+            logger.info(f"Added unique question to Elasticsearch: {question_text[:50]}...")
+            return 'added', None
+        logger.warning(f"Failed to add question to Elasticsearch: {question_text[:50]}...")
+        return 'failed', None
+
+    @staticmethod
+    def _question_text(question):
+        question_text = question['question_data']
+        if '$$$examly' in question_text:
+            question_text = question_text.split('$$$examly')[0]
+        return question_text
+
+    def question_exists(self, question_data, options, fingerprint=None):
+        """(is_duplicate, existing question text).
+
+        With a fingerprint, an exact duplicate is looked up by fingerprint
+        first; the phrase search only runs when that finds nothing.
+        """
+        try:
+            if fingerprint and self.existing_fingerprints([fingerprint]):
+                return True, question_data
             query = {
                 "query": {
                     "bool": {
@@ -114,7 +375,7 @@ class QuestionBank:
                     }
                 }
             }
-            result = self.client.search(index=self.index_name, body=query)
+            result = self.client.search(index=self.index_name, body=dict(query, _source=WITHOUT_VECTORS))
             if result['hits']['total']['value'] > 0:
                 existing_question = result['hits']['hits'][0]['_source']['question_data']
                 return True, existing_question
@@ -124,37 +385,89 @@ class QuestionBank:
             return False, None
 
     def find_similar_questions(self, query, num_results=5):
+        """The num_results stored questions closest to query, without their vectors."""
         try:
-            query_vector = self.model.encode(query).tolist()
+            query_vector = self.embedder.encode([query])[0]
+            rescore = self.vector_element_type == 'byte' and VECTOR_RESCORE_FACTOR > 1
             search_body = {
-                "size": num_results,
+                "size": num_results * VECTOR_RESCORE_FACTOR if rescore else num_results,
+                # Candidates to rescore come with their full-precision vector
+                "_source": {'excludes': ['question_vector']} if rescore else WITHOUT_VECTORS,
                 "query": {
                     "script_score": {
                         "query": {"match_all": {}},
                         "script": {
                             "source": "cosineSimilarity(params.query_vector, 'question_vector') + 1.0",
-                            "params": {"query_vector": query_vector}
+                            "params": {"query_vector": self._stored_vector(query_vector)}
                         }
                     }
                 }
             }
             response = self.client.search(index=self.index_name, body=search_body)
-            return [hit['_source'] for hit in response['hits']['hits']]
+            questions = [hit['_source'] for hit in response['hits']['hits']]
+            if rescore:
+                questions = self._rescore(query_vector, questions)[:num_results]
+            return questions
         except Exception as e:
             logger.error(f"Error finding similar questions: {e}")
             return []
 
+    def _rescore(self, query_vector, questions):
+        # Re-rank candidates found with int8 vectors by full-precision cosine
+        # similarity, using the stored float copies. Only a document
+        # without one has its text encoded again.
+        vectors = [question.pop(FULL_VECTOR_FIELD, None) for question in questions]
+        missing = [i for i, vector in enumerate(vectors) if not vector]
+        if missing:
+            self.rescore_encodes += len(missing)
+            logger.warning(f"Encoding {len(missing)} rescoring candidates without a stored full-precision vector")
+            for i, vector in zip(missing, self.embedder.encode([self._question_text(questions[i]) for i in missing])):
+                vectors[i] = vector
+        scores = [_cosine(query_vector, vector) for vector in vectors]
+        return [question for _, question in sorted(zip(scores, questions), key=lambda pair: -pair[0])]
+
     def get_all_questions(self):
         try:
-            response = self.client.search(index=self.index_name, body={"query": {"match_all": {}}, "size": 10000})
+            response = self.client.search(index=self.index_name, body={"query": {"match_all": {}}, "size": 10000, "_source": WITHOUT_VECTORS})
             return [hit['_source'] for hit in response['hits']['hits']]
         except Exception as e:
             logger.error(f"Error getting all questions: {e}")
             return []
 
-# Create an instance of QuestionBank
-try:
-    question_bank = QuestionBank()
-except Exception as e:
-    logger.error(f"Failed to initialize QuestionBank: {e}")
-    question_bank = None
\ No newline at end of file
+def get_question_bank():
+    """Return the process-wide QuestionBank, creating it on first use.
+
+    Returns None if Elasticsearch could not be initialized; the next call
+    will try again.
+    """
+    global _question_bank
+    if _question_bank is None:
+        with _question_bank_lock:
+            if _question_bank is None:
+                try:
+                    _question_bank = QuestionBank()
+                except Exception as e:
+                    logger.error(f"Failed to initialize QuestionBank: {e}")
+    return _question_bank
+
+
+def warm_up():
+    """Load the embedding model and connect to Elasticsearch in the background."""
+    def _warm():
+        try:
+            get_embedder().encode(["warm up"])
+        except Exception as e:
+            logger.error(f"Error warming up embedding model: {e}")
+        get_question_bank()
+
+    thread = threading.Thread(target=_warm, name="question-bank-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # Keep `from db import question_bank` working without building the
+    # QuestionBank at import time.
+    if name == 'question_bank':
+        return get_question_bank()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from array import array
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite3')
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))
+# float16 halves the size of the cache at about three significant digits
+# of precision, which is plenty for ranking by cosine similarity.
+EMBEDDING_CACHE_PRECISION = os.getenv('EMBEDDING_CACHE_PRECISION', 'float32')
+
+# Fraction of max_entries kept after an eviction pass, so that eviction does
+# not run again on every insert once the cache is full.
+EVICTION_TARGET = 0.9
+
+
+def normalize_question_text(text):
+    """The part of a question that is embedded: the stem before any code block."""
+    if '$$$examly' in text:
+        text = text.split('$$$examly')[0]
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache stored in SQLite.
+
+    Vectors are stored as float32 (or float16) blobs keyed by a hash of the
+    model name, the precision and the normalized text. Once the cache holds
+    more than max_entries vectors, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                 precision=EMBEDDING_CACHE_PRECISION):
+        self.path = path
+        self.max_entries = max_entries
+        if precision not in ('float32', 'float16'):
+            logger.warning(f"Unknown EMBEDDING_CACHE_PRECISION {precision!r}, using float32")
+            precision = 'float32'
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def make_key(self, model_name, text):
+        # float32 keys predate the precision option and leave it out
+        if self.precision != 'float32':
+            model_name = f"{model_name}/{self.precision}"
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _pack(self, vector):
+        if self.precision == 'float16':
+            return struct.pack(f'<{len(vector)}e', *vector)
+        return array('f', vector).tobytes()
+
+    def _unpack(self, blob):
+        if self.precision == 'float16':
+            return list(struct.unpack(f'<{len(blob) // 2}e', blob))
+        return array('f', blob).tolist()
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present in the cache."""
+        found = {}
+        keys = list(set(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = self._unpack(blob)
+            if found:
+                self._conn.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE key = ?',
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs."""
+        now = time.time()
+        rows = [(key, self._pack(vector), now) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)', rows
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        excess = self._count - int(self.max_entries * EVICTION_TARGET)
+        self._conn.execute(
+            'DELETE FROM embeddings WHERE key IN '
+            '(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self._count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        logger.info(f"Evicted {excess} embeddings from {self.path}")
+
+
+class CachedEmbedder:
+    """Wraps an embedder so that previously seen texts skip inference."""
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+
+    @property
+    def model_name(self):
+        return self.embedder.model_name
+
+    def encode(self, texts):
+        texts = [normalize_question_text(text) for text in texts]
+        if not texts:
+            return []
+        model_name = self.model_name
+        keys = [self.cache.make_key(model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+        if missing:
+            encoded = self.embedder.encode(list(missing.values()))
+            new_items = list(zip(missing.keys(), encoded))
+            vectors.update(new_items)
+            self.cache.put_many(new_items)
+        return [vectors[key] for key in keys]
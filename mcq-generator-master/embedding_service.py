@@ -0,0 +1,177 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from embeddings import create_local_embedder, EMBEDDING_MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent encode requests into batched model calls.
+
+    A single worker thread takes the first queued text, then keeps
+    collecting until either max_batch_size texts are queued or max_wait_ms
+    has passed, and encodes them in one call. Recently encoded texts are
+    served from an LRU cache, and a text already waiting in the queue is
+    shared by every request that asks for it.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=64, max_wait_ms=10, cache_size=10000):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'texts': 0, 'cache_hits': 0, 'batches': 0, 'batched_texts': 0}
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts):
+        results = [None] * len(texts)
+        waiting = []
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['texts'] += len(texts)
+            for i, text in enumerate(texts):
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    self.stats['cache_hits'] += 1
+                    results[i] = vector
+                    continue
+                future = self._inflight.get(text)
+                if future is None:
+                    future = Future()
+                    self._inflight[text] = future
+                    self._queue.put((text, future))
+                waiting.append((i, future))
+
+        for i, future in waiting:
+            results[i] = future.result()
+        return results
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(texts)} texts: {e}")
+                with self._lock:
+                    for text, future in batch:
+                        self._inflight.pop(text, None)
+                        future.set_exception(e)
+                continue
+
+            with self._lock:
+                self.stats['batches'] += 1
+                self.stats['batched_texts'] += len(texts)
+                for (text, future), vector in zip(batch, vectors):
+                    self._cache[text] = vector
+                    self._inflight.pop(text, None)
+                    future.set_result(vector)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    batcher = None
+    model_name = EMBEDDING_MODEL_NAME
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        with self.batcher._lock:
+            stats = dict(self.batcher.stats)
+        self._send_json(200, {'status': 'ok', 'model': self.model_name, 'stats': stats})
+
+    def do_POST(self):
+        if self.path != '/encode':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length))
+            texts = payload['texts']
+        except Exception as e:
+            self._send_json(400, {'error': f"Invalid request: {e}"})
+            return
+
+        model = payload.get('model')
+        if model and model != self.model_name:
+            self._send_json(400, {'error': f"Service runs {self.model_name}, not {model}"})
+            return
+
+        try:
+            vectors = self.batcher.encode(texts)
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, {'model': self.model_name, 'vectors': vectors})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared sentence embedding service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--cache-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    embedder = create_local_embedder()
+    embedder.encode(["warm up"])
+
+    EmbeddingRequestHandler.model_name = embedder.model_name
+    EmbeddingRequestHandler.batcher = MicroBatcher(
+        embedder.encode,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        cache_size=args.cache_size
+    )
+
+    server = ThreadingHTTPServer((args.host, args.port), EmbeddingRequestHandler)
+    logger.info(f"Embedding service for {embedder.model_name} listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
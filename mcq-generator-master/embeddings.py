@@ -0,0 +1,181 @@
+import os
+import threading
+import logging
+import requests
+from dotenv import load_dotenv
+from embedding_cache import CachedEmbedder, EmbeddingCache, EMBEDDING_CACHE_PATH
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ONNX_DIR = os.getenv('EMBEDDING_ONNX_DIR', os.path.join('onnx', EMBEDDING_MODEL_NAME))
+EMBEDDING_ONNX_THREADS = int(os.getenv('EMBEDDING_ONNX_THREADS', '0'))
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+class LocalEmbedder:
+    """Encodes texts with an in-process SentenceTransformer model."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        # Importing sentence_transformers pulls in torch, so both the import
+        # and the model load are deferred until the first encode.
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"Loading embedding model: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.model.encode(texts, batch_size=self.batch_size).tolist()
+
+
+class OnnxEmbedder:
+    """Encodes texts with an int8-quantized ONNX export of the model.
+
+    The directory is produced by export_onnx_model.py and holds
+    model_quantized.onnx plus the tokenizer.json of the original model.
+    Pooling and normalization mirror the SentenceTransformer pipeline
+    (mean pooling over the attention mask, then L2 normalization), so the
+    vectors stay comparable with the ones already stored in Elasticsearch.
+    num_threads=0 lets onnxruntime pick the thread count.
+    """
+
+    def __init__(self, model_dir=EMBEDDING_ONNX_DIR, model_name=EMBEDDING_MODEL_NAME,
+                 num_threads=EMBEDDING_ONNX_THREADS, batch_size=EMBEDDING_BATCH_SIZE,
+                 max_length=256, model_file='model_quantized.onnx'):
+        self.model_dir = model_dir
+        self.model_name = f"{model_name}-onnx-int8"
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.model_file = model_file
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import onnxruntime as ort
+                    from tokenizers import Tokenizer
+                    logger.info(f"Loading ONNX embedding model from {self.model_dir}")
+                    options = ort.SessionOptions()
+                    options.intra_op_num_threads = self.num_threads
+                    options.inter_op_num_threads = 1
+                    tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, 'tokenizer.json'))
+                    tokenizer.enable_truncation(max_length=self.max_length)
+                    tokenizer.enable_padding()
+                    self._tokenizer = tokenizer
+                    self._session = ort.InferenceSession(
+                        os.path.join(self.model_dir, self.model_file),
+                        options,
+                        providers=['CPUExecutionProvider']
+                    )
+        return self._session, self._tokenizer
+
+    def encode(self, texts):
+        import numpy as np
+        texts = list(texts)
+        if not texts:
+            return []
+        session, tokenizer = self._load()
+        input_names = {i.name for i in session.get_inputs()}
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feed = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in input_names:
+                feed['token_type_ids'] = np.zeros_like(input_ids)
+            token_embeddings = session.run(None, feed)[0]
+
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+
+class RemoteEmbedder:
+    """Encodes texts through a shared embedding_service.py worker."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._model_name = None
+
+    @property
+    def model_name(self):
+        # The service decides which backend it runs, so ask it once.
+        if self._model_name is None:
+            response = self.session.get(f"{self.url}/health", timeout=self.timeout)
+            response.raise_for_status()
+            self._model_name = response.json()['model']
+        return self._model_name
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        response = self.session.post(
+            f"{self.url}/encode",
+            json={"model": self.model_name, "texts": texts},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()['vectors']
+
+
+def create_local_embedder():
+    """Build the in-process embedder selected by EMBEDDING_BACKEND (torch or onnx)."""
+    if EMBEDDING_BACKEND == 'onnx':
+        return OnnxEmbedder()
+    if EMBEDDING_BACKEND != 'torch':
+        logger.warning(f"Unknown EMBEDDING_BACKEND {EMBEDDING_BACKEND!r}, using torch")
+    return LocalEmbedder()
+
+
+def get_embedder():
+    """Return the process-wide embedder.
+
+    Uses the embedding service at EMBEDDING_SERVICE_URL when it is set,
+    otherwise loads the model in this process with the configured backend.
+    Unless EMBEDDING_CACHE_PATH is set to an empty string, embeddings are
+    also cached on disk so repeated texts skip inference.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                service_url = os.getenv('EMBEDDING_SERVICE_URL')
+                if service_url:
+                    logger.info(f"Using embedding service at {service_url}")
+                    embedder = RemoteEmbedder(service_url)
+                else:
+                    embedder = create_local_embedder()
+                if EMBEDDING_CACHE_PATH:
+                    embedder = CachedEmbedder(embedder, EmbeddingCache(EMBEDDING_CACHE_PATH))
+                _embedder = embedder
+    return _embedder
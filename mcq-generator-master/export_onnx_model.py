@@ -0,0 +1,131 @@
+"""Export all-MiniLM-L6-v2 to an int8-quantized ONNX model for OnnxEmbedder.
+
+Requires the optional packages `onnx` and `onnxruntime` in addition to
+sentence-transformers:
+
+    python export_onnx_model.py --output onnx/all-MiniLM-L6-v2
+
+The export is verified against the PyTorch model before it is accepted:
+every sample text must keep a cosine similarity of at least --tolerance
+with the vector the current backend produces, so that question_vector
+values already stored in Elasticsearch stay comparable.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from embeddings import LocalEmbedder, OnnxEmbedder, EMBEDDING_MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_TEXTS = [
+    "<p>What is the time complexity of binary search on a sorted array?</p>",
+    "<p>Which HTTP method is idempotent and used to update a resource?</p>",
+    "<p>What will be printed by the following code?</p>",
+    "<p>Which SQL clause is used to filter groups after aggregation?</p>",
+    "<p>In Java, which keyword prevents a method from being overridden?</p>",
+    "<p>What does the CSS property 'position: sticky' do?</p>",
+    "<p>Which data structure is best suited for implementing an LRU cache?</p>",
+    "<p>What is the output of console.log(typeof null) in JavaScript?</p>",
+]
+
+
+def load_sample_texts():
+    """Sample texts for verification: fixed questions plus the few-shot examples."""
+    texts = list(SAMPLE_TEXTS)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'few_shot_examples.json')
+    try:
+        with open(path, 'r') as f:
+            few_shot_examples = json.load(f)
+        pending = [few_shot_examples]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                pending.extend(node.values())
+            elif isinstance(node, str):
+                texts.extend(
+                    line.strip().replace('{topic}', 'recursion')
+                    for line in node.splitlines() if line.strip().startswith('Q')
+                )
+    except Exception as e:
+        logger.warning(f"Could not load few_shot_examples.json: {e}")
+    return texts
+
+
+def cosine_similarities(reference_vectors, candidate_vectors):
+    similarities = []
+    for a, b in zip(reference_vectors, candidate_vectors):
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = sum(x * x for x in a) ** 0.5
+        norm_b = sum(y * y for y in b) ** 0.5
+        similarities.append(dot / (norm_a * norm_b) if norm_a and norm_b else 0.0)
+    return similarities
+
+
+def verify_embedder(reference, candidate, texts, tolerance):
+    """Return (passed, min_similarity, mean_similarity) of candidate against reference."""
+    similarities = cosine_similarities(reference.encode(texts), candidate.encode(texts))
+    min_similarity = min(similarities)
+    mean_similarity = sum(similarities) / len(similarities)
+    return min_similarity >= tolerance, min_similarity, mean_similarity
+
+
+def export(output_dir, opset=14):
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    reference = LocalEmbedder()
+    transformer = reference.model[0]
+    transformer.tokenizer.save_pretrained(output_dir)
+    auto_model = transformer.auto_model.eval()
+
+    dummy = transformer.tokenizer(["export sample"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in dummy]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    model_path = os.path.join(output_dir, 'model.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(dummy[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    logger.info(f"Exported {EMBEDDING_MODEL_NAME} to {model_path}")
+
+    quantized_path = os.path.join(output_dir, 'model_quantized.onnx')
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized model written to {quantized_path}")
+    return reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an int8 ONNX embedding model")
+    parser.add_argument('--output', default=os.path.join('onnx', EMBEDDING_MODEL_NAME))
+    parser.add_argument('--tolerance', type=float, default=0.98,
+                        help="Minimum cosine similarity to the PyTorch vectors for every sample")
+    parser.add_argument('--verify-only', action='store_true',
+                        help="Skip the export and only verify an existing model directory")
+    args = parser.parse_args()
+
+    reference = LocalEmbedder() if args.verify_only else export(args.output)
+    candidate = OnnxEmbedder(model_dir=args.output)
+    passed, min_similarity, mean_similarity = verify_embedder(
+        reference, candidate, load_sample_texts(), args.tolerance
+    )
+    logger.info(f"Cosine similarity to {reference.model_name}: min {min_similarity:.4f}, mean {mean_similarity:.4f}")
+    if not passed:
+        logger.error(f"Quantized model is below the similarity tolerance of {args.tolerance}")
+        sys.exit(1)
+    logger.info("Quantized model is within tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import logging
+import queue
+import threading
+from prompt import generate_mcqs_stream
+from convertor import IncrementalQuestionParser, parse_question
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _produce_questions(token_stream, qb_id, created_by, out_queue):
+    """Parse the completion as it streams and queue each question once its block closes."""
+    parser = IncrementalQuestionParser()
+    chunks = []
+    index = 0
+    try:
+        for text in token_stream:
+            chunks.append(text)
+            for block in parser.feed(text):
+                index += 1
+                out_queue.put((index, parse_question(block, index, qb_id, created_by)))
+        for block in parser.close():
+            index += 1
+            out_queue.put((index, parse_question(block, index, qb_id, created_by)))
+        out_queue.put((_DONE, ''.join(chunks)))
+    except Exception as e:
+        out_queue.put((_DONE, e))
+
+
+def stream_generate_and_index(topic, num_questions, difficulty, question_type, selected_filters,
+                              created_by, question_bank, qb_id=None, refresh_plan=False, exclusions=""):
+    """Generate, parse, dedupe and index MCQs as one overlapping pipeline.
+
+    The completion is consumed on a background thread and split into
+    questions as soon as each block closes, while this generator dedupes
+    and indexes them, so indexing runs while later questions are still
+    being generated. Yields one event per block:
+
+        {'type': 'question', 'index': n, 'question': {...}, 'status': 'added' | 'duplicate' | 'failed'}
+        {'type': 'skipped', 'index': n}   # block could not be parsed
+
+    followed by a final {'type': 'done', 'raw_text': <full completion>}.
+    """
+    out_queue = queue.Queue()
+    token_stream = generate_mcqs_stream(topic, num_questions, difficulty, question_type, selected_filters,
+                                        refresh_plan=refresh_plan, exclusions=exclusions)
+    producer = threading.Thread(
+        target=_produce_questions,
+        args=(token_stream, qb_id, created_by, out_queue),
+        name="mcq-stream-parser",
+        daemon=True
+    )
+    producer.start()
+
+    while True:
+        index, item = out_queue.get()
+        if index is _DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield {'type': 'done', 'raw_text': item}
+            return
+        if item is None:
+            yield {'type': 'skipped', 'index': index}
+            continue
+        status, _ = question_bank.add_unique_question(item)
+        yield {'type': 'question', 'index': index, 'question': item, 'status': status}
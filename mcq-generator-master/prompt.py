@@ -1,50 +1,86 @@
 import json
 import logging
-from openai import AzureOpenAI
 import time
 import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
+from flow_control import flow_controller
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the AzureOpenAI client
-azure_endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
-api_key = os.getenv('AZURE_OPENAI_API_KEY')
-client = AzureOpenAI(
-    azure_endpoint=azure_endpoint,
-    api_key=api_key,
-    api_version="2024-02-01"
-)
-
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load JSON files
-try:
-    with open('question_type_instructions.json', 'r') as f:
-        question_type_instructions = json.load(f)
-    logger.info("Successfully loaded question_type_instructions.json")
-except Exception as e:
-    logger.error(f"Error loading question_type_instructions.json: {e}")
-    question_type_instructions = {}
-
-try:
-    with open('difficulty_definitions.json', 'r') as f:
-        difficulty_definitions = json.load(f)
-    logger.info("Successfully loaded difficulty_definitions.json")
-except Exception as e:
-    logger.error(f"Error loading difficulty_definitions.json: {e}")
-    difficulty_definitions = {}
-
-try:
-    with open('few_shot_examples.json', 'r') as f:
-        few_shot_examples = json.load(f)
-    logger.info("Successfully loaded few_shot_examples.json")
-except Exception as e:
-    logger.error(f"Error loading few_shot_examples.json: {e}")
-    few_shot_examples = {}
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Flow-control key for the chat completions deployment used below.
+LLM_ENDPOINT = "azure-openai/gpt-4o-mini"
+
+# Optional limiter with an acquire() method (batch_generate.RateLimiter),
+# acquired before every chat completions request this module starts.
+_rate_limiter = None
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide AzureOpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AzureOpenAI
+                _client = AzureOpenAI(
+                    azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
+                    api_key=os.getenv('AZURE_OPENAI_API_KEY'),
+                    api_version="2024-02-01"
+                )
+    return _client
+
+
+def set_rate_limiter(limiter):
+    """Rate-limit every LLM request made by this module, or stop doing so with None."""
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+@contextmanager
+def _llm_slot():
+    # Wait for the rate limit before taking a concurrency slot, so a waiting
+    # request does not hold a slot another request could use.
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+    with flow_controller.slot(LLM_ENDPOINT) as call:
+        yield call
+
+
+@lru_cache(maxsize=None)
+def _load_json(filename):
+    try:
+        with open(os.path.join(BASE_DIR, filename), 'r') as f:
+            data = json.load(f)
+        logger.info(f"Successfully loaded {filename}")
+        return data
+    except Exception as e:
+        logger.error(f"Error loading {filename}: {e}")
+        return {}
+
+
+def get_question_type_instructions():
+    return _load_json('question_type_instructions.json')
+
+
+def get_difficulty_definitions():
+    return _load_json('difficulty_definitions.json')
+
+
+def get_few_shot_examples():
+    return _load_json('few_shot_examples.json')
 
 # Define problem_solving_types
 problem_solving_types = [
@@ -65,48 +101,52 @@ problem_solving_types = [
     "Algorithm selection"
 ]
 
-def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3):
-    logging.info(f"Generating MCQs for topic: {topic}, num_questions: {num_questions}, difficulty: {difficulty}, question_type: {question_type}, filters: {selected_filters}")
-    
-    # Validate inputs
-    valid_difficulties = ["Easy", "Medium", "Hard"]
-    valid_question_types = ["Conceptual", "Factual", "Problem-solving", "Scenario-based"]
-    
-    if difficulty not in valid_difficulties:
-        logging.error(f"Invalid difficulty: {difficulty}")
-        raise ValueError(f"Invalid difficulty. Must be one of {valid_difficulties}")
-    
-    if question_type not in valid_question_types:
-        logging.error(f"Invalid question_type: {question_type}")
-        raise ValueError(f"Invalid question_type. Must be one of {valid_question_types}")
-
-    # Initialize question_type_instruction
-    question_type_instruction = question_type_instructions[question_type].format(topic=topic)
-
-    # Add filter-specific instructions
-    filter_instructions = ""
-    if selected_filters:
-        filter_instructions = "Focus EXCLUSIVELY on the following types of questions:\n"
-        for filter_type in selected_filters:
-            if filter_type in problem_solving_types:
-                filter_instructions += f"- {filter_type}\n"
-
-    # Retrieve relevant examples
-    relevant_examples = few_shot_examples.get(question_type, {}).get(difficulty, "").format(topic=topic)
+# Tool schema for structured generation; mirrors the fields of the examly
+# mcq_single_correct import format that convertor.structured_to_json_format fills in.
+MCQ_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "submit_mcqs",
+        "description": "Submit the generated multiple-choice questions.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "questions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "question_text": {"type": "string", "description": "The question stem, without the code snippet or options."},
+                            "code_snippet": {"type": "string", "description": "Code for the question without markdown fences, or an empty string."},
+                            "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+                            "correct_option": {"type": "integer", "minimum": 1, "maximum": 4, "description": "1-based index of the correct option."},
+                            "difficulty": {"type": "string", "enum": ["Easy", "Medium", "Hard"]},
+                            "subject": {"type": "string"},
+                            "sub_topic": {"type": "string"},
+                            "tags": {"type": "array", "items": {"type": "string"}}
+                        },
+                        "required": ["question_text", "code_snippet", "options", "correct_option", "difficulty", "subject", "sub_topic", "tags"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["questions"],
+            "additionalProperties": False
+        }
+    }
+}
+
+STRUCTURED_OUTPUT_INSTRUCTION = (
+    "Do not use the text format above. Return all questions in a single call to the submit_mcqs function, "
+    "one array item per question, with exactly four options and the 1-based number of the correct option. "
+    "Put any code in code_snippet without markdown fences."
+)
 
-    # Safely get relevant examples
-    try:
-        relevant_examples = few_shot_examples.get(question_type, {}).get(difficulty, "")
-        relevant_examples = relevant_examples.format(topic=topic)
-    except KeyError as e:
-        logging.error(f"KeyError when accessing few_shot_examples: {e}")
-        relevant_examples = ""  # Use an empty string if the key is not found
-    except Exception as e:
-        logging.error(f"Error when formatting few_shot_examples: {e}")
-        relevant_examples = ""  # Use an empty string if there's any other error
 
-    # Meta-sorting prompt
-    meta_sorting_prompt = f"""
+# Prompt templates, filled with str.format. The topic-dependent pieces
+# (few-shot examples, difficulty definitions, question type instructions)
+# are rendered once per topic by the cached helpers below.
+META_SORTING_PROMPT_TEMPLATE = """
     Task: Create a structured plan for generating {num_questions} {difficulty}-level {question_type} MCQs about {topic}.
 
     First, review these example questions in the desired format:
@@ -139,36 +179,7 @@ def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filt
     Ensure that your plan covers a diverse range of aspects within {topic} and aligns with the {difficulty} difficulty level and {question_type} question type. Use the provided examples as a guide for the level of detail and complexity expected.
     """
 
-    # Generate the meta-sorting plan
-    for attempt in range(max_retries):
-        try:
-            meta_sorting_response = client.chat.completions.create(
-                model="gpt-4o-mini",  # Update with your model name
-                messages=[
-                    {"role": "system", "content": f"You are an expert in {topic} and MCQ planning. Your task is to create a structured plan for generating high-quality, specific multiple-choice questions about {topic}, using the provided examples as a guide."},
-                    {"role": "user", "content": meta_sorting_prompt}
-                ]
-            )
-            if meta_sorting_response and meta_sorting_response.choices:
-                meta_sorting_plan = meta_sorting_response.choices[0].message.content
-                break
-            else:
-                logging.error("Empty response from LLM for meta-sorting")
-        except Exception as e:
-            logging.error(f"Meta-sorting attempt {attempt + 1} failed: {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(2)  # Wait before retrying
-    else:
-        raise Exception("Failed to generate meta-sorting plan after multiple attempts")
-
-    difficulty_definition = difficulty_definitions[question_type][difficulty].format(topic=topic)
-    question_type_instruction = question_type_instructions[question_type].format(topic=topic)
-
-    if selected_filters and question_type == "Problem-solving":
-        question_type_instruction += f"\nFocus specifically on these types of problem-solving questions: {', '.join(selected_filters)}."
-
-    # Enhanced prompt with meta-sorting plan and few-shot examples
-    enhanced_prompt = f"""
+ENHANCED_PROMPT_TEMPLATE = """
     Task: Generate {num_questions} unique multiple-choice questions (MCQs) about {topic} with {difficulty} difficulty. The questions should be of type: {question_type}.
 
     Context: You are an expert in {topic} and an experienced educator. Your goal is to create challenging yet fair MCQs that test a student's understanding of {topic} at the {difficulty} level.
@@ -184,7 +195,7 @@ def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filt
     Guidelines:
     1. Ensure all questions are directly related to {topic}.
     2. Adhere to the following difficulty level:
-    {difficulty_definitions[question_type][difficulty].format(topic=topic)}
+    {difficulty_definition}
 
     3. Follow these question type instructions:
     {question_type_instruction}
@@ -222,16 +233,187 @@ def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filt
     Begin generating the MCQs now, using the example questions as a guide. Remember to maintain high quality and relevance throughout all {num_questions} questions, focusing ONLY on the specified question types and formats.
     """
 
+META_SORTING_SYSTEM_TEMPLATE = "You are an expert in {topic} and MCQ planning. Your task is to create a structured plan for generating high-quality, specific multiple-choice questions about {topic}, using the provided examples as a guide."
+
+GENERATION_SYSTEM_TEMPLATE = "You are an expert in {topic} and MCQ generation. Your task is to create high-quality, specific multiple-choice questions about {topic}, strictly adhering to the given instructions, meta-sorting plan, and example questions for {question_type} questions at {difficulty} difficulty."
+
+META_PLAN_TTL_SECONDS = float(os.getenv('META_PLAN_TTL_SECONDS', '3600'))
+
+
+class PlanCache:
+    """In-process cache of meta-sorting plans with a time-to-live."""
+
+    def __init__(self, ttl=META_PLAN_TTL_SECONDS, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(topic, difficulty, question_type, selected_filters, num_questions, exclusions=""):
+        return (topic.strip().lower(), difficulty, question_type, tuple(sorted(selected_filters or [])), num_questions, exclusions)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is None:
+                return None
+            plan, created_at = entry
+            if time.time() - created_at > self.ttl:
+                del self._plans[key]
+                return None
+            return plan
+
+    def put(self, key, plan):
+        with self._lock:
+            if len(self._plans) >= self.max_entries and key not in self._plans:
+                oldest = min(self._plans, key=lambda k: self._plans[k][1])
+                del self._plans[oldest]
+            self._plans[key] = (plan, time.time())
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+plan_cache = PlanCache()
+
+
+@lru_cache(maxsize=512)
+def _render_examples(question_type, difficulty, topic):
+    try:
+        relevant_examples = get_few_shot_examples().get(question_type, {}).get(difficulty, "")
+        return relevant_examples.format(topic=topic)
+    except KeyError as e:
+        logging.error(f"KeyError when accessing few_shot_examples: {e}")
+        return ""  # Use an empty string if the key is not found
+    except Exception as e:
+        logging.error(f"Error when formatting few_shot_examples: {e}")
+        return ""  # Use an empty string if there's any other error
+
+
+@lru_cache(maxsize=512)
+def _render_instructions(question_type, difficulty, topic):
+    difficulty_definition = get_difficulty_definitions()[question_type][difficulty].format(topic=topic)
+    question_type_instruction = get_question_type_instructions()[question_type].format(topic=topic)
+    return difficulty_definition, question_type_instruction
+
+
+def _validate_inputs(difficulty, question_type):
+    valid_difficulties = ["Easy", "Medium", "Hard"]
+    valid_question_types = ["Conceptual", "Factual", "Problem-solving", "Scenario-based"]
+    
+    if difficulty not in valid_difficulties:
+        logging.error(f"Invalid difficulty: {difficulty}")
+        raise ValueError(f"Invalid difficulty. Must be one of {valid_difficulties}")
+    
+    if question_type not in valid_question_types:
+        logging.error(f"Invalid question_type: {question_type}")
+        raise ValueError(f"Invalid question_type. Must be one of {valid_question_types}")
+
+
+def get_meta_sorting_plan(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3, refresh=False, exclusions=""):
+    """Return the meta-sorting plan for these inputs, reusing a cached plan unless refresh is set.
+
+    exclusions is appended to the planning prompt to steer the plan away
+    from what the question bank already covers (see topic_coverage.py).
+    """
+    key = PlanCache.make_key(topic, difficulty, question_type, selected_filters, num_questions, exclusions)
+    if not refresh:
+        plan = plan_cache.get(key)
+        if plan is not None:
+            logging.info(f"Using cached meta-sorting plan for topic: {topic}")
+            return plan
+
+    meta_sorting_prompt = META_SORTING_PROMPT_TEMPLATE.format(
+        num_questions=num_questions,
+        difficulty=difficulty,
+        question_type=question_type,
+        topic=topic,
+        relevant_examples=_render_examples(question_type, difficulty, topic)
+    )
+    if exclusions:
+        meta_sorting_prompt += f"\n    {exclusions}\n"
+    client = get_client()
+
+    # Generate the meta-sorting plan
+    for attempt in range(max_retries):
+        try:
+            with _llm_slot():
+                meta_sorting_response = client.chat.completions.create(
+                    model="gpt-4o-mini",  # Update with your model name
+                    messages=[
+                        {"role": "system", "content": META_SORTING_SYSTEM_TEMPLATE.format(topic=topic)},
+                        {"role": "user", "content": meta_sorting_prompt}
+                    ]
+                )
+            if meta_sorting_response and meta_sorting_response.choices:
+                meta_sorting_plan = meta_sorting_response.choices[0].message.content
+                plan_cache.put(key, meta_sorting_plan)
+                return meta_sorting_plan
+            else:
+                logging.error("Empty response from LLM for meta-sorting")
+        except Exception as e:
+            logging.error(f"Meta-sorting attempt {attempt + 1} failed: {str(e)}")
+            if attempt < max_retries - 1:
+                time.sleep(2)  # Wait before retrying
+
+    raise Exception("Failed to generate meta-sorting plan after multiple attempts")
+
+
+def _build_generation_messages(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3, refresh_plan=False, exclusions=""):
+    """Validate the inputs, get the meta-sorting plan and build the generation messages."""
+    logging.info(f"Generating MCQs for topic: {topic}, num_questions: {num_questions}, difficulty: {difficulty}, question_type: {question_type}, filters: {selected_filters}")
+    _validate_inputs(difficulty, question_type)
+
+    # Add filter-specific instructions
+    filter_instructions = ""
+    if selected_filters:
+        filter_instructions = "Focus EXCLUSIVELY on the following types of questions:\n"
+        for filter_type in selected_filters:
+            if filter_type in problem_solving_types:
+                filter_instructions += f"- {filter_type}\n"
+
+    meta_sorting_plan = get_meta_sorting_plan(
+        topic, num_questions, difficulty, question_type, selected_filters, max_retries,
+        refresh=refresh_plan, exclusions=exclusions
+    )
+
+    difficulty_definition, question_type_instruction = _render_instructions(question_type, difficulty, topic)
+    if selected_filters and question_type == "Problem-solving":
+        question_type_instruction += f"\nFocus specifically on these types of problem-solving questions: {', '.join(selected_filters)}."
+
+    # Enhanced prompt with meta-sorting plan and few-shot examples
+    enhanced_prompt = ENHANCED_PROMPT_TEMPLATE.format(
+        num_questions=num_questions,
+        difficulty=difficulty,
+        question_type=question_type,
+        topic=topic,
+        relevant_examples=_render_examples(question_type, difficulty, topic),
+        meta_sorting_plan=meta_sorting_plan,
+        difficulty_definition=difficulty_definition,
+        question_type_instruction=question_type_instruction,
+        filter_instructions=filter_instructions
+    )
+
+    return [
+        {"role": "system", "content": GENERATION_SYSTEM_TEMPLATE.format(topic=topic, question_type=question_type, difficulty=difficulty)},
+        {"role": "user", "content": enhanced_prompt}
+    ]
+
+
+def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3, refresh_plan=False, exclusions=""):
+    messages = _build_generation_messages(topic, num_questions, difficulty, question_type, selected_filters, max_retries, refresh_plan, exclusions)
+    client = get_client()
+
     # Generate the MCQs using the enhanced prompt with meta-sorting and few-shot examples
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  # Update with your model name
-                messages=[
-                    {"role": "system", "content": f"You are an expert in {topic} and MCQ generation. Your task is to create high-quality, specific multiple-choice questions about {topic}, strictly adhering to the given instructions, meta-sorting plan, and example questions for {question_type} questions at {difficulty} difficulty."},
-                    {"role": "user", "content": enhanced_prompt}
-                ]
-            )
+            with _llm_slot():
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",  # Update with your model name
+                    messages=messages
+                )
             if response and response.choices:
                 return response.choices[0].message.content
             else:
@@ -241,4 +423,72 @@ def generate_mcqs(topic, num_questions, difficulty, question_type, selected_filt
             if attempt < max_retries - 1:
                 time.sleep(2)  # Wait before retrying
 
-    raise Exception("Failed to generate MCQs after multiple attempts")
\ No newline at end of file
+    raise Exception("Failed to generate MCQs after multiple attempts")
+
+
+def generate_mcqs_stream(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3, refresh_plan=False, exclusions=""):
+    """Like generate_mcqs, but yields the completion text as it arrives.
+
+    A failed request is retried only while nothing has been yielded yet;
+    once text has been streamed, an error is raised to the caller.
+    """
+    messages = _build_generation_messages(topic, num_questions, difficulty, question_type, selected_filters, max_retries, refresh_plan, exclusions)
+    client = get_client()
+
+    for attempt in range(max_retries):
+        streamed = False
+        try:
+            # The slot is held until the stream is drained; the connection is busy until then.
+            with _llm_slot():
+                stream = client.chat.completions.create(
+                    model="gpt-4o-mini",  # Update with your model name
+                    messages=messages,
+                    stream=True
+                )
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        streamed = True
+                        yield chunk.choices[0].delta.content
+            if streamed:
+                return
+            logging.error("Empty response from LLM")
+        except Exception as e:
+            if streamed:
+                raise
+            logging.error(f"Attempt {attempt + 1} failed: {str(e)}")
+            if attempt < max_retries - 1:
+                time.sleep(2)  # Wait before retrying
+
+    raise Exception("Failed to generate MCQs after multiple attempts")
+
+
+def generate_mcqs_structured(topic, num_questions, difficulty, question_type, selected_filters=None, max_retries=3, refresh_plan=False, exclusions=""):
+    """Generate MCQs as schema-constrained JSON through a forced tool call.
+
+    Returns the list of question objects from the submit_mcqs call; they
+    still need convertor.structured_to_json_format to be validated and
+    mapped to the import format.
+    """
+    messages = _build_generation_messages(topic, num_questions, difficulty, question_type, selected_filters, max_retries, refresh_plan, exclusions)
+    messages.append({"role": "user", "content": STRUCTURED_OUTPUT_INSTRUCTION})
+    client = get_client()
+
+    for attempt in range(max_retries):
+        try:
+            with _llm_slot():
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",  # Update with your model name
+                    messages=messages,
+                    tools=[MCQ_TOOL],
+                    tool_choice={"type": "function", "function": {"name": "submit_mcqs"}}
+                )
+            tool_calls = response.choices[0].message.tool_calls if response and response.choices else None
+            if tool_calls:
+                return json.loads(tool_calls[0].function.arguments).get('questions', [])
+            logging.error("No submit_mcqs call in LLM response")
+        except Exception as e:
+            logging.error(f"Structured attempt {attempt + 1} failed: {str(e)}")
+            if attempt < max_retries - 1:
+                time.sleep(2)  # Wait before retrying
+
+    raise Exception("Failed to generate MCQs after multiple attempts")
@@ -0,0 +1,181 @@
+import bisect
+import difflib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from api_handler import create_session, fetch_question_banks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _tokenize(text):
+    return [token for token in re.split(r'[^0-9a-z]+', text.lower()) if token]
+
+
+def _questionbanks(response):
+    results = (response or {}).get('results') or {}
+    return results.get('questionbanks') or []
+
+
+class QuestionBankCatalog:
+    """Local, searchable copy of the question banks visible in one domain.
+
+    prefetch() pulls every page concurrently; sync() refreshes it by walking
+    pages from the first one until a page contains nothing new or changed
+    (the API lists the most recently updated question banks first). The
+    catalog is persisted to a JSON file so a new session starts from the
+    last known state. search() answers from an in-memory index of name
+    tokens: every query token must prefix-match a token of the name, with a
+    fuzzy fallback for misspelled tokens.
+    """
+
+    def __init__(self, domain, path=None, page_size=100, max_workers=4):
+        self.domain = domain
+        self.path = path or f"qb_catalog_{domain.lower()}.json"
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.qbs = {}
+        self.synced_at = None
+        self._tokens = []
+        self._vocabulary = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.qbs = {qb['qb_id']: qb for qb in data.get('questionbanks', [])}
+            self.synced_at = data.get('synced_at')
+            self._rebuild_index()
+            logger.info(f"Loaded {len(self.qbs)} {self.domain} question banks from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading question bank catalog {self.path}: {e}")
+
+    def _save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'synced_at': self.synced_at, 'questionbanks': list(self.qbs.values())}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error saving question bank catalog {self.path}: {e}")
+
+    def _rebuild_index(self):
+        tokens = []
+        for qb_id, qb in self.qbs.items():
+            for token in set(_tokenize(qb.get('qb_name') or '')):
+                tokens.append((token, qb_id))
+        tokens.sort()
+        self._tokens = tokens
+        self._vocabulary = sorted({token for token, _ in tokens})
+
+    def _merge(self, qbs):
+        """Merge fetched question banks; returns how many were new or changed."""
+        changed = 0
+        for qb in qbs:
+            qb_id = qb.get('qb_id')
+            if qb_id and self.qbs.get(qb_id) != qb:
+                self.qbs[qb_id] = qb
+                changed += 1
+        return changed
+
+    def _fetch_page(self, token, page, session):
+        return _questionbanks(fetch_question_banks(token, self.domain, page=page, limit=self.page_size, session=session))
+
+    def prefetch(self, token):
+        """Replace the catalog with every page of question banks, fetched concurrently."""
+        session = create_session(max_connections=self.max_workers)
+        first = fetch_question_banks(token, self.domain, page=1, limit=self.page_size, session=session)
+        qbs = list(_questionbanks(first))
+        results = (first or {}).get('results') or {}
+        total = results.get('count') or results.get('total')
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if total:
+                pages = range(2, math.ceil(int(total) / self.page_size) + 1)
+                for page_qbs in executor.map(lambda page: self._fetch_page(token, page, session), pages):
+                    qbs.extend(page_qbs)
+            else:
+                # No total in the response: fetch pages in windows until one comes back short.
+                page = 2
+                last_full = len(qbs) == self.page_size
+                while last_full:
+                    window = range(page, page + self.max_workers)
+                    for page_qbs in executor.map(lambda p: self._fetch_page(token, p, session), window):
+                        qbs.extend(page_qbs)
+                        if len(page_qbs) < self.page_size:
+                            last_full = False
+                            break
+                    page += self.max_workers
+
+        with self._lock:
+            self.qbs = {}
+            self._merge(qbs)
+            self.synced_at = time.time()
+            self._rebuild_index()
+            self._save()
+        logger.info(f"Prefetched {len(self.qbs)} {self.domain} question banks")
+        return len(self.qbs)
+
+    def sync(self, token, max_pages=20):
+        """Pull recently added or updated question banks; returns how many changed."""
+        if not self.qbs:
+            return self.prefetch(token)
+
+        session = create_session(max_connections=1)
+        changed = 0
+        for page in range(1, max_pages + 1):
+            page_qbs = self._fetch_page(token, page, session)
+            with self._lock:
+                page_changed = self._merge(page_qbs)
+            changed += page_changed
+            if page_changed == 0 or len(page_qbs) < self.page_size:
+                break
+
+        with self._lock:
+            self.synced_at = time.time()
+            if changed:
+                self._rebuild_index()
+            self._save()
+        logger.info(f"Synced {self.domain} question bank catalog: {changed} new or updated")
+        return changed
+
+    def _matching_ids(self, term):
+        ids = set()
+        start = bisect.bisect_left(self._tokens, (term,))
+        for token, qb_id in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            ids.add(qb_id)
+        if not ids:
+            for token in difflib.get_close_matches(term, self._vocabulary, n=3, cutoff=0.75):
+                start = bisect.bisect_left(self._tokens, (token,))
+                for candidate, qb_id in self._tokens[start:]:
+                    if candidate != token:
+                        break
+                    ids.add(qb_id)
+        return ids
+
+    def search(self, query, limit=50):
+        """Return (question banks, total): the first `limit` question banks whose
+        names match every token of the query, and how many match in all."""
+        terms = _tokenize(query or '')
+        if not terms:
+            matches = list(self.qbs.values())
+        else:
+            ids = None
+            for term in terms:
+                term_ids = self._matching_ids(term)
+                ids = term_ids if ids is None else ids & term_ids
+                if not ids:
+                    return [], 0
+            matches = [self.qbs[qb_id] for qb_id in ids]
+        matches.sort(key=lambda qb: (qb.get('qb_name') or '').lower())
+        return matches[:limit], len(matches)
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from api_handler import create_session, fetch_qb_questions
+from db import question_fingerprint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields of a platform question kept when it is added to the local index.
+QUESTION_FIELDS = ('question_type', 'question_data', 'options', 'answer', 'manual_difficulty', 'tags')
+
+
+def _qb_questions(response):
+    results = (response or {}).get('results')
+    if isinstance(results, list):
+        return results
+    results = results or response or {}
+    return results.get('questions') or results.get('question') or []
+
+
+def _platform_id(question):
+    for field in ('q_id', 'question_id', 'id'):
+        if question.get(field):
+            return str(question[field])
+    return question_fingerprint(question)
+
+
+class QuestionBankSync:
+    """Local record of the questions already in one question bank on the platform.
+
+    sync() pulls pages of the bank's questions, newest first, stopping at
+    the first page with nothing new, so after the first full pull only
+    recent additions are fetched. Each question is kept as its platform id
+    and content fingerprint (db.question_fingerprint) in a JSON file, and,
+    when a QuestionBank is given, new questions are also added to the
+    local Elasticsearch index so generation treats them as duplicates too.
+    fingerprints() is what imports filter their upload set against.
+    """
+
+    def __init__(self, domain, qb_id, path=None, question_bank=None, page_size=100):
+        self.domain = domain
+        self.qb_id = qb_id
+        safe_qb_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(qb_id))
+        self.path = path or f"qb_sync_{domain.lower()}_{safe_qb_id}.json"
+        self.question_bank = question_bank
+        self.page_size = page_size
+        self.questions = {}
+        self.synced_at = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.questions = data.get('questions', {})
+            self.synced_at = data.get('synced_at')
+        except Exception as e:
+            logger.error(f"Error loading question bank sync state {self.path}: {e}")
+
+    def _save(self):
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'qb_id': self.qb_id, 'synced_at': self.synced_at, 'questions': self.questions}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving question bank sync state {self.path}: {e}")
+
+    def _index_locally(self, questions):
+        if self.question_bank is None or not questions:
+            return
+        local = [{field: question[field] for field in QUESTION_FIELDS if field in question} for question in questions]
+        added, duplicates = self.question_bank.add_unique_questions(local)
+        logger.info(f"Indexed {len(added)} questions of question bank {self.qb_id} locally ({duplicates} already known)")
+
+    def sync(self, token, session=None, max_pages=None):
+        """Pull questions added since the last sync (all of them the first time); returns how many were new."""
+        session = session or create_session(max_connections=1)
+        full = not self.questions
+        new = 0
+        page = 1
+        while max_pages is None or page <= max_pages:
+            raw_questions = _qb_questions(fetch_qb_questions(token, self.domain, self.qb_id, page, self.page_size, session))
+            fresh = {}
+            with self._lock:
+                for question in raw_questions:
+                    if not question.get('question_data'):
+                        continue
+                    platform_id = _platform_id(question)
+                    if platform_id not in self.questions and platform_id not in fresh:
+                        fresh[platform_id] = question
+            # Recorded only once indexed, so a failed page is fetched and indexed again next time
+            self._index_locally(list(fresh.values()))
+            with self._lock:
+                self.questions.update((platform_id, question_fingerprint(question)) for platform_id, question in fresh.items())
+                self._save()
+            new += len(fresh)
+            # A short raw page is the last one; questions without text still count towards the page size
+            if len(raw_questions) < self.page_size or (not fresh and not full):
+                break
+            page += 1
+
+        with self._lock:
+            self.synced_at = time.time()
+            self._save()
+        logger.info(f"Synced {self.domain} question bank {self.qb_id}: {new} new, {len(self.questions)} known")
+        return new
+
+    def fingerprints(self):
+        with self._lock:
+            return set(self.questions.values())
@@ -0,0 +1,337 @@
+"""Rebuild the question index under a new version and move the alias to it.
+
+Queries and writes use the INDEX_ALIAS name (mcq_questions by default),
+so the index behind it can be replaced without downtime:
+
+    python reindex.py                               # re-embed with the current model
+    python reindex.py --model all-mpnet-base-v2     # switch model; dims are detected
+    python reindex.py --resume                      # continue an interrupted run
+    python reindex.py --vector-type int8            # store int8 vectors (Elasticsearch 8.6+)
+
+1. Create <alias>_v<N+1> from db.build_index_body, with refreshes off.
+2. Stream every document of the current index with a point in time and
+   search_after, re-embed the question texts in large batches across a
+   process pool and bulk-write them under their original _id.
+3. Catch up: copy documents written to the old index while step 2 ran.
+4. Point the alias at the new index in one update_aliases request, then
+   catch up once more from the old index, which is kept unless
+   --delete-old is given, so the alias can be moved back.
+
+Progress is checkpointed after every bulk write. --resume continues from
+the last written batch while the point in time is still open; after it
+has expired the source is scanned again from the start, but documents
+already in the new index are not re-embedded.
+
+An index created before indices were versioned has the alias's own name.
+It is dropped in the same request that creates the alias, so writes made
+between the last catch-up and the swap are lost; pause question uploads
+while migrating such an index. Deletions made during a run are not
+carried over.
+
+After switching models, set EMBEDDING_MODEL_NAME for the app as well, or
+its query vectors will not match the stored ones.
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from db import (FULL_VECTOR_FIELD, INDEX_ALIAS, VECTOR_ELEMENT_TYPE, WITHOUT_VECTORS, QuestionBank, build_index_body,
+                create_client, question_fingerprint, quantize_vector, supports_byte_vectors)
+from embeddings import LocalEmbedder, create_local_embedder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REINDEX_CHECKPOINT_PATH = os.getenv('REINDEX_CHECKPOINT_PATH', 'reindex_checkpoint.json')
+PIT_KEEP_ALIVE = '10m'
+
+_worker_embedder = None
+
+
+def _init_worker(embedder_factory, threads):
+    # Runs once in each pool process; the model is loaded there, not pickled.
+    global _worker_embedder
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    _worker_embedder = embedder_factory()
+
+
+def _encode(texts):
+    return _worker_embedder.encode(texts)
+
+
+class Reindexer:
+    """Copies the index behind alias into a new version, re-embedding every question.
+
+    embedder_factory builds the embedder in each worker process and must be
+    picklable (a module-level function or a functools.partial of a class).
+    workers=0 encodes in this process instead of a process pool.
+    """
+
+    def __init__(self, client, alias=INDEX_ALIAS, embedder_factory=create_local_embedder, workers=None,
+                 batch_size=500, checkpoint_path=REINDEX_CHECKPOINT_PATH, indexed_vectors=False,
+                 vector_type=VECTOR_ELEMENT_TYPE):
+        self.client = client
+        self.alias = alias
+        self.embedder_factory = embedder_factory
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.indexed_vectors = indexed_vectors
+        self.vector_type = vector_type
+        self.checkpoint = {}
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, 'r') as f:
+            return json.load(f)
+
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def current_indices(self):
+        """Concrete indices behind the alias; the alias name itself for a pre-alias index."""
+        if self.client.indices.exists_alias(name=self.alias):
+            return sorted(self.client.indices.get_alias(name=self.alias))
+        if self.client.indices.exists(index=self.alias):
+            return [self.alias]
+        return []
+
+    def next_index_name(self):
+        versions = [0]
+        for name in self.client.indices.get(index=f"{self.alias}_v*"):
+            match = re.fullmatch(rf"{re.escape(self.alias)}_v(\d+)", name)
+            if match:
+                versions.append(int(match.group(1)))
+        return f"{self.alias}_v{max(versions) + 1}"
+
+    def _executor(self):
+        if not self.workers:
+            return ThreadPoolExecutor(1, initializer=_init_worker, initargs=(self.embedder_factory, 0))
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.embedder_factory, threads))
+
+    def _scan(self, pit_id, search_after=None):
+        """Batches of hits in _shard_doc order, without the stored vectors."""
+        while True:
+            body = {
+                'size': self.batch_size,
+                'query': {'match_all': {}},
+                '_source': WITHOUT_VECTORS,
+                'pit': {'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE},
+                'sort': [{'_shard_doc': 'asc'}]
+            }
+            if search_after:
+                body['search_after'] = search_after
+            response = self.client.search(body=body)
+            pit_id = response.get('pit_id', pit_id)
+            hits = response['hits']['hits']
+            if not hits:
+                return
+            search_after = hits[-1]['sort']
+            yield hits, pit_id, search_after
+
+    def _missing(self, target, hits):
+        response = self.client.mget(index=target, body={'ids': [hit['_id'] for hit in hits]}, _source=False)
+        existing = {doc['_id'] for doc in response['docs'] if doc.get('found')}
+        return [hit for hit in hits if hit['_id'] not in existing]
+
+    def _write(self, target, hits, vectors):
+        actions = []
+        for hit, vector in zip(hits, vectors):
+            source = dict(hit['_source'])
+            if self.checkpoint.get('element_type') == 'byte':
+                source.update({'question_vector': quantize_vector(vector), FULL_VECTOR_FIELD: list(vector)})
+            else:
+                source['question_vector'] = vector
+            # Documents indexed before fingerprints existed keep their _id but gain the field
+            source['fingerprint'] = question_fingerprint(source)
+            actions.append({'index': {'_index': target, '_id': hit['_id']}})
+            actions.append(source)
+        response = self.client.bulk(body=actions)
+        if response.get('errors'):
+            failed = [item['index'] for item in response['items'] if item['index'].get('error')]
+            raise Exception(f"{len(failed)} documents failed to index, first error: {failed[0]['error']}")
+
+    def _copy(self, executor, source, target, skip_existing, pit_id=None, search_after=None, checkpoint=False):
+        """Re-embed and write the documents of source into target; returns how many were written.
+
+        Encoding of the next batches overlaps with writing the current one;
+        batches are written in scan order so the checkpoint only moves past
+        documents that are in the target.
+        """
+        if pit_id is None:
+            pit_id = self.client.open_point_in_time(index=source, keep_alive=PIT_KEEP_ALIVE)['id']
+        pending = deque()
+        written = 0
+
+        def write_oldest():
+            nonlocal written
+            hits, future, batch_pit_id, batch_search_after = pending.popleft()
+            self._write(target, hits, future.result())
+            written += len(hits)
+            if checkpoint:
+                self.checkpoint.update(pit_id=batch_pit_id, search_after=batch_search_after,
+                                       copied=self.checkpoint.get('copied', 0) + len(hits))
+                self._save_checkpoint()
+                logger.info(f"Copied {self.checkpoint['copied']} documents into {target}")
+
+        try:
+            for hits, pit_id, search_after in self._scan(pit_id, search_after):
+                if skip_existing:
+                    hits = self._missing(target, hits)
+                if hits:
+                    texts = [QuestionBank._question_text(hit['_source']) for hit in hits]
+                    pending.append((hits, executor.submit(_encode, texts), pit_id, search_after))
+                while len(pending) > max(2, self.workers * 2):
+                    write_oldest()
+            while pending:
+                write_oldest()
+        finally:
+            for _, future, _, _ in pending:
+                future.cancel()
+        self._close_pit(pit_id)
+        return written
+
+    def _close_pit(self, pit_id):
+        try:
+            self.client.close_point_in_time(body={'id': pit_id})
+        except Exception as e:
+            logger.warning(f"Could not close point in time: {e}")
+
+    def _pit_alive(self, pit_id):
+        try:
+            self.client.search(body={'size': 0, 'pit': {'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE}})
+            return True
+        except Exception as e:
+            logger.info(f"Point in time from the checkpoint is gone ({e}); rescanning and skipping copied documents")
+            return False
+
+    def _start(self, executor):
+        sources = self.current_indices()
+        if len(sources) != 1:
+            raise Exception(f"Expected one index behind {self.alias}, found {sources}")
+        if self.indexed_vectors:
+            major = int(self.client.info()['version']['number'].split('.')[0])
+            if major < 8:
+                raise Exception("Indexed dense vectors need Elasticsearch 8.0 or later")
+        if self.vector_type not in ('float', 'int8'):
+            raise Exception(f"Unknown vector type {self.vector_type!r}; use float or int8")
+        if self.vector_type == 'int8' and not supports_byte_vectors(self.client):
+            raise Exception("int8 vectors need an Elasticsearch 8.6+ server; with the pinned 7.17 client, "
+                            "set ELASTIC_CLIENT_APIVERSIONING=true to talk to it in compatibility mode")
+        element_type = 'byte' if self.vector_type == 'int8' else 'float'
+        dims = len(executor.submit(_encode, ['dimension probe']).result()[0])
+        target = self.next_index_name()
+
+        index_body = build_index_body(dims=dims, indexed_vectors=self.indexed_vectors, element_type=element_type)
+        index_body['settings']['index']['refresh_interval'] = '-1'
+        self.client.indices.create(index=target, body=index_body)
+        logger.info(f"Created {target} ({dims} {element_type} dims) to replace {sources[0]}")
+        self.checkpoint = {'source': sources[0], 'target': target, 'dims': dims, 'element_type': element_type,
+                           'stage': 'copy', 'copied': 0}
+        self._save_checkpoint()
+
+    def run(self, resume=False, delete_old=False):
+        """Reindex into a new version and swap the alias; returns the new index name."""
+        self.checkpoint = self._load_checkpoint() if resume else {}
+        if resume and not self.checkpoint:
+            logger.info("No checkpoint found, starting a new reindex")
+        elif not resume and os.path.exists(self.checkpoint_path):
+            raise Exception(f"{self.checkpoint_path} exists; pass --resume or remove it")
+
+        with self._executor() as executor:
+            if not self.checkpoint:
+                self._start(executor)
+            source, target = self.checkpoint['source'], self.checkpoint['target']
+
+            if self.checkpoint['stage'] == 'copy':
+                pit_id = self.checkpoint.get('pit_id')
+                if pit_id and self._pit_alive(pit_id):
+                    self._copy(executor, source, target, False, pit_id, self.checkpoint.get('search_after'), checkpoint=True)
+                else:
+                    self._copy(executor, source, target, bool(pit_id), checkpoint=True)
+                # The running count repeats a batch that was written but not yet
+                # checkpointed when a run was interrupted; the target's own count does not.
+                self.client.indices.refresh(index=target)
+                copied = self.client.count(index=target)['count']
+                logger.info(f"Copied {copied} documents into {target}")
+                self.checkpoint.update(stage='catch_up', pit_id=None, search_after=None, copied=copied)
+                self._save_checkpoint()
+
+            if self.checkpoint['stage'] == 'catch_up':
+                caught_up = self._copy(executor, source, target, True)
+                logger.info(f"Catch-up copied {caught_up} documents written during the reindex")
+                self._swap(source, target)
+                self.checkpoint['stage'] = 'swapped'
+                self._save_checkpoint()
+
+            if source != self.alias:
+                caught_up = self._copy(executor, source, target, True)
+                logger.info(f"Post-swap catch-up copied {caught_up} documents")
+                if delete_old:
+                    self.client.indices.delete(index=source)
+                    logger.info(f"Deleted {source}")
+
+        os.remove(self.checkpoint_path)
+        return target
+
+    def _swap(self, source, target):
+        self.client.indices.put_settings(index=target, body={'index': {'refresh_interval': None}})
+        self.client.indices.refresh(index=target)
+        source_count = self.client.count(index=source)['count']
+        target_count = self.client.count(index=target)['count']
+        if target_count < source_count:
+            raise Exception(f"{target} has {target_count} documents but {source} has {source_count}; not swapping")
+
+        if source == self.alias:
+            # A concrete index cannot share its name with an alias, so it is
+            # removed in the same atomic request.
+            actions = [{'add': {'index': target, 'alias': self.alias}}, {'remove_index': {'index': source}}]
+        else:
+            actions = [{'remove': {'index': source, 'alias': self.alias}}, {'add': {'index': target, 'alias': self.alias}}]
+        self.client.indices.update_aliases(body={'actions': actions})
+        logger.info(f"{self.alias} now points to {target}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='SentenceTransformer model to re-embed with (default: the configured embedder)')
+    parser.add_argument('--workers', type=int, default=None, help='encoding processes (default: CPU count; 0 encodes in-process)')
+    parser.add_argument('--batch-size', type=int, default=500, help='documents per scan page, encode task and bulk request')
+    parser.add_argument('--checkpoint', default=REINDEX_CHECKPOINT_PATH)
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint of an interrupted run')
+    parser.add_argument('--delete-old', action='store_true', help='delete the previous index after the swap')
+    parser.add_argument('--indexed-vectors', action='store_true', help='index question_vector for kNN search (Elasticsearch 8+)')
+    parser.add_argument('--vector-type', choices=['float', 'int8'], default=VECTOR_ELEMENT_TYPE,
+                        help='question_vector storage; int8 needs Elasticsearch 8.6+ (default: VECTOR_ELEMENT_TYPE)')
+    args = parser.parse_args()
+
+    embedder_factory = functools.partial(LocalEmbedder, args.model) if args.model else create_local_embedder
+    reindexer = Reindexer(
+        create_client(),
+        embedder_factory=embedder_factory,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        indexed_vectors=args.indexed_vectors,
+        vector_type=args.vector_type
+    )
+    target = reindexer.run(resume=args.resume, delete_old=args.delete_old)
+    logger.info(f"Reindex complete: {INDEX_ALIAS} -> {target}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The app modules import each other by bare name, as when run with streamlit from
+# mcq-generator-master/; the in-process fakes live in loadtest/ at the repository root.
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, os.path.join(HERE, '..', '..'))
+os.environ['EMBEDDING_CACHE_PATH'] = ''
+
+
+@pytest.fixture
+def question_bank():
+    from db import QuestionBank
+    from loadtest.fakes import FakeElasticsearch, HashEmbedder
+    return QuestionBank(client=FakeElasticsearch(), embedder=HashEmbedder())
+
+
+def make_question(text, options=('A', 'B', 'C', 'D')):
+    return {
+        'question_data': text,
+        'options': [{'text': option} for option in options],
+        'answer': {'args': [options[0]]},
+    }
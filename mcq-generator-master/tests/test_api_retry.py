@@ -0,0 +1,74 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import api_handler
+from conftest import make_question
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each path with the next (status, headers) of its script, then 200."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+            script = self.server.scripts.get(self.path, [])
+            status, headers = script.pop(0) if script else (200, {})
+        payload = json.dumps({'status': status}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+    server.lock = threading.Lock()
+    server.requests = {}
+    server.scripts = {}
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    monkeypatch.setattr(api_handler, 'EXAMLY_API_BASE', f"http://127.0.0.1:{server.server_address[1]}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _create(server, *script):
+    server.scripts[api_handler.MCQ_CREATE_PATH] = list(script)
+    session = api_handler.create_session(max_connections=1, backoff_factor=0)
+    outcomes = api_handler.bulk_import_mcqs([dict(make_question("What does len() return?"), tags=[])], 'qb-1', 'token', 'LTI',
+                                            session=session, checkpoint_file=None, sync_existing=False)
+    return outcomes[0]['status'], server.requests[api_handler.MCQ_CREATE_PATH]
+
+
+@pytest.mark.parametrize('status', [500, 502, 504])
+def test_create_is_not_retried_after_server_errors(server, status):
+    assert _create(server, (status, {})) == ('failed', 1)
+
+
+def test_create_is_not_retried_on_503_without_retry_after(server):
+    assert _create(server, (503, {})) == ('failed', 1)
+
+
+def test_create_is_retried_when_the_request_was_not_processed(server):
+    assert _create(server, (429, {}), (503, {'Retry-After': '0'})) == ('created', 3)
+
+
+def test_reads_are_still_retried_after_server_errors(server):
+    path = '/api/v2/questionbanks'
+    server.scripts[path] = [(502, {}), (500, {})]
+    session = api_handler.create_session(max_connections=1, backoff_factor=0)
+    assert api_handler.fetch_question_banks('token', 'LTI', session=session) == {'status': 200}
+    assert server.requests[path] == 3
@@ -0,0 +1,111 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import batch_generate
+import prompt
+from batch_generate import BatchGenerator, RateLimiter
+from topic_coverage import TopicYieldTracker
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self.acquired += 1
+
+
+class FakeCompletions:
+    """Answers the meta-sorting call with a plan and the submit_mcqs call with distinct questions."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, tools=None, tool_choice=None):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        if tools is None:
+            message = SimpleNamespace(content="plan", tool_calls=None)
+        else:
+            questions = [{
+                'question_text': f"Question {number}.{i} about a completely separate concept number {number * 100 + i}?",
+                'options': [f"{number}-{i}-{option}" for option in 'ABCD'],
+                'correct_option': 1,
+                'difficulty': 'Medium',
+                'tags': [],
+            } for i in range(2)]
+            function = SimpleNamespace(arguments=json.dumps({'questions': questions}))
+            message = SimpleNamespace(content=None, tool_calls=[SimpleNamespace(function=function)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(prompt, 'get_client', lambda: client)
+    prompt.plan_cache.clear()
+    yield completions
+    prompt.plan_cache.clear()
+
+
+def make_generator(question_bank, tmp_path, **kwargs):
+    cells = {'Python|Medium|Conceptual': {
+        'topic': 'Python', 'difficulty': 'Medium', 'question_type': 'Conceptual', 'selected_filters': [], 'target': 4,
+    }}
+    return BatchGenerator(
+        question_bank, cells, checkpoint_path=str(tmp_path / 'checkpoint.json'),
+        output_path=str(tmp_path / 'out.jsonl'), workers=1, batch_size=2,
+        yield_tracker=TopicYieldTracker(path=str(tmp_path / 'yield.json')), **kwargs
+    )
+
+
+def test_rate_limiter_spaces_calls(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr(batch_generate.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(batch_generate.time, 'sleep', sleeps.append)
+    limiter = RateLimiter(per_minute=30)
+    for _ in range(3):
+        limiter.acquire()
+    assert sleeps == [2.0, 4.0]
+
+
+def test_every_llm_call_goes_through_the_rate_limiter(question_bank, tmp_path, completions):
+    generator = make_generator(question_bank, tmp_path)
+    limiter = CountingLimiter()
+    generator.rate_limiter = limiter
+    generator.run()
+    # Each batch needs a meta-sorting plan (the exclusions change) and a generation call
+    assert completions.calls >= 4
+    assert limiter.acquired == completions.calls
+    assert prompt._rate_limiter is None
+
+
+def test_fresh_run_truncates_output(question_bank, tmp_path, completions):
+    output = tmp_path / 'out.jsonl'
+    output.write_text(json.dumps({'cell': 'old', 'question': {'question_data': 'stale'}}) + '\n', encoding='utf-8')
+    generator = make_generator(question_bank, tmp_path, rpm=0)
+    generator.run()
+    questions = generator.unique_questions()
+    assert len(questions) == 4
+    assert all(question['question_data'] != 'stale' for question in questions)
+
+
+def test_resume_keeps_output(question_bank, tmp_path, completions):
+    generator = make_generator(question_bank, tmp_path, rpm=0)
+    generator.run()
+    with open(tmp_path / 'out.jsonl', 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'cell': 'Python|Medium|Conceptual', 'question': {'question_data': 'kept'}}) + '\n')
+
+    resumed = make_generator(question_bank, tmp_path, rpm=0)
+    resumed.run(resume=True)
+    assert [q['question_data'] for q in resumed.unique_questions()][-1] == 'kept'
+    assert len(resumed.unique_questions()) == 5
@@ -0,0 +1,117 @@
+from conftest import make_question
+from db import INDEX_ALIAS, QuestionBank, question_fingerprint
+from loadtest.fakes import FakeElasticsearch, HashEmbedder
+
+
+class CountingEmbedder:
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.texts = 0
+
+    def encode(self, texts):
+        self.texts += len(texts)
+        return self.embedder.encode(texts)
+
+
+def test_fingerprint_ignores_markup_case_whitespace_and_option_order():
+    a = make_question("<p>What does  <b>len()</b> return?</p>", ('An int', 'A list'))
+    b = make_question("what does len() RETURN?", ('a list', 'an   int'))
+    assert question_fingerprint(a) == question_fingerprint(b)
+    assert question_fingerprint(a) != question_fingerprint(make_question("What does len() return?", ('An int', 'A tuple')))
+
+
+def test_fingerprint_keeps_code_case():
+    a = make_question("What is printed?$$$examlyprint(X)")
+    b = make_question("What is printed?$$$examlyprint(x)")
+    assert question_fingerprint(a) != question_fingerprint(b)
+
+
+def test_exact_duplicates_cost_one_lookup_and_no_encoding(question_bank):
+    questions = [make_question(f"Which keyword defines function number {n} in Python?") for n in range(5)]
+    added, duplicates = question_bank.add_unique_questions([dict(q) for q in questions + questions[:2]])
+    assert (len(added), duplicates) == (5, 2)
+
+    question_bank.embedder = CountingEmbedder(question_bank.embedder)
+    question_bank.client.calls.clear()
+    added, duplicates = question_bank.add_unique_questions([dict(q) for q in questions])
+    assert (len(added), duplicates) == (0, 5)
+    assert question_bank.client.calls == {'search': 1}
+    assert question_bank.embedder.texts == 0
+
+
+def test_documents_with_legacy_ids_are_found_by_fingerprint(question_bank):
+    question = make_question("Which collection keeps insertion order and rejects duplicates?")
+    # As reindex.py writes a pre-fingerprint document: old random _id, fingerprint field added
+    question_bank.client.index(index=question_bank.index_name, id='legacy-random-id',
+                               body=dict(question, fingerprint=question_fingerprint(question)))
+    assert question_bank.existing_fingerprints([question_fingerprint(question)]) == {question_fingerprint(question)}
+
+    question_bank.embedder = CountingEmbedder(question_bank.embedder)
+    added, duplicates = question_bank.add_unique_questions([dict(question)])
+    assert (added, duplicates) == ([], 1)
+    assert question_bank.embedder.texts == 0
+
+
+def test_concurrent_copy_is_not_overwritten(question_bank):
+    question = make_question("What does the finally block guarantee?")
+    fingerprint = question_fingerprint(question)
+    first = dict(question, answer={'args': ['first producer']})
+    assert question_bank.add_unique_question(first)[0] == 'added'
+
+    # A second producer that passed the duplicate check before the first write landed
+    question_bank.question_exists = lambda *args: (False, None)
+    status, _ = question_bank.add_unique_question(dict(question, answer={'args': ['second producer']}), exact_checked=True)
+    assert status == 'duplicate'
+    stored = question_bank.client.docs[next(iter(question_bank.client.docs))][fingerprint]
+    assert stored['answer'] == {'args': ['first producer']}
+
+
+def _legacy_bank(fingerprint_mapping=None):
+    # A concrete index created before fingerprints were stored, under the alias name
+    client = FakeElasticsearch()
+    properties = {'question_data': {'type': 'text'}, 'question_vector': {'type': 'dense_vector', 'dims': 384}}
+    if fingerprint_mapping:
+        properties['fingerprint'] = fingerprint_mapping
+    client.indices.create(index=INDEX_ALIAS, body={'mappings': {'properties': properties}})
+    return QuestionBank(client=client, embedder=HashEmbedder())
+
+
+def test_unmapped_fingerprint_is_added_as_keyword():
+    bank = _legacy_bank()
+    assert bank.client.bodies[INDEX_ALIAS]['mappings']['properties']['fingerprint'] == {'type': 'keyword'}
+    assert bank.fingerprint_field == 'fingerprint'
+
+
+def test_dynamic_text_mapping_matches_keyword_subfield():
+    bank = _legacy_bank({'type': 'text', 'fields': {'keyword': {'type': 'keyword', 'ignore_above': 256}}})
+    assert bank.fingerprint_field == 'fingerprint.keyword'
+    question = make_question("Which method adds an element to the end of a list?")
+    bank.client.index(index=bank.index_name, id='legacy-random-id', body=dict(question, fingerprint=question_fingerprint(question)))
+    assert bank.add_unique_questions([dict(question)]) == ([], 1)
+
+
+def test_unusable_mapping_falls_back_to_ids_and_warns_once(caplog):
+    bank = _legacy_bank({'type': 'text'})
+    assert bank.fingerprint_field is None
+    warnings = [record for record in caplog.records if 'looked up by _id only' in record.getMessage()]
+    assert len(warnings) == 1
+
+    questions = [make_question(f"What does operator number {n} do in Python?") for n in range(3)]
+    assert len(bank.add_unique_questions([dict(q) for q in questions])[0]) == 3
+    bank.client.calls.clear()
+    assert bank.add_unique_questions([dict(q) for q in questions]) == ([], 3)
+    assert bank.client.calls == {'mget': 1}
+
+
+def test_failing_fingerprint_query_falls_back_to_ids(question_bank, caplog):
+    question = make_question("Which statement exits a loop early?")
+    assert question_bank.add_unique_question(dict(question))[0] == 'added'
+
+    def broken_search(index=None, body=None):
+        raise RuntimeError("no mapping found for [fingerprint] to collapse on")
+
+    question_bank.client.search = broken_search
+    for _ in range(2):
+        assert question_bank.existing_fingerprints([question_fingerprint(question)]) == {question_fingerprint(question)}
+    assert question_bank.fingerprint_field is None
+    assert len([record for record in caplog.records if 'looked up by _id only' in record.getMessage()]) == 1
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import pytest
+
+from flow_control import AdaptiveLimiter, FlowController
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_copies_are_identical():
+    with open(os.path.join(HERE, '..', 'flow_control.py'), 'rb') as f:
+        mcq_copy = f.read()
+    with open(os.path.join(HERE, '..', '..', 'cod-analyizer-master', 'code_analysis', 'flow_control.py'), 'rb') as f:
+        analyzer_copy = f.read()
+    assert mcq_copy == analyzer_copy
+
+
+def test_limit_grows_on_success():
+    limiter = AdaptiveLimiter('test', initial_limit=2, max_limit=3)
+    for _ in range(10):
+        with limiter.slot() as call:
+            call.status = 200
+    assert limiter.limit == 3
+    assert limiter.counts['succeeded'] == 10
+    assert limiter.in_flight == 0
+
+
+def test_throttling_halves_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter('test', initial_limit=8, backoff_ratio=0.5, cooldown=60)
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            with limiter.slot():
+                raise HTTPError(429)
+    assert limiter.limit == 4
+    assert limiter.counts['throttled'] == 3
+
+
+def test_client_and_local_errors_do_not_cut_limit():
+    limiter = AdaptiveLimiter('test', initial_limit=4, cooldown=0)
+    with pytest.raises(HTTPError):
+        with limiter.slot():
+            raise HTTPError(400)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("bad input")
+    assert limiter.limit == 4
+    assert limiter.counts['client_errors'] == 1
+    assert limiter.counts['local_errors'] == 1
+
+
+def test_transport_errors_cut_limit():
+    limiter = AdaptiveLimiter('test', initial_limit=4, backoff_ratio=0.5, cooldown=0, min_limit=1)
+    with pytest.raises(TimeoutError):
+        with limiter.slot():
+            raise TimeoutError()
+    assert limiter.limit == 2
+    assert limiter.counts['errors'] == 1
+
+
+def test_in_flight_never_exceeds_limit():
+    limiter = AdaptiveLimiter('test', initial_limit=2, max_limit=2)
+    release = threading.Event()
+
+    def call():
+        with limiter.slot() as result:
+            release.wait(5)
+            result.status = 200
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while limiter.waiting < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (limiter.in_flight, limiter.waiting) == (2, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert limiter.in_flight == 0
+    assert limiter.counts['succeeded'] == 6
+
+
+def test_controller_keeps_one_limiter_per_endpoint():
+    controller = FlowController(initial_limit=1)
+    assert controller.limiter('a') is controller.limiter('a')
+    with controller.slot('b') as call:
+        call.status = 200
+    assert [row['endpoint'] for row in controller.snapshot()] == ['a', 'b']
@@ -0,0 +1,41 @@
+import json
+import api_handler
+from conftest import make_question
+
+
+def _fake_import(monkeypatch, tmp_path, statuses):
+    path = tmp_path / 'unique_mcqs.json'
+    path.write_text(json.dumps([make_question(f"Question {n}") for n in range(len(statuses))]))
+
+    def fake_bulk(questions, qb_id, token, domain, max_workers=None, checkpoint_file=None, sync_existing=None):
+        return [{'index': n, 'status': status} for n, status in enumerate(statuses)]
+
+    monkeypatch.setattr(api_handler, 'bulk_import_mcqs', fake_bulk)
+    return str(path)
+
+
+def test_counts_are_reported_separately(monkeypatch, tmp_path):
+    path = _fake_import(monkeypatch, tmp_path, ['created', 'exists', 'exists', 'skipped', 'failed'])
+    summary = api_handler.summarize_outcomes(api_handler.import_mcqs(path, 'qb-1', 'token', 'LTI'))
+    assert summary == {'created': 1, 'failed': 1, 'skipped': 1, 'exists': 2}
+
+
+def test_domain_imports_return_successful_and_failed(monkeypatch, tmp_path):
+    path = _fake_import(monkeypatch, tmp_path, ['created', 'exists', 'exists', 'skipped', 'failed'])
+    successful, failed = api_handler.import_mcqs_to_examly(path, 'qb-1', 'me', 'token')
+    assert (successful, failed) == (4, 1)
+    assert api_handler.import_mcqs_to_neowise(path, 'qb-1', 'me', 'token') == (4, 1)
+
+
+def test_sync_is_off_unless_enabled(monkeypatch):
+    monkeypatch.setattr(api_handler, 'SYNC_EXISTING_QUESTIONS', False)
+    requested = []
+    monkeypatch.setattr(api_handler, '_existing_fingerprints', lambda *args: requested.append(args) or set())
+    monkeypatch.setattr(api_handler, '_submit_uploads', lambda *args: [])
+    api_handler.bulk_import_mcqs([], 'qb-1', 'token', 'LTI', checkpoint_file=None)
+    assert requested == []
+    api_handler.bulk_import_mcqs([], 'qb-1', 'token', 'LTI', checkpoint_file=None, sync_existing=True)
+    assert len(requested) == 1
+    monkeypatch.setattr(api_handler, 'SYNC_EXISTING_QUESTIONS', True)
+    api_handler.bulk_import_mcqs([], 'qb-1', 'token', 'LTI', checkpoint_file=None)
+    assert len(requested) == 2
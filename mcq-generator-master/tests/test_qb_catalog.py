@@ -0,0 +1,32 @@
+from qb_catalog import QuestionBankCatalog
+
+
+def make_catalog(tmp_path, names):
+    catalog = QuestionBankCatalog('Examly', path=str(tmp_path / 'catalog.json'))
+    catalog._merge([{'qb_id': f"qb-{i}", 'qb_name': name} for i, name in enumerate(names)])
+    catalog._rebuild_index()
+    return catalog
+
+
+def test_search_reports_total_beyond_limit(tmp_path):
+    catalog = make_catalog(tmp_path, [f"Python Basics {i:02d}" for i in range(60)] + ["Java Streams"])
+    matches, total = catalog.search('python', limit=50)
+    assert len(matches) == 50
+    assert total == 60
+    assert matches[0]['qb_name'] == "Python Basics 00"
+
+
+def test_search_prefix_and_fuzzy_matching(tmp_path):
+    catalog = make_catalog(tmp_path, ["Python Basics", "Advanced Python", "Java Streams"])
+    matches, total = catalog.search('pyth adv')
+    assert [qb['qb_name'] for qb in matches] == ["Advanced Python"]
+    assert total == 1
+    matches, total = catalog.search('jva')
+    assert [qb['qb_name'] for qb in matches] == ["Java Streams"]
+
+
+def test_search_without_matches(tmp_path):
+    catalog = make_catalog(tmp_path, ["Python Basics"])
+    assert catalog.search('kotlin') == ([], 0)
+    matches, total = catalog.search('')
+    assert total == 1
@@ -0,0 +1,75 @@
+import pytest
+import qb_sync
+from conftest import make_question
+from qb_sync import QuestionBankSync
+
+
+def _bank(count, blank_every=None):
+    questions = []
+    for n in range(count):
+        question = make_question(f"Bank question number {n} about topic {n}")
+        question['q_id'] = f"q{n}"
+        if blank_every and n % blank_every == 0:
+            question['question_data'] = ''
+        questions.append(question)
+    return questions
+
+
+@pytest.fixture
+def platform(monkeypatch):
+    state = {'questions': [], 'requests': []}
+
+    def fetch(token, domain, qb_id, page=1, limit=100, session=None):
+        state['requests'].append(page)
+        start = (page - 1) * limit
+        return {'results': {'questions': state['questions'][start:start + limit]}}
+
+    monkeypatch.setattr(qb_sync, 'fetch_qb_questions', fetch)
+    return state
+
+
+def test_page_with_blank_questions_is_not_the_last(platform, tmp_path):
+    platform['questions'] = _bank(25, blank_every=4)
+    sync = QuestionBankSync('LTI', 'qb-1', path=str(tmp_path / 'sync.json'), page_size=10)
+    new = sync.sync('token', session=object())
+    assert platform['requests'] == [1, 2, 3]
+    assert new == len([q for q in platform['questions'] if q['question_data']])
+
+
+def test_incremental_sync_stops_at_first_known_page(platform, tmp_path):
+    path = str(tmp_path / 'sync.json')
+    platform['questions'] = _bank(30)
+    QuestionBankSync('LTI', 'qb-1', path=path, page_size=10).sync('token', session=object())
+
+    platform['requests'].clear()
+    platform['questions'] = [dict(make_question("A brand new question"), q_id='new')] + platform['questions']
+    sync = QuestionBankSync('LTI', 'qb-1', path=path, page_size=10)
+    assert sync.sync('token', session=object()) == 1
+    assert platform['requests'] == [1, 2]
+    assert len(sync.fingerprints()) == 31
+
+
+def test_questions_are_not_recorded_when_local_indexing_fails(platform, tmp_path):
+    path = str(tmp_path / 'sync.json')
+    platform['questions'] = _bank(5)
+
+    class FailingBank:
+        def add_unique_questions(self, questions):
+            raise ConnectionError('elasticsearch down')
+
+    sync = QuestionBankSync('LTI', 'qb-1', path=path, question_bank=FailingBank())
+    with pytest.raises(ConnectionError):
+        sync.sync('token', session=object())
+    assert sync.questions == {}
+
+    indexed = []
+
+    class Bank:
+        def add_unique_questions(self, questions):
+            indexed.extend(questions)
+            return questions, 0
+
+    sync.question_bank = Bank()
+    assert sync.sync('token', session=object()) == 5
+    assert len(indexed) == 5
+    assert len(QuestionBankSync('LTI', 'qb-1', path=path).fingerprints()) == 5
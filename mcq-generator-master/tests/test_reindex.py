@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import make_question
+from db import INDEX_ALIAS, build_index_body
+from loadtest.fakes import FakeElasticsearch, HashEmbedder
+from reindex import Reindexer
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _client(documents):
+    client = FakeElasticsearch()
+    client.indices.create(index=f"{INDEX_ALIAS}_v1", body=build_index_body(dims=384, alias=INDEX_ALIAS))
+    for n in range(documents):
+        client.index(index=INDEX_ALIAS, id=f"doc-{n}", body=make_question(f"Which loop form is number {n}?"))
+    return client
+
+
+def _reindexer(client, tmp_path):
+    return Reindexer(client, embedder_factory=HashEmbedder, workers=0, batch_size=3,
+                     checkpoint_path=str(tmp_path / 'reindex.json'), vector_type='float')
+
+
+def test_reindex_copies_every_document(tmp_path):
+    client = _client(10)
+    reindexer = _reindexer(client, tmp_path)
+    assert reindexer.run() == f"{INDEX_ALIAS}_v2"
+    assert reindexer.checkpoint['copied'] == 10
+    assert client.count(index=INDEX_ALIAS)['count'] == 10
+    assert all(len(source['question_vector']) == 384 for _, source in client._docs(INDEX_ALIAS))
+
+
+@pytest.mark.parametrize('pit_expired', [False, True])
+def test_resumed_copy_reports_the_target_count(tmp_path, pit_expired):
+    client = _client(10)
+    interrupted = _reindexer(client, tmp_path)
+    save = interrupted._save_checkpoint
+    saves = []
+
+    def save_then_fail():
+        # The third save follows the second batch's bulk write; fail it, as a crash would.
+        saves.append(1)
+        if len(saves) == 3:
+            raise Interrupted()
+        save()
+
+    interrupted._save_checkpoint = save_then_fail
+    try:
+        interrupted.run()
+    except Interrupted:
+        pass
+    assert client.count(index=f"{INDEX_ALIAS}_v2")['count'] == 6
+    if pit_expired:
+        client.pits.clear()
+
+    resumed = _reindexer(client, tmp_path)
+    resumed.run(resume=True)
+    assert resumed.checkpoint['copied'] == 10
+    assert client.count(index=INDEX_ALIAS)['count'] == 10
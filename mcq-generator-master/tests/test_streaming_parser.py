@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from convertor import IncrementalQuestionParser, convert_text_to_json_format, parse_question
+
+QUESTIONS = [
+    """Q1. Which keyword defines a function in Python?
+1) func
+2) def
+3) lambda
+4) define
+Correct answer: 2
+Difficulty: Easy
+Tags: python, functions
+Explanation: def starts a function definition; lambda only makes anonymous functions.""",
+    """Q2. What does this print?
+```javascript
+console.log(typeof null);
+```
+1) null
+2) undefined
+3) object
+4) number
+Correct answer: 3
+Difficulty: Medium
+Tags: javascript, types""",
+    """Q3. Which SQL join keeps unmatched rows from both tables?
+1) INNER JOIN
+2) LEFT JOIN
+3) CROSS JOIN
+4) FULL OUTER JOIN
+Correct answer: 4
+Difficulty: Hard
+Tags: sql, joins
+Explanation: a full outer join is a left join plus a right join.
+Note: the other joins drop rows from one side.""",
+]
+CONTENT = "\n---\n".join(QUESTIONS)
+
+
+def stream_parse(content, chunk_sizes):
+    parser = IncrementalQuestionParser()
+    blocks = []
+    position = 0
+    for size in chunk_sizes:
+        blocks.extend(parser.feed(content[position:position + size]))
+        position += size
+    blocks.extend(parser.feed(content[position:]))
+    blocks.extend(parser.close())
+    return blocks
+
+
+def parse_blocks(blocks):
+    parsed = [parse_question(block, i, None, 'tester') for i, block in enumerate(blocks, 1)]
+    return [question for question in parsed if question is not None]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_chunks_match_batch_parser(seed):
+    rng = random.Random(seed)
+    chunk_sizes = [rng.randint(1, 40) for _ in range(len(CONTENT))]
+    blocks = stream_parse(CONTENT, chunk_sizes)
+    assert len(blocks) == len(QUESTIONS)
+    assert parse_blocks(blocks) == convert_text_to_json_format(CONTENT, None, 'tester')
+
+
+def test_trailing_explanation_does_not_carry_into_next_question():
+    blocks = stream_parse(CONTENT, [len(CONTENT)])
+    assert not any('Explanation' in block for block in blocks)
+    assert blocks[1].startswith('Q2.')
+    assert [q['answer']['args'] for q in parse_blocks(blocks)] == [['def'], ['object'], ['FULL OUTER JOIN']]
+
+
+def test_questions_without_separator():
+    content = "\n".join(QUESTIONS)
+    blocks = stream_parse(content, [7] * (len(content) // 7))
+    assert [block.split('\n', 1)[0][:3] for block in blocks] == ['Q1.', 'Q2.', 'Q3.']
+    assert len(parse_blocks(blocks)) == 3
@@ -0,0 +1,73 @@
+import logging
+import pytest
+import db
+from conftest import make_question
+from loadtest.fakes import FakeElasticsearch, HashEmbedder
+
+TOPICS = ['python list comprehension', 'sql inner join', 'java interface default method', 'python decorator closure',
+          'sql group by having', 'java hashmap collision', 'python generator yield', 'sql window function']
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.texts = 0
+
+    def encode(self, texts):
+        self.texts += len(texts)
+        return super().encode(texts)
+
+
+def _bank(monkeypatch, vector_type, version):
+    monkeypatch.setattr(db, 'VECTOR_ELEMENT_TYPE', vector_type)
+    bank = db.QuestionBank(client=FakeElasticsearch(version=version), embedder=CountingEmbedder())
+    bank.add_unique_questions([make_question(f"Question {n} about {topic}") for n, topic in enumerate(TOPICS * 3)])
+    return bank
+
+
+def _stored(bank):
+    return next(iter(bank.client.docs.values()))
+
+
+def test_int8_falls_back_to_float_before_elasticsearch_8_6(monkeypatch, caplog):
+    with caplog.at_level(logging.WARNING):
+        bank = _bank(monkeypatch, 'int8', '8.5.3')
+    assert bank.vector_element_type == 'float'
+    assert 'ELASTIC_CLIENT_APIVERSIONING' in caplog.text
+    assert all(db.FULL_VECTOR_FIELD not in doc for doc in _stored(bank).values())
+
+
+def test_int8_stores_byte_vectors_and_a_full_precision_copy(monkeypatch):
+    bank = _bank(monkeypatch, 'int8', '8.11.0')
+    assert bank.vector_element_type == 'byte'
+    for doc in _stored(bank).values():
+        assert all(isinstance(x, int) and -127 <= x <= 127 for x in doc['question_vector'])
+        assert max(map(abs, doc['question_vector'])) == 127
+        assert isinstance(doc[db.FULL_VECTOR_FIELD][0], float)
+
+
+@pytest.mark.parametrize('vector_type, version', [('float', '7.17.9'), ('int8', '8.11.0')])
+def test_search_results_carry_no_vectors(monkeypatch, vector_type, version):
+    bank = _bank(monkeypatch, vector_type, version)
+    for question in bank.find_similar_questions('python decorator', 5) + bank.get_all_questions():
+        assert 'question_vector' not in question and db.FULL_VECTOR_FIELD not in question
+
+
+def test_rescoring_uses_stored_vectors_and_matches_float_ranking(monkeypatch):
+    float_bank = _bank(monkeypatch, 'float', '7.17.9')
+    int8_bank = _bank(monkeypatch, 'int8', '8.11.0')
+    int8_bank.embedder.texts = 0
+    for query in ('python decorator closure', 'sql join', 'java hashmap'):
+        expected = [q['question_data'] for q in float_bank.find_similar_questions(query, 5)]
+        assert [q['question_data'] for q in int8_bank.find_similar_questions(query, 5)] == expected
+    # Only the three queries were encoded
+    assert int8_bank.embedder.texts == 3
+    assert int8_bank.rescore_encodes == 0
+
+
+def test_rescoring_encodes_and_counts_candidates_without_full_vector(monkeypatch):
+    bank = _bank(monkeypatch, 'int8', '8.11.0')
+    for doc in _stored(bank).values():
+        doc.pop(db.FULL_VECTOR_FIELD)
+    assert len(bank.find_similar_questions('sql window function', 3)) == 3
+    assert bank.rescore_encodes == 3 * db.VECTOR_RESCORE_FACTOR
@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COVERAGE_STATS_FILE = os.getenv('COVERAGE_STATS_FILE', 'topic_yield_stats.json')
+
+# Below this unique-question yield a topic is considered saturated and more
+# of its existing questions are passed to the planner as exclusions.
+LOW_YIELD_THRESHOLD = 0.7
+
+
+def _topic_key(topic):
+    return re.sub(r'\s+', ' ', topic).strip().lower()
+
+
+def _plain_text(question_data):
+    text = question_data.split('$$$examly')[0]
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class TopicYieldTracker:
+    """Tracks how many generated questions per topic turned out to be unique."""
+
+    def __init__(self, path=COVERAGE_STATS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._stats = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading topic yield stats {path}: {e}")
+
+    def record(self, topic, generated, unique):
+        with self._lock:
+            stats = self._stats.setdefault(_topic_key(topic), {'generated': 0, 'unique': 0, 'runs': 0})
+            stats['generated'] += generated
+            stats['unique'] += unique
+            stats['runs'] += 1
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self._stats, f, indent=2)
+            except Exception as e:
+                logger.error(f"Error saving topic yield stats {self.path}: {e}")
+
+    def yield_rate(self, topic):
+        """Fraction of generated questions that were unique, or None if the topic has no history."""
+        stats = self._stats.get(_topic_key(topic))
+        if not stats or not stats['generated']:
+            return None
+        return stats['unique'] / stats['generated']
+
+    def stats(self, topic):
+        return dict(self._stats.get(_topic_key(topic), {'generated': 0, 'unique': 0, 'runs': 0}))
+
+
+def get_existing_coverage(question_bank, topic, max_questions=20, yield_rate=None):
+    """Fetch the questions and sub-topics (tags) the bank already has for a topic.
+
+    Saturated topics (low yield_rate) get a larger exclusion list.
+    """
+    if yield_rate is not None and yield_rate < LOW_YIELD_THRESHOLD:
+        max_questions *= 2
+    hits = question_bank.find_similar_questions(topic, num_results=max_questions)
+    questions = []
+    tags = Counter()
+    for hit in hits:
+        text = _plain_text(hit.get('question_data', ''))
+        if text and text not in questions:
+            questions.append(text)
+        tags.update(tag for tag in hit.get('tags', []) if tag)
+    return {'questions': questions, 'sub_topics': [tag for tag, _ in tags.most_common(15)]}
+
+
+def format_exclusions(coverage, max_chars=200):
+    """Render existing coverage as an exclusion block for the meta-sorting prompt."""
+    if not coverage or not (coverage['questions'] or coverage['sub_topics']):
+        return ""
+    lines = ["The question bank already contains questions like the following. Plan sub-topics and concepts that are NOT covered by them, and do not plan rephrasings of them:"]
+    for question in coverage['questions']:
+        lines.append(f"- {question[:max_chars]}")
+    if coverage['sub_topics']:
+        lines.append(f"Sub-topics and tags that are already well covered: {', '.join(coverage['sub_topics'])}")
+    return '\n'.join(lines)